@@ -9,8 +9,24 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_django_project.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_django_project.settings.dev')
 
-application = get_asgi_application()
+
+class AsyncPagesHandler(ASGIHandler):
+    """
+    Resolves requests with settings.ASGI_ROOT_URLCONF, where read-only shop and blog pages
+    are served by async views; the settings (and ROOT_URLCONF) are the same as in the WSGI mode.
+    """
+
+    async def get_response_async(self, request):
+        # the URLconf of the request is used instead of ROOT_URLCONF, as if set by a middleware
+        request.urlconf = settings.ASGI_ROOT_URLCONF
+        return await super().get_response_async(request)
+
+
+django.setup(set_prefix=False)
+application = AsyncPagesHandler()
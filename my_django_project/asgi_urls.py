@@ -0,0 +1,15 @@
+"""
+URLs of the ASGI mode: the same as my_django_project.urls,
+but the read-only shop and blog pages are served by the async views.
+"""
+from django.urls import URLPattern
+
+from niunius.async_views import ASYNC_VIEWS
+from my_django_project.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    URLPattern(pattern.pattern, ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if getattr(pattern, "name", None) in ASYNC_VIEWS
+    else pattern
+    for pattern in sync_urlpatterns
+]
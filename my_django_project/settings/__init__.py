@@ -0,0 +1,7 @@
+"""
+Settings profiles, chosen with DJANGO_SETTINGS_MODULE:
+    my_django_project.settings.dev - development (default of manage.py, wsgi.py and asgi.py)
+    my_django_project.settings.test - automated tests (set in pytest.ini)
+    my_django_project.settings.prod - production, configured with environment variables
+Each profile extends my_django_project.settings.base and can be overridden by local_settings.py.
+"""
@@ -0,0 +1,230 @@
+"""
+Django settings for my_django_project project, shared by all profiles (dev, test, prod).
+
+Generated by 'django-admin startproject' using Django 3.1.5.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.1/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/3.1/ref/settings/
+"""
+import os
+from pathlib import Path
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/3.1/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'iss(wq-_h%i9cu03s=&pak=kx!jbi#xfcy37q)f)o^m!kp1g4p'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = True
+
+ALLOWED_HOSTS = []
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'mptt',
+    'niunius',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    # 'django.middleware.locale.LocaleMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'niunius.replicas.ReplicaMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'my_django_project.urls'
+# URLs of the ASGI entry point (asgi.py): the same, with async views of the read-only pages.
+ASGI_ROOT_URLCONF = 'my_django_project.asgi_urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [os.path.join(BASE_DIR, 'niunius/templates'), ],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'niunius.my_context_processor.my_cp',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'my_django_project.wsgi.application'
+ASGI_APPLICATION = 'my_django_project.asgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/3.1/ref/settings/#databases
+
+def database_settings(conn_max_age):
+    """
+    PostgreSQL connection configured with the DB_* environment variables.
+
+    CONN_MAX_AGE - for how many seconds a connection is kept open and reused by next requests
+        (0 - closed at the end of each request); DB_CONN_MAX_AGE overrides the value of the profile.
+    CONN_HEALTH_CHECKS - a kept connection is checked at the start of a request and reopened if
+        the database server has closed it in the meantime (see niunius/db.py).
+    DB_POOLER=1 - connections go through a transaction pooler (e.g. PgBouncer), which can not keep
+        server-side cursors (used by QuerySet.iterator()) between transactions.
+    """
+    return {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': os.environ.get('DB_NAME', 'niunius'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', conn_max_age)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_POOLER') == '1',
+    }
+
+
+def replica_settings(primary):
+    """Replicas of the primary database on the hosts listed in DB_REPLICA_HOSTS (comma separated)."""
+    hosts = [host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host]
+    return {
+        f'replica{number}': dict(primary, HOST=host, TEST={'MIRROR': 'default'})
+        for number, host in enumerate(hosts, 1)
+    }
+
+
+DATABASES = {'default': database_settings(conn_max_age=0)}
+
+# Catalog and blog pages read from replicas, see niunius/replicas.py
+DATABASE_ROUTERS = ['niunius.replicas.ReplicaRouter']
+# aliases of replicas of the 'default' database, None - all databases other than 'default'
+DATABASE_REPLICAS = None
+# for how long (in seconds) a client reads only from the primary after its request has written anything
+REPLICA_PIN_SECONDS = 10
+
+
+# Password validation
+# https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/3.1/topics/i18n/
+
+LANGUAGE_CODE = 'pl-pl'
+
+TIME_ZONE = 'Europe/Warsaw'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/3.1/howto/static-files/
+
+STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# hashed names and gzip/brotli compressed copies of collected static files, see niunius/storage.py
+STATICFILES_STORAGE = 'niunius.storage.PrecompressedManifestStaticFilesStorage'
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# uploaded files are saved once per content, see niunius/storage.py
+DEFAULT_FILE_STORAGE = 'niunius.storage.ContentAddressedStorage'
+# Who sends media files (see niunius/media.py): 'django', 'x-accel' (nginx) or 'x-sendfile' (Apache, lighttpd)
+MEDIA_SERVING = 'django'
+# internal nginx location of MEDIA_ROOT, for 'x-accel' (see deploy/nginx/static.conf)
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 24 * 60 * 60
+# content-addressed files never change
+MEDIA_BLOB_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Uploads are streamed to temporary files, larger files are skipped (see niunius/photos.py)
+FILE_UPLOAD_HANDLERS = ['niunius.photos.LimitedUploadHandler']
+UPLOAD_MAX_FILE_SIZE = 20 * 1024 * 1024
+# photos of articles: limit of pixels of uploads, size after scaling down, worker threads (0 - in the request)
+ARTICLE_PHOTO_MAX_PIXELS = 50_000_000
+ARTICLE_PHOTO_MAX_DIMENSION = 2048
+ARTICLE_PHOTO_WORKERS = 2
+
+
+# EMAIL SETTINGS
+
+# The current settings allow you to check sent messages in the terminal. Just use the below command:
+# python -m smtpd -n -c DebuggingServer localhost:1025
+
+
+EMAIL_HOST = 'localhost'
+EMAIL_PORT = 1025
+EMAIL_HOST_USER = ''
+EMAIL_HOST_PASSWORD = ''
+EMAIL_USE_TLS = False
+
+
+# SHOP SETTINGS
+
+# For how long (in seconds) products added to the shopping cart are reserved for the cart.
+# Expired reservations are deleted with: python manage.py release_expired_reservations
+STOCK_RESERVATION_TTL = 30 * 60
+
+# For how long (in days) changes of deleted products, cars and categories are served by the catalog API.
+# Older ones are removed with: python manage.py compact_catalog_changes
+CATALOG_CHANGES_RETENTION_DAYS = 30
+
+# Snapshot of the in-memory catalog index shared by processes (see niunius/catalog_index.py),
+# None - every process builds its own index.
+CATALOG_INDEX_PATH = os.path.join(BASE_DIR, 'catalog_index.pickle')
+
+# How many products frequently bought together are shown on the page of a product.
+# They are updated with: python manage.py update_recommendations
+RECOMMENDATIONS_PER_PRODUCT = 6
+
+# How many similar products are shown on the page of a product and related articles under an article.
+# They are computed with: python manage.py update_similarities
+SIMILAR_PRODUCTS_PER_PRODUCT = 5
+RELATED_ARTICLES_PER_ARTICLE = 3
+
+# For how long (in seconds) the tree of categories on the shop sidebar is cached;
+# it is cached with the version of the catalog, so a change of any category is seen at once.
+CATEGORY_TREE_CACHE_TIMEOUT = 60 * 60
+
+# Threads of comments (a comment with all replies to it) on one page of an article.
+COMMENT_THREADS_PER_PAGE = 20
@@ -0,0 +1,13 @@
+from .base import *
+
+DEBUG = True
+
+# connections are kept open between requests, so requests do not pay for opening them
+DATABASES = {'default': database_settings(conn_max_age=60)}
+DATABASES.update(replica_settings(DATABASES['default']))
+
+
+try:
+    from my_django_project.local_settings import *
+except ImportError:
+    pass
@@ -0,0 +1,20 @@
+from .base import *
+
+DEBUG = False
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+
+# Connections are kept open for 10 minutes and checked at the start of each request.
+# Behind a transaction pooler set DB_POOLER=1 (see database_settings in base.py).
+DATABASES = {'default': database_settings(conn_max_age=600)}
+DATABASES.update(replica_settings(DATABASES['default']))
+
+# files are sent by nginx (see deploy/nginx/static.conf)
+MEDIA_SERVING = os.environ.get('MEDIA_SERVING', 'x-accel')
+
+
+try:
+    from my_django_project.local_settings import *
+except ImportError:
+    pass
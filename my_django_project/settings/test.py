@@ -0,0 +1,36 @@
+from .base import *
+
+DEBUG = False
+
+DATABASES = {'default': database_settings(conn_max_age=0)}
+
+# users are created in many tests, a fast hasher saves time
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# the database of each test is different, a snapshot would outlive it
+CATALOG_INDEX_PATH = None
+
+
+try:
+    from my_django_project.local_settings import *
+except ImportError:
+    pass
+
+if os.environ.get('GITHUB_WORKFLOW'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql_psycopg2',
+            'NAME': 'github_actions',
+            'USER': 'postgres',
+            'PASSWORD': 'postgres',
+            'HOST': 'localhost',
+            'PORT': 5432,
+        }
+    }
+
+# A separate database standing in for a replica in tests of niunius/replicas.py,
+# which enable it with settings.DATABASE_REPLICAS.
+DATABASES['replica'] = dict(DATABASES['default'])
+if not DATABASES['replica']['ENGINE'].endswith('sqlite3'):
+    DATABASES['replica']['TEST'] = {'NAME': f"test_{DATABASES['default']['NAME']}_replica"}
+DATABASE_REPLICAS = []
@@ -1,12 +1,13 @@
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, include, re_path
 from django.conf import settings
 from niunius import views as v
+from niunius.media import serve_media
 from niunius.admin import admin_site
 from django.contrib.auth import views as auth_views
 
 urlpatterns = [
     path("myadmin/", admin_site.urls),
+    path("api/v1/", include("niunius.api")),
     path("accounts/", include("django.contrib.auth.urls")),
     path("", v.HomeView.as_view(), name="home"),
     path("logout/", auth_views.LogoutView.as_view(next_page="home"), name="logout"),
@@ -43,6 +44,7 @@ urlpatterns = [
     ),
     path("sklep/", v.ShopView.as_view(), name="shop"),
     path("sklep/szukaj/", v.SearchView.as_view(), name="search"),
+    path("sklep/produkty/", v.ProductListView.as_view(), name="products"),
     path("sklep/auto/<slug:slug>/", v.CarView.as_view(), name="car"),
     path("sklep/kategoria/<slug:slug>/", v.CategoryView.as_view(), name="category"),
     path("sklep/produkt/<slug:slug>/", v.ProductView.as_view(), name="product"),
@@ -62,4 +64,6 @@ urlpatterns = [
     path("sklep/potwierd-zakup/<int:pk>/", v.PurchaseView.as_view(), name="purchase"),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns += [
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.+)$", serve_media, name="media"),
+]
@@ -1,23 +1,55 @@
 from django.contrib import admin
 from django.contrib.admin import AdminSite
 from django.contrib.auth.models import User
-
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from mptt.admin import MPTTModelAdmin
+
+from .exports import FORMATS, export
+from .forms import ProductAdminForm, ProductVariantAdminForm
+from .inventory import record_movement, with_current_stock
+from .reports import sales_dashboard
 from .models import (
+    Address,
     Article,
     ArticlePhoto,
     ArticleComment,
     Car,
     Category,
     Product,
+    ProductVariant,
     ShoppingCart,
     CartItem,
     Order,
     CarService,
+    MediaBlob,
+    StockMovement,
+    StockReservation,
 )
 
 
 class MyAdminSite(AdminSite):
     site_header = "Niuniuś"
+    index_template = "admin/niunius_index.html"
+
+    def get_urls(self):
+        urls = [path("sprzedaz/", self.admin_view(self.sales_view), name="sales-dashboard")]
+        return urls + super().get_urls()
+
+    def sales_view(self, request):
+        """Sales dashboard: revenue and sold units per day and best sellers, from daily sales aggregates."""
+        try:
+            days = min(max(int(request.GET.get("dni", 30)), 1), 366)
+        except ValueError:
+            days = 30
+        context = {
+            **self.each_context(request),
+            "title": "Sprzedaż",
+            **sales_dashboard(days),
+        }
+        return TemplateResponse(request, "admin/sales_dashboard.html", context)
 
 
 admin_site = MyAdminSite(name="myadmin")
@@ -26,6 +58,9 @@ admin_site.register(User)
 admin_site.register(ArticlePhoto)
 admin_site.register(ArticleComment)
 admin_site.register(CarService)
+admin_site.register(Address)
+admin_site.register(StockReservation)
+admin_site.register(MediaBlob)
 
 
 class ArticlePhotoInLine(admin.TabularInline):
@@ -34,12 +69,22 @@ class ArticlePhotoInLine(admin.TabularInline):
 
 class ArticleCommentInLine(admin.TabularInline):
     model = ArticleComment
+    # a select of all comments would be loaded for every row
+    raw_id_fields = ["parent"]
 
 
 class CartItemInLine(admin.TabularInline):
     model = CartItem
 
 
+class ProductVariantInLine(admin.TabularInline):
+    model = ProductVariant
+    form = ProductVariantAdminForm
+    extra = 0
+    # every variant has its opening stock movement, which restricts deleting it
+    can_delete = False
+
+
 @admin.register(Article, site=admin_site)
 class ArticleAdmin(admin.ModelAdmin):
     inlines = [ArticlePhotoInLine, ArticleCommentInLine]
@@ -52,13 +97,58 @@ class CarAdmin(admin.ModelAdmin):
 
 
 @admin.register(Category, site=admin_site)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(MPTTModelAdmin):
     exclude = ["slug"]
 
 
 @admin.register(Product, site=admin_site)
 class ProductAdmin(admin.ModelAdmin):
-    exclude = ["slug"]
+    form = ProductAdminForm
+    list_display = ["name", "code", "price", "current_stock"]
+    inlines = [ProductVariantInLine]
+
+    def get_queryset(self, request):
+        return with_current_stock(super().get_queryset(request))
+
+    def get_readonly_fields(self, request, obj=None):
+        """The stock is entered for new products only, later it is changed with stock movements."""
+        return ["stock"] if obj else []
+
+    def get_fields(self, request, obj=None):
+        fields = super().get_fields(request, obj)
+        if obj is None:
+            fields = [f for f in fields if f not in ("stock_change", "stock_change_kind")]
+        return fields
+
+    def current_stock(self, obj):
+        return obj.current_stock
+
+    current_stock.short_description = "Stan bieżący"
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        stock_change = form.cleaned_data.get("stock_change")
+        if change and stock_change:
+            record_movement(obj, form.cleaned_data["stock_change_kind"], stock_change)
+
+    def save_formset(self, request, form, formset, change):
+        """Save variants, changes of the stock of existing variants are recorded as stock movements."""
+        super().save_formset(request, form, formset, change)
+        if formset.model is not ProductVariant:
+            return
+        for variant_form in formset.forms:
+            stock_change = variant_form.cleaned_data.get("stock_change")
+            variant = variant_form.instance
+            if stock_change and variant.pk:
+                kind = variant_form.cleaned_data["stock_change_kind"]
+                record_movement(variant.product, kind, stock_change, variant=variant)
+
+
+@admin.register(StockMovement, site=admin_site)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ["product", "variant", "kind", "quantity", "order", "created", "applied"]
+    list_filter = ["kind", "applied"]
+    readonly_fields = ["product", "variant", "kind", "quantity", "order", "created", "applied"]
 
 
 @admin.register(ShoppingCart, site=admin_site)
@@ -69,3 +159,24 @@ class ShoppingCartAdmin(admin.ModelAdmin):
 @admin.register(Order, site=admin_site)
 class OrderAdmin(admin.ModelAdmin):
     exclude = ["cart"]
+    list_display = ["__str__", "date", "placed_at", "status", "total", "paid"]
+    list_filter = ["status", "paid"]
+    actions = ["export_csv", "export_jsonl"]
+
+    def export_response(self, queryset, format):
+        """Stream the export of the selected orders as a file to download."""
+        content_type, extension = FORMATS[format]
+        response = StreamingHttpResponse(export(queryset, format), content_type=content_type)
+        filename = f"zamowienia-{timezone.localdate():%Y%m%d}.{extension}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def export_csv(self, request, queryset):
+        return self.export_response(queryset, "csv")
+
+    export_csv.short_description = "Eksportuj do CSV"
+
+    def export_jsonl(self, request, queryset):
+        return self.export_response(queryset, "jsonl")
+
+    export_jsonl.short_description = "Eksportuj do JSON Lines"
@@ -0,0 +1,337 @@
+"""
+Read-only JSON API of the catalog: products, cars and categories.
+
+    GET products/                          list of products
+    GET products/<id>/                     one product
+    GET cars/, cars/<id>/                  cars
+    GET cars/<id>/products/                products fitting the car
+    GET categories/, categories/<id>/      categories
+    GET categories/<id>/products/          products of the category
+    GET availability/?ids=1,2,3            quantities of the products available to sell
+    GET changes/?since=<version>           changes of the catalog since the given version
+
+Lists are ordered by id and split into pages with an opaque cursor: "next" is the URL of the next page
+(null on the last one), ?limit= sets the size of a page. Lists accept ?ids= (a batch of objects by id)
+and all responses ?fields= (only the given fields, e.g. ?fields=id,name,price).
+Rows are read with values(), without instantiating models.
+
+Catalog responses have the version of the catalog (niunius.catalog) as the ETag, so a client
+revalidates its copy with If-None-Match and gets 304 until anything in the catalog changes.
+Availability changes with every shopping cart, so it is not cached.
+
+To stay in sync, a client downloads the lists once, remembers the "version" of the first page
+and then asks for changes since it: each change has its number ("seq"), the kind and the id of the object,
+and its current fields (or "deleted": true). The client applies them and asks again with ?since=
+set to "next" of the response, until "more" is false. 410 Gone means the changes since then
+have been compacted away and the whole catalog must be downloaded again.
+"""
+import base64
+import binascii
+from functools import wraps
+
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.urls import path
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
+from django.views.decorators.http import condition, require_GET
+
+from .catalog import catalog_version
+from .inventory import with_available
+from .models import CatalogChange, CatalogVersion, Car, Category, Product
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+# Resource: fields which can be requested, all are sent by default.
+PRODUCT_FIELDS = (
+    "id",
+    "slug",
+    "name",
+    "code",
+    "price",
+    "description",
+    "image",
+    "added",
+    "cars",
+    "categories",
+)
+CAR_FIELDS = ("id", "slug", "brand", "model", "image")
+CATEGORY_FIELDS = ("id", "slug", "name", "parent")
+
+# Many-to-many field of Product: (through model, column of the related object).
+PRODUCT_RELATIONS = {
+    "cars": (Product.cars.through, "car_id"),
+    "categories": (Product.categories.through, "category_id"),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def error_response(error):
+    return JsonResponse({"error": str(error)}, status=error.status)
+
+
+def catalog_etag(request, *args, **kwargs):
+    request.catalog_version = catalog_version()
+    return f"catalog-{request.catalog_version}"
+
+
+def catalog_view(view):
+    """GET only view of the catalog, revalidated by the version of the catalog."""
+
+    @require_GET
+    @condition(etag_func=catalog_etag)
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            response = view(request, *args, **kwargs)
+        except ApiError as e:
+            response = error_response(e)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    return wrapper
+
+
+def requested_fields(request, allowed):
+    value = request.GET.get("fields")
+    if not value:
+        return list(allowed)
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ApiError(f"Nieznane pola: {', '.join(unknown)}. Dostępne: {', '.join(allowed)}.")
+    return fields
+
+
+def requested_ids(request, required=False):
+    value = request.GET.get("ids")
+    if not value:
+        if required:
+            raise ApiError("Podaj identyfikatory: ?ids=1,2,3.")
+        return None
+    try:
+        ids = [int(pk) for pk in value.split(",") if pk.strip()]
+    except ValueError:
+        raise ApiError("Identyfikatory muszą być liczbami.")
+    if len(ids) > MAX_LIMIT:
+        raise ApiError(f"Można pobrać najwyżej {MAX_LIMIT} obiektów naraz.")
+    return ids
+
+
+def requested_limit(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError("Limit musi być liczbą.")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ApiError("Nieprawidłowy kursor.")
+
+
+def read_rows(queryset, fields, limit=None):
+    """
+    Rows (dicts of the requested fields and the id) of not more than limit objects of the queryset,
+    with URLs of images and ids of related objects.
+    """
+    relations = PRODUCT_RELATIONS if queryset.model is Product else {}
+    columns = [field for field in fields if field not in relations and field != "id"]
+    rows = list(queryset.values("id", *columns)[:limit])
+    pks = [row["id"] for row in rows]
+    for field in fields:
+        if field not in relations or not rows:
+            continue
+        through, column = relations[field]
+        related = {pk: [] for pk in pks}
+        links = through.objects.filter(product_id__in=pks).order_by(column).values_list("product_id", column)
+        for product_id, related_id in links:
+            related[product_id].append(related_id)
+        for row in rows:
+            row[field] = related[row["id"]]
+    for row in rows:
+        if "image" in row:
+            row["image"] = default_storage.url(row["image"]) if row["image"] else None
+    return rows
+
+
+def list_response(request, queryset, allowed):
+    fields = requested_fields(request, allowed)
+    limit = requested_limit(request)
+    ids = requested_ids(request)
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    cursor = request.GET.get("cursor")
+    if cursor:
+        queryset = queryset.filter(pk__gt=decode_cursor(cursor))
+    rows = read_rows(queryset.order_by("pk"), fields, limit + 1)
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        query = request.GET.copy()
+        query["cursor"] = encode_cursor(rows[-1]["id"])
+        next_url = f"{request.path}?{urlencode(query, doseq=True)}"
+    if "id" not in fields:
+        for row in rows:
+            del row["id"]
+    return JsonResponse({"version": request.catalog_version, "results": rows, "next": next_url})
+
+
+def detail_response(request, queryset, pk, allowed):
+    fields = requested_fields(request, allowed)
+    rows = read_rows(queryset.filter(pk=pk), fields)
+    if not rows:
+        raise ApiError("Nie znaleziono.", status=404)
+    row = rows[0]
+    if "id" not in fields:
+        del row["id"]
+    return JsonResponse({"version": request.catalog_version, "result": row})
+
+
+def existing(model, pk):
+    if not model.objects.filter(pk=pk).exists():
+        raise ApiError("Nie znaleziono.", status=404)
+
+
+@catalog_view
+def products(request):
+    return list_response(request, Product.objects.all(), PRODUCT_FIELDS)
+
+
+@catalog_view
+def product(request, pk):
+    return detail_response(request, Product.objects.all(), pk, PRODUCT_FIELDS)
+
+
+@catalog_view
+def cars(request):
+    return list_response(request, Car.objects.all(), CAR_FIELDS)
+
+
+@catalog_view
+def car(request, pk):
+    return detail_response(request, Car.objects.all(), pk, CAR_FIELDS)
+
+
+@catalog_view
+def car_products(request, pk):
+    existing(Car, pk)
+    return list_response(request, Product.objects.filter(cars=pk), PRODUCT_FIELDS)
+
+
+@catalog_view
+def categories(request):
+    return list_response(request, Category.objects.all(), CATEGORY_FIELDS)
+
+
+@catalog_view
+def category(request, pk):
+    return detail_response(request, Category.objects.all(), pk, CATEGORY_FIELDS)
+
+
+@catalog_view
+def category_products(request, pk):
+    existing(Category, pk)
+    return list_response(request, Product.objects.filter(categories=pk), PRODUCT_FIELDS)
+
+
+@require_GET
+def availability(request):
+    """Quantities of the given products available to sell: the stock minus reservations of carts."""
+    try:
+        ids = requested_ids(request, required=True)
+    except ApiError as e:
+        return error_response(e)
+    rows = with_available(Product.objects.filter(pk__in=ids)).order_by("pk").values("id", "available")
+    response = JsonResponse({"results": list(rows)})
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+# Kind of change: model and its fields.
+CHANGE_KINDS = {
+    CatalogChange.PRODUCT: (Product, PRODUCT_FIELDS),
+    CatalogChange.CAR: (Car, CAR_FIELDS),
+    CatalogChange.CATEGORY: (Category, CATEGORY_FIELDS),
+}
+
+
+@require_GET
+def changes(request):
+    """Changes of the catalog since the given version, with the current fields of changed objects."""
+    try:
+        since = int(request.GET.get("since", 0))
+    except ValueError:
+        return error_response(ApiError("Wersja musi być liczbą."))
+    try:
+        limit = requested_limit(request)
+    except ApiError as e:
+        return error_response(e)
+    version = CatalogVersion.objects.values("version", "compacted").first() or {"version": 0, "compacted": 0}
+    if since < version["compacted"]:
+        return error_response(
+            ApiError("Zmiany zostały usunięte, pobierz cały katalog ponownie.", status=410)
+        )
+    batch = list(
+        CatalogChange.objects.filter(seq__gt=since)
+        .order_by("seq")
+        .values("seq", "kind", "object_id", "deleted")[: limit + 1]
+    )
+    more = len(batch) > limit
+    batch = batch[:limit]
+    objects = {}
+    for kind, (model, fields) in CHANGE_KINDS.items():
+        pks = [change["object_id"] for change in batch if change["kind"] == kind and not change["deleted"]]
+        if pks:
+            rows = read_rows(model.objects.filter(pk__in=pks), fields)
+            objects.update({(kind, row["id"]): row for row in rows})
+    results = []
+    for change in batch:
+        # an object deleted after the change is read as deleted, its own change comes later
+        data = objects.get((change["kind"], change["object_id"]))
+        results.append(
+            {
+                "seq": change["seq"],
+                "kind": change["kind"],
+                "id": change["object_id"],
+                "deleted": data is None,
+                "data": data,
+            }
+        )
+    response = JsonResponse(
+        {
+            "version": version["version"],
+            "results": results,
+            "next": batch[-1]["seq"] if batch else since,
+            "more": more,
+        }
+    )
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+urlpatterns = [
+    path("products/", products, name="api-products"),
+    path("products/<int:pk>/", product, name="api-product"),
+    path("cars/", cars, name="api-cars"),
+    path("cars/<int:pk>/", car, name="api-car"),
+    path("cars/<int:pk>/products/", car_products, name="api-car-products"),
+    path("categories/", categories, name="api-categories"),
+    path("categories/<int:pk>/", category, name="api-category"),
+    path("categories/<int:pk>/products/", category_products, name="api-category-products"),
+    path("availability/", availability, name="api-availability"),
+    path("changes/", changes, name="api-changes"),
+]
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class NiuniusConfig(AppConfig):
     name = 'niunius'
+
+    def ready(self):
+        from . import blobs, catalog, db
+
+        blobs.connect_signals()
+        catalog.connect_signals()
+        db.connect_signals()
@@ -0,0 +1,56 @@
+"""
+Static assets: third-party assets vendored into the static files and critical CSS inlined into pages.
+
+Third-party assets are downloaded from their CDN once, with the vendor_assets command,
+and served with the rest of the static files (hashed, precompressed, cached for a year),
+so pages do not depend on a third-party host.
+Until an asset is vendored, pages keep loading it from the CDN, guarded by its integrity hash.
+"""
+import base64
+import hashlib
+from functools import lru_cache
+
+from django.contrib.staticfiles import finders
+
+# Asset name: CDN url, Subresource Integrity hash and path of the vendored copy in the static files.
+VENDOR_ASSETS = {
+    "bootstrap-css": {
+        "url": "https://cdn.jsdelivr.net/npm/bootstrap@5.0.0-beta1/dist/css/bootstrap.min.css",
+        "integrity": "sha384-giJF6kkoqNQ00vy+HMDP7azOuL0xtbfIcaT9wjKHr8RbDVddVHyTfAAsrekwKmP1",
+        "path": "niunius/vendor/bootstrap-5.0.0-beta1/bootstrap.min.css",
+    },
+    "jquery": {
+        "url": "https://code.jquery.com/jquery-3.3.1.slim.min.js",
+        "integrity": "sha384-q8i/X+965DzO0rT7abK41JStQIAqVgRVzpbzo5smXKp4YfRvH+8abtTE1Pi6jizo",
+        "path": "niunius/vendor/jquery-3.3.1/jquery.slim.min.js",
+    },
+    "popper": {
+        "url": "https://cdnjs.cloudflare.com/ajax/libs/popper.js/1.14.3/umd/popper.min.js",
+        "integrity": "sha384-ZMP7rVo3mIykV+2+9J3UJ46jBk0WLaUAdn689aCwoqbBJiSnjAK/l8WvCWPIPm49",
+        "path": "niunius/vendor/popper-1.14.3/popper.min.js",
+    },
+    "bootstrap-js": {
+        "url": "https://stackpath.bootstrapcdn.com/bootstrap/4.1.3/js/bootstrap.min.js",
+        "integrity": "sha384-ChfqqxuZUCnJSK3+MXmPNIyE6ZbWh2IMqE241rYiqJxyMiZ6OW/JmZQ5stwEULTy",
+        "path": "niunius/vendor/bootstrap-4.1.3/bootstrap.min.js",
+    },
+}
+
+
+def integrity(content, algorithm="sha384"):
+    """Subresource Integrity hash of the content."""
+    digest = hashlib.new(algorithm, content).digest()
+    return f"{algorithm}-{base64.b64encode(digest).decode()}"
+
+
+@lru_cache(maxsize=None)
+def is_vendored(path):
+    """Check whether the asset has been vendored, i.e. it is found among the static files."""
+    return finders.find(path) is not None
+
+
+@lru_cache(maxsize=None)
+def read_static(path):
+    """Content of the static file, read once per process."""
+    with open(finders.find(path), encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,179 @@
+"""
+Async versions of the read-only shop and blog pages, served in the ASGI mode (see my_django_project.asgi).
+
+Django 3.1 has no async ORM, so queries are run in a pool of threads, each thread with its own database
+connection, and independent queries of one page (e.g. the page object and the sidebar) run at the same time.
+Templates are rendered in the thread running the sync code of the request, as they still may query
+the database (e.g. products of a car), while the event loop goes on serving other clients.
+POST requests of the product and article pages are handed over to the sync views.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator
+from django.db import close_old_connections
+from django.shortcuts import get_object_or_404, render
+
+from . import views
+from .categories import category_tree
+from .comments import comment_page
+from .forms import ArticleCommentForm
+from .inventory import with_available, with_variant_available
+from .models import Article, ArticleComment, Car, Category, Product, ProductVariant
+from .recommendations import recommended_products
+from .similarity import related_articles, similar_products
+
+render_async = sync_to_async(render, thread_sensitive=True)
+product_view = sync_to_async(views.ProductView.as_view(), thread_sensitive=True)
+article_detail_view = sync_to_async(views.ArticleDetailView.as_view(), thread_sensitive=True)
+
+
+def run_query(func, *args, **kwargs):
+    # the thread keeps its connection between requests as long as CONN_MAX_AGE allows
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def query(func, *args, **kwargs):
+    """Run the function in the pool of threads and return its result, e.g. query(list, queryset)."""
+    return await sync_to_async(run_query, thread_sensitive=False)(func, *args, **kwargs)
+
+
+def get_page(queryset, number, per_page):
+    page = Paginator(queryset, per_page).get_page(number)
+    page.object_list = list(page.object_list)
+    return page
+
+
+def comment_list(comments, number):
+    page, comments, comments_count = comment_page(comments, number)
+    return page, list(comments), comments_count
+
+
+async def render_page(request, template_name, queries):
+    """
+    Run the queries of the page (context name: awaitable) together with the ones of the shop sidebar,
+    which are otherwise made by the context processor, then render the template.
+    """
+    queries = dict(
+        queries,
+        cars=query(list, Car.objects.all()),
+        categories=query(category_tree),
+    )
+    results = await asyncio.gather(*queries.values())
+    return await render_async(request, template_name, dict(zip(queries, results)))
+
+
+async def shop(request):
+    """Async ShopView."""
+    latest_products = with_available(Product.objects).filter(available__gt=0).order_by("-added")[:6]
+    return await render_page(
+        request, "niunius/shop.html", {"latest_products": query(list, latest_products)}
+    )
+
+
+async def search(request):
+    """Async SearchView."""
+    search_query = request.GET.get("query", "")
+    products = (
+        Product.objects.filter(name__icontains=search_query)
+        | Product.objects.filter(code__icontains=search_query)
+        | Product.objects.filter(variants__code__icontains=search_query)
+    ).distinct()
+    products = with_available(products).filter(available__gt=0).prefetch_related("variants")
+    return await render_page(
+        request,
+        "niunius/search_results.html",
+        {
+            "object_list": query(list, Category.objects.filter(name__icontains=search_query)),
+            "search_product": query(list, products),
+            "search_car": query(list, Car.objects.filter(model__icontains=search_query)),
+        },
+    )
+
+
+async def car(request, slug):
+    """Async CarView."""
+    return await render_page(
+        request, "niunius/car.html", {"car": query(get_object_or_404, Car, slug=slug)}
+    )
+
+
+async def category(request, slug):
+    """Async CategoryView."""
+    return await render_page(
+        request, "niunius/category.html", {"category": query(get_object_or_404, Category, slug=slug)}
+    )
+
+
+async def product(request, slug):
+    """Async ProductView.get, adding to the cart is handled by ProductView.post."""
+    if request.method not in ("GET", "HEAD"):
+        return await product_view(request, slug=slug)
+    product = query(get_object_or_404, with_available(Product.objects), slug=slug)
+    variants = with_variant_available(ProductVariant.objects.filter(product__slug=slug))
+    return await render_page(
+        request,
+        "niunius/product.html",
+        {
+            "product": product,
+            "variants": query(list, variants),
+            "recommended": query(list, recommended_products(slug)),
+            "similar": query(list, similar_products(slug)),
+        },
+    )
+
+
+async def blog(request):
+    """Async BlogView."""
+    articles = (
+        Article.objects.exclude(slug="o-klubie")
+        .prefetch_related("articlephoto_set")
+        .order_by("-added")
+    )
+    return await render_page(
+        request,
+        "niunius/blog.html",
+        {
+            "page_obj": query(get_page, articles, request.GET.get("page"), 10),
+            "carousel_articles": query(list, articles[:4]),
+        },
+    )
+
+
+async def article_detail(request, slug):
+    """Async ArticleDetailView.get, likes and dislikes are handled by ArticleDetailView.post."""
+    if request.method not in ("GET", "HEAD"):
+        return await article_detail_view(request, slug=slug)
+    article, (page, comments, comments_count), related = await asyncio.gather(
+        query(get_object_or_404, Article.objects.prefetch_related("articlephoto_set"), slug=slug),
+        query(comment_list, ArticleComment.objects.filter(article__slug=slug), request.GET.get("comments")),
+        query(list, related_articles(slug)),
+    )
+    return await render_async(
+        request,
+        "niunius/article_detail.html",
+        {
+            "article": article,
+            "comments": comments,
+            "comments_count": comments_count,
+            "comments_page": page,
+            "form": ArticleCommentForm(),
+            "related": related,
+        },
+    )
+
+
+# URL name: async view replacing the sync one in the ASGI mode.
+ASYNC_VIEWS = {
+    "shop": shop,
+    "search": search,
+    "car": car,
+    "category": category,
+    "product": product,
+    "blog": blog,
+    "article-detail": article_detail,
+}
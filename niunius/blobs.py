@@ -0,0 +1,106 @@
+"""
+Reference counting of uploaded media files.
+
+Uploaded files are saved once per content (see niunius.storage.ContentAddressedStorage)
+and may be used by many article photos, products and cars. MediaBlob rows count the objects
+using each file; when an object is saved with another file or deleted, the count of the previous file
+is decreased and the file is deleted when nothing uses it any more.
+Counts are kept by signal receivers (connected in NiuniusConfig.ready), so bulk updates
+bypass them - recount_references() rebuilds all counts from the objects.
+"""
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .models import ArticlePhoto, Car, MediaBlob, Product
+from .storage import BLOB_DIR, is_blob
+
+# Model: its file field stored in the content-addressed storage.
+BLOB_FIELDS = {
+    ArticlePhoto: "photo",
+    Product: "image",
+    Car: "image",
+}
+
+
+def add_reference(name):
+    """Count one more object using the blob."""
+    blobs = MediaBlob.objects.filter(name=name)
+    if blobs.update(references=F("references") + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, size=default_storage.size(name), references=1)
+    except IntegrityError:
+        # the row has been created by a concurrent upload in the meantime
+        blobs.update(references=F("references") + 1)
+
+
+def remove_reference(name):
+    """Count one object less using the blob, delete the blob when nothing uses it."""
+    MediaBlob.objects.filter(name=name, references__gt=0).update(references=F("references") - 1)
+    if MediaBlob.objects.filter(name=name, references=0).delete()[0]:
+        transaction.on_commit(lambda: delete_unused(name))
+
+
+def delete_unused(name):
+    # the same content may have been uploaded again since the last reference was removed
+    if not MediaBlob.objects.filter(name=name).exists():
+        default_storage.delete(name)
+
+
+def remember_previous_file(sender, instance, **kwargs):
+    field = BLOB_FIELDS[sender]
+    instance._previous_blob = None
+    if instance.pk is not None:
+        instance._previous_blob = (
+            sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+        )
+
+
+def count_saved_file(sender, instance, **kwargs):
+    current = getattr(instance, BLOB_FIELDS[sender]).name or ""
+    previous = getattr(instance, "_previous_blob", None) or ""
+    if current == previous:
+        return
+    if is_blob(current):
+        add_reference(current)
+    if is_blob(previous):
+        remove_reference(previous)
+
+
+def count_deleted_file(sender, instance, **kwargs):
+    name = getattr(instance, BLOB_FIELDS[sender]).name or ""
+    if is_blob(name):
+        remove_reference(name)
+
+
+def connect_signals():
+    for model in BLOB_FIELDS:
+        pre_save.connect(remember_previous_file, sender=model, dispatch_uid=f"blob-pre-save-{model.__name__}")
+        post_save.connect(count_saved_file, sender=model, dispatch_uid=f"blob-post-save-{model.__name__}")
+        post_delete.connect(count_deleted_file, sender=model, dispatch_uid=f"blob-delete-{model.__name__}")
+
+
+def recount_references():
+    """
+    Rebuild the counts of all blobs from the objects using them.
+    Return names of blobs not used by any object (their rows are deleted, files are left to the caller).
+    """
+    counts = Counter()
+    for model, field in BLOB_FIELDS.items():
+        names = model.objects.filter(**{f"{field}__startswith": BLOB_DIR + "/"}).values_list(field, flat=True)
+        counts.update(names.iterator())
+    with transaction.atomic():
+        unused = list(MediaBlob.objects.exclude(name__in=list(counts)).values_list("name", flat=True))
+        MediaBlob.objects.filter(name__in=unused).delete()
+        existing = set(MediaBlob.objects.values_list("name", flat=True))
+        for name, references in counts.items():
+            if name in existing:
+                MediaBlob.objects.filter(name=name).update(references=references)
+            elif default_storage.exists(name):
+                MediaBlob.objects.create(name=name, size=default_storage.size(name), references=references)
+    return unused
@@ -0,0 +1,137 @@
+"""
+Version and changes of the catalog (products, cars and categories).
+
+Every save and delete of a catalog object, and every change of cars and categories of a product,
+is recorded by signal receivers (connected in NiuniusConfig.ready) within the transaction making it:
+the version of the catalog is increased and the change is saved as a CatalogChange numbered
+with the new version. The row of the version stays locked until the transaction ends, so changes
+are numbered in the order of commits - a client which has read all changes up to some number
+will never see a change with a lower number appear later.
+
+Only the last change of each object is kept, so the changes stay as many as the objects.
+Changes of deleted objects (tombstones) are removed after settings.CATALOG_CHANGES_RETENTION_DAYS
+by compact_changes(); clients which have not synchronized since then download the catalog again.
+
+The catalog API uses the version as the ETag of its responses and serves the changes
+since a given version (see niunius.api). Bulk operations bypass the receivers -
+call record_changes() after them.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.utils import timezone
+
+from .models import CatalogChange, CatalogVersion, Car, Category, Product
+
+BATCH_SIZE = 500
+
+# Model: kind of its changes.
+CATALOG_MODELS = {
+    Product: CatalogChange.PRODUCT,
+    Car: CatalogChange.CAR,
+    Category: CatalogChange.CATEGORY,
+}
+
+
+def catalog_version():
+    return CatalogVersion.objects.values_list("version", flat=True).first() or 0
+
+
+def locked_version():
+    """The version row, locked until the end of the transaction."""
+    versions = CatalogVersion.objects.select_for_update().filter(pk=1)
+    version = versions.first()
+    if version is not None:
+        return version
+    try:
+        with transaction.atomic():
+            CatalogVersion.objects.create(pk=1)
+    except IntegrityError:
+        pass  # the row has been created by a concurrent change in the meantime
+    return versions.get()
+
+
+@transaction.atomic
+def record_changes(model, pks, deleted=False):
+    """Increase the version of the catalog and record changes of the given objects."""
+    pks = list(dict.fromkeys(pks))
+    if not pks:
+        return
+    kind = CATALOG_MODELS[model]
+    version = locked_version()
+    first = version.version + 1
+    version.version += len(pks)
+    version.save(update_fields=["version", "changed"])
+    for i in range(0, len(pks), BATCH_SIZE):
+        CatalogChange.objects.filter(kind=kind, object_id__in=pks[i:i + BATCH_SIZE]).delete()
+    CatalogChange.objects.bulk_create(
+        [
+            CatalogChange(seq=seq, kind=kind, object_id=pk, deleted=deleted)
+            for seq, pk in enumerate(pks, first)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def compact_changes(days=None):
+    """
+    Remove changes of objects deleted more than the given number of days ago
+    (settings.CATALOG_CHANGES_RETENTION_DAYS by default). Return the number of removed changes.
+    """
+    if days is None:
+        days = getattr(settings, "CATALOG_CHANGES_RETENTION_DAYS", 30)
+    with transaction.atomic():
+        tombstones = CatalogChange.objects.filter(
+            deleted=True, changed__lt=timezone.now() - timedelta(days=days)
+        )
+        last = tombstones.aggregate(last=Max("seq"))["last"]
+        if last is None:
+            return 0
+        version = locked_version()
+        version.compacted = max(version.compacted, last)
+        version.save(update_fields=["compacted"])
+        return CatalogChange.objects.filter(deleted=True, seq__lte=last).delete()[0]
+
+
+def object_saved(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk])
+
+
+def object_deleted(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk], deleted=True)
+
+
+def products_relation_deleted(sender, instance, **kwargs):
+    # deleting a car or a category removes it from its products without the m2m_changed signal
+    field = "cars" if sender is Car else "categories"
+    record_changes(Product, Product.objects.filter(**{field: instance}).values_list("pk", flat=True))
+
+
+def product_relations_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ("pre_clear", "post_add", "post_remove"):
+        return
+    if not reverse:
+        record_changes(Product, [instance.pk])
+    elif action == "pre_clear":
+        # products of the car or the category are removed from it, pk_set is not known
+        field = "cars" if isinstance(instance, Car) else "categories"
+        record_changes(Product, Product.objects.filter(**{field: instance}).values_list("pk", flat=True))
+    else:
+        record_changes(Product, pk_set)
+
+
+def connect_signals():
+    for model in CATALOG_MODELS:
+        post_save.connect(object_saved, sender=model, dispatch_uid=f"catalog-save-{model.__name__}")
+        post_delete.connect(object_deleted, sender=model, dispatch_uid=f"catalog-delete-{model.__name__}")
+    for model in (Car, Category):
+        pre_delete.connect(
+            products_relation_deleted, sender=model, dispatch_uid=f"catalog-relation-{model.__name__}"
+        )
+    for through in (Product.cars.through, Product.categories.through):
+        m2m_changed.connect(
+            product_relations_changed, sender=through, dispatch_uid=f"catalog-m2m-{through.__name__}"
+        )
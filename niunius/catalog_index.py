@@ -0,0 +1,343 @@
+"""
+In-memory index of the catalog for listing and facet pages.
+
+Sets of products are bitmaps: Python ints in which bit n is set for the product with id n
+(100 000 products take 12.5 kB per set). The index keeps the set of all products, of products
+fitting each car, belonging to each category, in each price band and in stock, so "products for car X
+in category Y, in stock" is an intersection of a few ints and the counts of facets are popcounts,
+without joining the many-to-many tables. Products of a category with all its subcategories
+(a category stands for its subtree, see niunius.facets) are a union of the bitmaps of the subtree,
+found with the parents of categories.
+
+The index follows the version of the catalog (niunius.catalog). catalog_index() compares it
+with the current version and, if the catalog has changed, updates only the changed objects,
+read from the catalog changes (recorded by signal receivers, also for changes of cars and
+categories of products). The index is read from the primary database, as is the version
+of the catalog - a lagging replica would make it miss changes.
+
+Each process keeps its own index; an up to date index is written to the snapshot file
+settings.CATALOG_INDEX_PATH, so other processes load it instead of building their own.
+"""
+import itertools
+import os
+import pickle
+import tempfile
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .catalog import catalog_version
+from .facets import FACETS, PRICE_BANDS
+from .models import CatalogChange, CatalogVersion, Car, Category, Product
+
+BATCH_SIZE = 500
+
+# Changes of more products than this are applied by building the index again.
+MAX_CHANGES = 5000
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # before Python 3.10
+
+    def popcount(bitmap):
+        return bin(bitmap).count("1")
+
+
+def primary(model):
+    return model.objects.using(DEFAULT_DB_ALIAS)
+
+
+def bitmap(ids):
+    """Bitmap of the given ids, built from bytes - setting bits one by one copies the int each time."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for pk in ids:
+        data[pk >> 3] |= 1 << (pk & 7)
+    return int.from_bytes(data, "little")
+
+
+def bitmap_ids(bitmap, reverse=False):
+    """Ids of the bitmap, in ascending (or descending) order."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    positions = range(len(data) - 1, -1, -1) if reverse else range(len(data))
+    bits = range(7, -1, -1) if reverse else range(8)
+    for i in positions:
+        byte = data[i]
+        if byte:
+            for bit in bits:
+                if byte >> bit & 1:
+                    yield i * 8 + bit
+
+
+class ProductIds:
+    """Ids of products of the bitmap, the newest (the highest) first, for the paginator."""
+
+    def __init__(self, bitmap):
+        self.bitmap = bitmap
+
+    def __len__(self):
+        return popcount(self.bitmap)
+
+    def __getitem__(self, index):
+        return list(itertools.islice(bitmap_ids(self.bitmap, reverse=True), index.start, index.stop))
+
+
+def price_band(price):
+    for key, (_, low, high) in PRICE_BANDS.items():
+        if price >= low and (high is None or price < high):
+            return key
+    return None
+
+
+class CatalogIndex:
+    """
+    Version: version of the catalog the index is up to date with
+    Products: bitmap of all products
+    Cars: {id of the car: bitmap of products fitting it}
+    Categories: {id of the category: bitmap of products belonging to it}
+    Prices: {key of PRICE_BANDS: bitmap of products in the band}
+    In stock: bitmap of products with the stock above 0
+    Car ids, Category ids: {slug: id} of cars and categories
+    Category parents: {id of the category: id of its parent category or None}
+    """
+
+    # version of the attributes, snapshots of other versions are not loaded
+    FORMAT = 2
+
+    def __init__(self, version=0):
+        self.format = self.FORMAT
+        self.version = version
+        self.products = 0
+        self.cars = {}
+        self.categories = {}
+        self.prices = {key: 0 for key in PRICE_BANDS}
+        self.in_stock = 0
+        self.car_ids = {}
+        self.category_ids = {}
+        self.category_parents = {}
+
+    @classmethod
+    def build(cls):
+        """Build the index of the whole catalog from the database."""
+        # the version is read first: changes made while reading are applied again by refresh()
+        index = cls(catalog_version())
+        products = list(primary(Product).values_list("pk", "price", "stock"))
+        index.products = bitmap(pk for pk, _, _ in products)
+        index.in_stock = bitmap(pk for pk, _, stock in products if stock > 0)
+        for key in PRICE_BANDS:
+            index.prices[key] = bitmap(pk for pk, price, _ in products if price_band(price) == key)
+        index.car_ids = dict(primary(Car).values_list("slug", "pk"))
+        categories = list(primary(Category).values_list("slug", "pk", "parent_id"))
+        index.category_ids = {slug: pk for slug, pk, _ in categories}
+        index.category_parents = {pk: parent_id for _, pk, parent_id in categories}
+        for relation, ids, through, column in (
+            (index.cars, index.car_ids, Product.cars.through, "car_id"),
+            (index.categories, index.category_ids, Product.categories.through, "category_id"),
+        ):
+            members = {pk: [] for pk in ids.values()}
+            for product_id, related_id in primary(through).values_list("product_id", column).iterator():
+                members.setdefault(related_id, []).append(product_id)
+            for related_id, product_ids in members.items():
+                relation[related_id] = bitmap(product_ids)
+        return index
+
+    def refresh(self):
+        """
+        Apply changes of the catalog made since the version of the index.
+        Return the updated index - a new one if the changes have been compacted away or are too many.
+        """
+        current = CatalogVersion.objects.values("version", "compacted").first()
+        current = current or {"version": 0, "compacted": 0}
+        if current["version"] == self.version:
+            return self
+        if current["version"] < self.version or self.version < current["compacted"]:
+            return self.build()
+        changes = list(
+            CatalogChange.objects.filter(seq__gt=self.version)
+            .order_by("seq")
+            .values_list("seq", "kind", "object_id")[: MAX_CHANGES + 1]
+        )
+        if len(changes) > MAX_CHANGES:
+            return self.build()
+        changed = {kind: [] for kind, _ in CatalogChange.KIND_CHOICES}
+        for _, kind, pk in changes:
+            changed[kind].append(pk)
+        self.update_related(Car, self.cars, self.car_ids, changed[CatalogChange.CAR])
+        self.update_related(
+            Category,
+            self.categories,
+            self.category_ids,
+            changed[CatalogChange.CATEGORY],
+            self.category_parents,
+        )
+        self.update_products(changed[CatalogChange.PRODUCT])
+        self.version = max([current["version"]] + [seq for seq, _, _ in changes])
+        return self
+
+    def update_related(self, model, relation, ids, pks, parents=None):
+        """Read again slugs (and parents of categories) of the changed objects, drop the deleted ones."""
+        if not pks:
+            return
+        for slug in [slug for slug, pk in ids.items() if pk in pks]:
+            del ids[slug]
+        fields = ("slug", "pk", "parent_id") if parents is not None else ("slug", "pk")
+        existing = {row[1]: row for row in primary(model).filter(pk__in=pks).values_list(*fields)}
+        for pk in pks:
+            if pk in existing:
+                ids[existing[pk][0]] = pk
+                relation.setdefault(pk, 0)
+                if parents is not None:
+                    parents[pk] = existing[pk][2]
+            else:
+                relation.pop(pk, None)
+                if parents is not None:
+                    parents.pop(pk, None)
+
+    def category_subtrees(self):
+        """{id of the category: bitmap of products of it and of all its subcategories}"""
+        subtrees = dict(self.categories)
+        for pk, members in self.categories.items():
+            parent, seen = self.category_parents.get(pk), {pk}
+            # seen guards against a cycle of parents in a not fully applied change
+            while parent is not None and parent not in seen:
+                seen.add(parent)
+                subtrees[parent] = subtrees.get(parent, 0) | members
+                parent = self.category_parents.get(parent)
+        return subtrees
+
+    def update_products(self, pks):
+        """Read again the changed products: their prices, stock, cars and categories."""
+        for i in range(0, len(pks), BATCH_SIZE):
+            batch = pks[i:i + BATCH_SIZE]
+            keep = ~bitmap(batch)
+            self.products &= keep
+            self.in_stock &= keep
+            for bitmaps in (self.prices, self.cars, self.categories):
+                for key in bitmaps:
+                    bitmaps[key] &= keep
+            products = list(primary(Product).filter(pk__in=batch).values_list("pk", "price", "stock"))
+            self.products |= bitmap(pk for pk, _, _ in products)
+            self.in_stock |= bitmap(pk for pk, _, stock in products if stock > 0)
+            for key in PRICE_BANDS:
+                self.prices[key] |= bitmap(pk for pk, price, _ in products if price_band(price) == key)
+            for relation, through, column in (
+                (self.cars, Product.cars.through, "car_id"),
+                (self.categories, Product.categories.through, "category_id"),
+            ):
+                members = {}
+                for product_id, related_id in primary(through).filter(product_id__in=batch).values_list(
+                    "product_id", column
+                ):
+                    members.setdefault(related_id, []).append(product_id)
+                for related_id, product_ids in members.items():
+                    relation[related_id] = relation.get(related_id, 0) | bitmap(product_ids)
+
+    def chosen(self, filters, facet):
+        """Bitmap of products with any of the chosen values of the facet, None if nothing is chosen."""
+        if facet == "car" and filters.cars:
+            return self.union(self.cars.get(self.car_ids.get(slug), 0) for slug in filters.cars)
+        if facet == "category" and filters.categories:
+            subtrees = self.category_subtrees()
+            return self.union(subtrees.get(self.category_ids.get(slug), 0) for slug in filters.categories)
+        if facet == "price" and filters.prices:
+            return self.union(self.prices[key] for key in filters.prices)
+        if facet == "in_stock" and filters.in_stock:
+            return self.in_stock
+        return None
+
+    @staticmethod
+    def union(bitmaps):
+        result = 0
+        for members in bitmaps:
+            result |= members
+        return result
+
+    def filter(self, filters, skip=None):
+        """Bitmap of products with the chosen values of all facets but the skipped one."""
+        result = self.products
+        for facet in FACETS:
+            if facet != skip:
+                chosen = self.chosen(filters, facet)
+                if chosen is not None:
+                    result &= chosen
+        return result
+
+    def counts(self, filters):
+        """Numbers of products per value of each facet, like facets.facet_counts()."""
+        counts = {}
+        for facet, bitmaps in (
+            ("car", self.cars),
+            ("category", self.category_subtrees()),
+            ("price", self.prices),
+            ("in_stock", {"1": self.in_stock}),
+        ):
+            others = self.filter(filters, skip=facet)
+            counts[facet] = {}
+            for key, members in bitmaps.items():
+                count = popcount(members & others)
+                if count:
+                    counts[facet][str(key)] = count
+        return counts
+
+    def save(self, path):
+        """Write the index to the snapshot file, replacing it at once."""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile("wb", dir=directory, delete=False) as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path):
+        """The index from the snapshot file, None if there is none or it cannot be read."""
+        try:
+            with open(path, "rb") as f:
+                index = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            return None
+        if not isinstance(index, cls) or getattr(index, "format", None) != cls.FORMAT:
+            return None
+        return index
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def catalog_index():
+    """The index of the current version of the catalog, shared by threads of the process."""
+    global _index
+    path = getattr(settings, "CATALOG_INDEX_PATH", None)
+    with _lock:
+        version = catalog_version()
+        if _index is not None and _index.version == version:
+            return _index
+        index = _index
+        if path:
+            snapshot = CatalogIndex.load(path)
+            # a newer snapshot saves applying the changes written by other processes
+            if snapshot is not None and snapshot.version <= version and (
+                index is None or index.version > version or snapshot.version > index.version
+            ):
+                index = snapshot
+        if index is None:
+            index = CatalogIndex.build()
+        elif index.version != version:
+            index = index.refresh()
+        else:
+            _index = index
+            return index  # the snapshot is up to date
+        if path:
+            index.save(path)
+        _index = index
+        return index
+
+
+def reset():
+    """Forget the index of the process, e.g. when the database has been replaced."""
+    global _index
+    with _lock:
+        _index = None
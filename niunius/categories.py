@@ -0,0 +1,32 @@
+"""
+Tree of categories for the shop sidebar.
+
+The whole tree is read with one query - categories ordered by tree and lft come in the order
+of a depth-first walk, so the sidebar renders them as a flat list indented by level - and kept
+in the cache for settings.CATEGORY_TREE_CACHE_TIMEOUT, under a key with the version
+of the catalog (niunius.catalog). Every change of a category increases the version,
+so each process (and each worker with its own local memory cache) reads the tree again
+after a change made by any other; the version is read before the tree, both from the primary
+database (a replica may lag behind the version), so a tree is never cached under an older version
+than its own. Bulk operations and Category.objects.rebuild()
+do not change the version - call record_changes() after them, as for any other catalog change.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .catalog import catalog_version
+from .models import Category
+
+CACHE_KEY = "niunius:category-tree"
+
+
+def category_tree():
+    """All categories in the order of the tree, with their levels."""
+    key = f"{CACHE_KEY}:{catalog_version()}"
+    tree = cache.get(key)
+    if tree is None:
+        categories = Category.objects.using(DEFAULT_DB_ALIAS)
+        tree = list(categories.order_by("tree_id", "lft").only("id", "slug", "name", "level"))
+        cache.set(key, tree, getattr(settings, "CATEGORY_TREE_CACHE_TIMEOUT", 60 * 60))
+    return tree
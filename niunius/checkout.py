@@ -0,0 +1,144 @@
+"""
+Checkout: from the shopping cart to the placed order.
+
+The draft order is kept in one row per shopping cart and it is written once per submitted order form.
+The purchase is placed by a single conditional update of the draft order,
+so repeated or concurrent confirmations of the same order decrease the stock only once.
+The stock is decreased by inserting purchase stock movements into the stock ledger,
+product rows are not updated at checkout. They are locked though, like by reservations, while
+the ordered quantities are checked against the quantities available to sell once more:
+the reservation of the cart may have expired and its units may have been reserved by another cart.
+"""
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .inventory import with_items_available
+from .models import Address, CartItem, Order, Product, ShoppingCart, StockMovement, StockReservation
+from .reports import roll_up_order
+
+
+def forms_valid(*forms):
+    """Validate all forms (not only until the first invalid one), so all errors can be displayed."""
+    return all([form.is_valid() for form in forms])
+
+
+def save_draft_order(cart, form, delivery_form, payment_form, **details):
+    """
+    Create or update the draft order of the given cart with the address, delivery and payment details
+    and any other order details given (buyer or guest buyer data).
+    The idempotency key is renewed, so only the latest order confirmation page can place the order.
+    """
+    defaults = {
+        **form.cleaned_data,
+        "delivery": delivery_form.cleaned_data["delivery_method"],
+        "payment": payment_form.cleaned_data["payment_method"],
+        "idempotency_key": uuid.uuid4(),
+        **details,
+    }
+    order, _ = Order.objects.update_or_create(cart=cart, status=Order.DRAFT, defaults=defaults)
+    return order
+
+
+class OutOfStock(Exception):
+    """The ordered quantities of some products are no longer available; names of the products in args."""
+
+
+def check_stock(cart_id, items):
+    """
+    Lock the products of the cart items and raise OutOfStock
+    if the ordered quantities are more than available to the cart.
+    """
+    product_ids = sorted({item.product_id for item in items})
+    # always in the same order, so concurrent checkouts do not deadlock
+    list(Product.objects.select_for_update().filter(pk__in=product_ids).order_by("pk").values_list("pk"))
+    rows = with_items_available(CartItem.objects.filter(cart_id=cart_id), cart_id).values_list(
+        "product__name", "product_id", "variant_id", "quantity", "available"
+    )
+    ordered, available, names = Counter(), {}, {}
+    for name, product_id, variant_id, quantity, left in rows:
+        ordered[product_id, variant_id] += quantity
+        available[product_id, variant_id], names[product_id, variant_id] = left, name
+    missing = [names[key] for key, quantity in ordered.items() if quantity > available[key]]
+    if missing:
+        raise OutOfStock(*missing)
+
+
+def place_order(order, key):
+    """
+    Place the draft order confirmed with the given idempotency key.
+    Save current prices of products (or of their chosen variants) as unit prices of the cart items
+    and the totals of the order, record purchase stock movements of all ordered products and variants,
+    add them to the daily sales reports, release their reservations and close the shopping cart.
+
+    Return True if the order is placed by this call,
+    False if the key does not match the draft order (e.g. it has been already placed).
+    Raise OutOfStock (and leave the order a draft) if the ordered quantities are no longer available.
+    """
+    with transaction.atomic():
+        items = list(
+            CartItem.objects.filter(cart_id=order.cart_id)
+            .select_related("product", "variant")
+            .only("quantity", "product_id", "product__price", "variant_id", "variant__price")
+        )
+        subtotal = sum((item.quantity * item.price for item in items), Decimal("0.00"))
+        placed_at = timezone.now()
+        placed = Order.objects.filter(
+            pk=order.pk, status=Order.DRAFT, idempotency_key=key
+        ).update(status=Order.PLACED, subtotal=subtotal, total=subtotal, placed_at=placed_at)
+        if not placed:
+            return False
+        # the update rolls back with the exception
+        check_stock(order.cart_id, items)
+        order.placed_at = placed_at
+        for item in items:
+            item.unit_price = item.price
+        if items:
+            CartItem.objects.bulk_update(items, ["unit_price"])
+            StockMovement.objects.bulk_create(
+                [
+                    StockMovement(
+                        product_id=item.product_id,
+                        variant_id=item.variant_id,
+                        kind=StockMovement.PURCHASE,
+                        quantity=-item.quantity,
+                        order_id=order.pk,
+                    )
+                    for item in items
+                ]
+            )
+            roll_up_order(order, items)
+        StockReservation.objects.filter(cart_id=order.cart_id).delete()
+        ShoppingCart.objects.filter(pk=order.cart_id).update(is_ordered=True)
+    order.status = Order.PLACED
+    order.subtotal = order.total = subtotal
+    return True
+
+
+def is_placed(order, key):
+    """Check whether the order has been placed with the given idempotency key."""
+    return Order.objects.filter(pk=order.pk, status=Order.PLACED, idempotency_key=key).exists()
+
+
+def get_addresses(user):
+    """Saved addresses of the user, the default one first, then the most recently used."""
+    return list(user.addresses.order_by("-is_default", "-last_used"))
+
+
+def save_default_address(user, form):
+    """
+    Save the address from the order form in the address book of the user
+    and make it the default address.
+    """
+    address = {
+        "street": form.cleaned_data["address_street"],
+        "zipcode": form.cleaned_data["address_zipcode"],
+        "city": form.cleaned_data["address_city"],
+        "country": form.cleaned_data["address_country"],
+    }
+    with transaction.atomic():
+        user.addresses.filter(is_default=True).exclude(**address).update(is_default=False)
+        Address.objects.update_or_create(user=user, **address, defaults={"is_default": True})
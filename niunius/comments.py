@@ -0,0 +1,57 @@
+"""
+Threaded comments of articles.
+
+Comments are stored as trees of django-mptt: a comment without a parent starts a thread,
+replies are its descendants. Every thread is a tree of its own, so adding a reply moves
+positions (lft, rght) within one thread only, and a new thread takes the highest tree id -
+threads ordered by tree id descending are the newest first.
+
+A page of threads is read with one query: comments of the page's threads (a subquery of tree ids
+of the threads, with the limit of the page) ordered by thread and lft come in the order
+of a depth-first walk, with their users joined, so the template renders them as a flat list
+indented by level without a query per comment. Numbers of threads and comments for the paginator
+and the header are one more aggregate query.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import ArticleComment
+
+
+def threads_per_page():
+    return getattr(settings, "COMMENT_THREADS_PER_PAGE", 20)
+
+
+def comment_page(comments, number, per_page=None):
+    """
+    The given page of threads of the comments queryset (comments of one article).
+    Return (page, comments of its threads in the order of the tree, number of all comments).
+    """
+    totals = comments.aggregate(threads=Count("pk", filter=Q(parent=None)), comments=Count("pk"))
+    threads = comments.filter(parent=None).order_by("-tree_id").values("tree_id")
+    paginator = Paginator(threads, per_page or threads_per_page())
+    # already counted, the paginator would count the threads again
+    paginator.count = totals["threads"]
+    page = paginator.get_page(number)
+    thread_comments = (
+        comments.filter(tree_id__in=page.object_list).select_related("user").order_by("-tree_id", "lft")
+    )
+    return page, thread_comments, totals["comments"]
+
+
+def add_comment(article, user, text, parent=None):
+    """
+    Add a comment to the article, replying to the parent comment if given.
+    Concurrent comments would take the same positions in the tree: a new thread locks
+    the newest thread (the tree id is the next one after it), a reply locks the root of its thread
+    and positions of the parent are read again after the lock.
+    """
+    with transaction.atomic():
+        if parent is None:
+            list(ArticleComment.objects.filter(parent=None).order_by("-tree_id").select_for_update()[:1])
+        else:
+            ArticleComment.objects.select_for_update().get(tree_id=parent.tree_id, parent=None)
+            parent.refresh_from_db()
+        return ArticleComment.objects.create(article=article, user=user, text=text, parent=parent)
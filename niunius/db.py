@@ -0,0 +1,26 @@
+"""
+Health checks of persistent database connections.
+
+With CONN_MAX_AGE > 0 a connection is kept open between requests, but the database server (or a pooler,
+or a firewall) may close it in the meantime - the next request would then fail on its first query.
+At the start of each request, connections kept from previous requests with CONN_HEALTH_CHECKS in their
+settings are checked with a cheap query and closed if unusable, so they are reopened when needed.
+Connections just opened or inside a transaction are not checked.
+"""
+from django.core.signals import request_started
+from django.db import connections
+
+
+def check_connections(**kwargs):
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if not connection.settings_dict.get("CONN_HEALTH_CHECKS"):
+            continue
+        if not connection.is_usable():
+            connection.close()
+
+
+def connect_signals():
+    # connected after close_old_connections (django.db), so connections too old are closed first
+    request_started.connect(check_connections, dispatch_uid="db-health-checks")
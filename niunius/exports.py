@@ -0,0 +1,164 @@
+"""
+Export of orders for accounting, as CSV (one row per ordered item) or JSON Lines (one order per line).
+
+Orders and their items are read with a single query iterated in chunks (a server-side cursor
+where the database supports it) and written out row by row, so exports of any size are produced
+in constant memory - e.g. as the content of a StreamingHttpResponse.
+"""
+import csv
+import json
+from itertools import groupby
+
+from django.utils import timezone
+
+ORDER_FIELDS = [
+    "pk",
+    "placed_at",
+    "status",
+    "paid",
+    "buyer__username",
+    "buyer__email",
+    "buyer__first_name",
+    "buyer__last_name",
+    "guest_buyer_email",
+    "guest_buyer_first_name",
+    "guest_buyer_last_name",
+    "address_street",
+    "address_zipcode",
+    "address_city",
+    "address_country",
+    "delivery",
+    "payment",
+    "subtotal",
+    "total",
+]
+ITEM_FIELDS = [
+    "cart__cartitem__pk",
+    "cart__cartitem__product__code",
+    "cart__cartitem__product__name",
+    "cart__cartitem__quantity",
+    "cart__cartitem__unit_price",
+    "cart__cartitem__product__price",
+    "cart__cartitem__variant__code",
+    "cart__cartitem__variant__name",
+    "cart__cartitem__variant__price",
+]
+
+CSV_COLUMNS = [
+    "order",
+    "placed_at",
+    "status",
+    "paid",
+    "username",
+    "email",
+    "first_name",
+    "last_name",
+    "street",
+    "zipcode",
+    "city",
+    "country",
+    "delivery",
+    "payment",
+    "subtotal",
+    "total",
+    "product_code",
+    "product_name",
+    "quantity",
+    "unit_price",
+    "value",
+]
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+}
+
+
+def order_rows(queryset, chunk_size=2000):
+    """Rows of the orders joined with their items (one row per item), ordered by order."""
+    return (
+        queryset.order_by("pk", "cart__cartitem__pk")
+        .values(*ORDER_FIELDS, *ITEM_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def decimal(value):
+    return str(value) if value is not None else None
+
+
+def order_data(row):
+    """Order details of the row; buyer details come from the user or from the guest data."""
+    buyer = row["buyer__username"] is not None
+    return {
+        "order": row["pk"],
+        # drafts (exported with --all) have not been placed yet
+        "placed_at": timezone.localtime(row["placed_at"]).isoformat() if row["placed_at"] else None,
+        "status": row["status"],
+        "paid": row["paid"],
+        "username": row["buyer__username"],
+        "email": row["buyer__email"] if buyer else row["guest_buyer_email"],
+        "first_name": row["buyer__first_name"] if buyer else row["guest_buyer_first_name"],
+        "last_name": row["buyer__last_name"] if buyer else row["guest_buyer_last_name"],
+        "street": row["address_street"],
+        "zipcode": row["address_zipcode"],
+        "city": row["address_city"],
+        "country": row["address_country"],
+        "delivery": row["delivery"],
+        "payment": row["payment"],
+        "subtotal": decimal(row["subtotal"]),
+        "total": decimal(row["total"]),
+    }
+
+
+def item_data(row):
+    """Item details of the row, None for an order without items."""
+    if row["cart__cartitem__pk"] is None:
+        return None
+    # unit prices of orders not placed yet are not saved, current prices are exported then
+    price = row["cart__cartitem__unit_price"]
+    if price is None:
+        price = row["cart__cartitem__variant__price"]
+    if price is None:
+        price = row["cart__cartitem__product__price"]
+    # an item of a variant is exported with the code of the variant
+    name = row["cart__cartitem__product__name"]
+    if row["cart__cartitem__variant__code"] is not None:
+        name = f"{name} ({row['cart__cartitem__variant__name']})"
+    return {
+        "product_code": row["cart__cartitem__variant__code"] or row["cart__cartitem__product__code"],
+        "product_name": name,
+        "quantity": row["cart__cartitem__quantity"],
+        "unit_price": decimal(price),
+        "value": decimal(row["cart__cartitem__quantity"] * price),
+    }
+
+
+class Echo:
+    """File-like object returning what is written, so csv.writer can produce lines one by one."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(queryset, chunk_size=2000):
+    """Generate lines of the CSV export: the header and one line per ordered item."""
+    writer = csv.DictWriter(Echo(), fieldnames=CSV_COLUMNS)
+    yield writer.writerow(dict(zip(CSV_COLUMNS, CSV_COLUMNS)))
+    for row in order_rows(queryset, chunk_size):
+        yield writer.writerow({**order_data(row), **(item_data(row) or {})})
+
+
+def export_jsonl(queryset, chunk_size=2000):
+    """Generate lines of the JSON Lines export: one order with the list of its items per line."""
+    for _, rows in groupby(order_rows(queryset, chunk_size), key=lambda row: row["pk"]):
+        rows = list(rows)
+        order = order_data(rows[0])
+        order["items"] = [item for item in map(item_data, rows) if item is not None]
+        yield json.dumps(order, ensure_ascii=False) + "\n"
+
+
+def export(queryset, format, chunk_size=2000):
+    """Generate lines of the export of the orders in the given format ("csv" or "jsonl")."""
+    exporter = export_csv if format == "csv" else export_jsonl
+    return exporter(queryset, chunk_size)
@@ -0,0 +1,178 @@
+"""
+Faceted filtering of products: by cars, categories, price bands and availability.
+
+Values chosen within one facet are alternatives (e.g. fits Niva or UAZ), facets are combined
+(fits Niva and is in the lighting category). Every value of a facet shows the number of products
+which would be listed after choosing it: the count applies filters of all the other facets
+(not of its own one). Counts of all facets are read with one query - a UNION ALL of one grouped
+query per facet - so a page costs the same number of queries whatever is chosen.
+
+A category stands for its whole subtree: choosing it lists products of it and of all its
+subcategories, and its count is the number of such products.
+"""
+from django.db.models import Case, CharField, Count, Exists, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Car, Category, Product
+
+# Key: label, lowest price, price above the band (None - no limit).
+PRICE_BANDS = {
+    "0-50": ("do 50 zł", 0, 50),
+    "50-100": ("50 - 100 zł", 50, 100),
+    "100-250": ("100 - 250 zł", 100, 250),
+    "250-500": ("250 - 500 zł", 250, 500),
+    "500-": ("powyżej 500 zł", 500, None),
+}
+
+FACETS = ("car", "category", "price", "in_stock")
+
+
+class ProductFilters:
+    """
+    Values of facets chosen in the query string:
+    Cars: slugs of cars (?car=), Categories: slugs of categories (?category=),
+    Prices: keys of PRICE_BANDS (?price=), In stock: only products in stock (?in_stock=1)
+    """
+
+    def __init__(self, data):
+        self.cars = data.getlist("car")
+        self.categories = data.getlist("category")
+        self.prices = [key for key in data.getlist("price") if key in PRICE_BANDS]
+        self.in_stock = data.get("in_stock") == "1"
+
+    def chosen(self, facet):
+        return {
+            "car": self.cars,
+            "category": self.categories,
+            "price": self.prices,
+            "in_stock": ["1"] if self.in_stock else [],
+        }[facet]
+
+
+def price_band_q(key):
+    _, low, high = PRICE_BANDS[key]
+    q = Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lt=high)
+    return q
+
+
+def filter_products(queryset, filters, skip=None):
+    """Filter the products by the chosen values of all facets but the skipped one."""
+    if skip != "car" and filters.cars:
+        fitting = Product.cars.through.objects.filter(car__slug__in=filters.cars).values("product_id")
+        queryset = queryset.filter(pk__in=fitting)
+    if skip != "category" and filters.categories:
+        # the linked category is within the subtree of a chosen one
+        chosen = Category.objects.filter(
+            slug__in=filters.categories,
+            tree_id=OuterRef("category__tree_id"),
+            lft__lte=OuterRef("category__lft"),
+            rght__gte=OuterRef("category__lft"),
+        )
+        belonging = Product.categories.through.objects.filter(Exists(chosen)).values("product_id")
+        queryset = queryset.filter(pk__in=belonging)
+    if skip != "price" and filters.prices:
+        q = Q()
+        for key in filters.prices:
+            q |= price_band_q(key)
+        queryset = queryset.filter(q)
+    if skip != "in_stock" and filters.in_stock:
+        queryset = queryset.filter(stock__gt=0)
+    return queryset
+
+
+def facet_counts(filters):
+    """
+    Numbers of products per value of each facet, with filters of the other facets.
+    Return {facet: {value: count}}; values are ids of cars and categories (as strings),
+    keys of price bands and "1" (in stock).
+    """
+
+    def grouped(queryset, facet, key, count):
+        return (
+            queryset.annotate(facet=Value(facet, output_field=CharField()), key=key)
+            .values("facet", "key")
+            .annotate(count=Count(count))
+            .values_list("facet", "key", "count")
+        )
+
+    products = Product.objects.all()
+    cars = grouped(
+        Product.cars.through.objects.filter(product__in=filter_products(products, filters, skip="car")),
+        "car",
+        Cast("car_id", CharField()),
+        "product_id",
+    )
+    # products of the subtree of each category, counted by a subquery as subtrees overlap
+    in_subtree = (
+        Product.categories.through.objects.filter(
+            category__tree_id=OuterRef("tree_id"),
+            category__lft__gte=OuterRef("lft"),
+            category__lft__lte=OuterRef("rght"),
+            product__in=filter_products(products, filters, skip="category"),
+        )
+        .order_by()
+        .values("category__tree_id")
+        .annotate(count=Count("product_id", distinct=True))
+        .values("count")
+    )
+    categories = (
+        Category.objects.order_by()
+        .annotate(
+            facet=Value("category", output_field=CharField()),
+            key=Cast("pk", CharField()),
+            count=Coalesce(Subquery(in_subtree, output_field=IntegerField()), 0),
+        )
+        .values_list("facet", "key", "count")
+    )
+    bands = Case(
+        *[When(price_band_q(key), then=Value(key)) for key in PRICE_BANDS],
+        output_field=CharField(),
+    )
+    prices = grouped(filter_products(products, filters, skip="price"), "price", bands, "id")
+    in_stock = grouped(
+        filter_products(products, filters, skip="in_stock").filter(stock__gt=0),
+        "in_stock",
+        Value("1", output_field=CharField()),
+        "id",
+    )
+    counts = {facet: {} for facet in FACETS}
+    for facet, key, count in cars.union(categories, prices, in_stock, all=True):
+        if key is not None and count:
+            counts[facet][key] = count
+    return counts
+
+
+def facets(filters, counts):
+    """
+    Facets with their values for the filter form: name, title and options (value, label, count, chosen
+    and level - subcategories are indented).
+    """
+    cars = Car.objects.order_by("brand", "model").only("id", "slug", "brand", "model")
+    categories = Category.objects.order_by("tree_id", "lft").only("id", "slug", "name", "level")
+    # value, label, key of counts, level (of subcategories)
+    values = {
+        "car": [(car.slug, car.name, str(car.pk), 0) for car in cars],
+        "category": [
+            (category.slug, category.name, str(category.pk), category.level) for category in categories
+        ],
+        "price": [(key, label, key, 0) for key, (label, _, _) in PRICE_BANDS.items()],
+        "in_stock": [("1", "tylko dostępne", "1", 0)],
+    }
+    titles = {"car": "Model auta", "category": "Kategoria", "price": "Cena", "in_stock": "Dostępność"}
+    result = []
+    for facet in FACETS:
+        chosen = filters.chosen(facet)
+        options = [
+            {
+                "value": value,
+                "label": label,
+                "count": counts[facet].get(key, 0),
+                "chosen": value in chosen,
+                "level": level,
+            }
+            for value, label, key, level in values[facet]
+        ]
+        result.append({"name": facet, "title": titles[facet], "options": options})
+    return result
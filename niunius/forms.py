@@ -8,7 +8,9 @@ from django.core.validators import RegexValidator
 from django.forms import SelectDateWidget
 from django.utils import timezone
 
-from .models import Article, ArticleComment, Order, CarService
+from .inventory import current_stock
+from .models import Article, ArticleComment, Order, CarService, Product, ProductVariant
+from .photos import check_photo
 
 
 class UserForm(UserCreationForm):
@@ -105,9 +107,10 @@ class ArticleForm(forms.ModelForm):
     """
     The form that allows users adding new Article object.
     Additional "photos" field serves to add photos to ArticlePhoto model.
+    Photos are checked by their headers only, they are decoded later by the photo ingestion workers.
     """
 
-    photos = forms.ImageField(
+    photos = forms.FileField(
         label="",
         widget=forms.ClearableFileInput(
             attrs={"multiple": True, "style": "display: none"}
@@ -124,14 +127,38 @@ class ArticleForm(forms.ModelForm):
             "content": forms.Textarea(attrs={"placeholder": "Opis"}),
         }
 
+    def __init__(self, *args, skipped_uploads=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.skipped_uploads = skipped_uploads
+
+    def clean_photos(self):
+        """Check all uploaded photos (the field itself keeps only the last one)."""
+        errors = [f"Plik {name} jest zbyt duży." for name in self.skipped_uploads]
+        photos = self.files.getlist("photos") if self.files else []
+        for photo in photos:
+            try:
+                check_photo(photo)
+            except ValidationError as e:
+                errors.extend(e.messages)
+        if errors:
+            raise ValidationError(errors)
+        return photos
+
 
 class ArticleCommentForm(forms.ModelForm):
     """The form that allows users adding comments to articles."""
 
     class Meta:
         model = ArticleComment
-        fields = ["text"]
+        fields = ["text", "parent"]
         labels = {"text": ""}
+        widgets = {"parent": forms.HiddenInput()}
+
+    def __init__(self, *args, article=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # replies only to comments of the same article
+        if article is not None:
+            self.fields["parent"].queryset = article.articlecomment_set.all()
 
 
 class BuyerForm(forms.ModelForm):
@@ -143,6 +170,23 @@ class BuyerForm(forms.ModelForm):
         labels = {"first_name": "Imię", "last_name": "Nazwisko", "email": "E-mail"}
 
 
+class QuantityForm(forms.Form):
+    """The quantity of the product added to the shopping cart or changed in it."""
+
+    qty = forms.IntegerField(
+        min_value=1,
+        error_messages={
+            "required": "Podaj ilość produktu.",
+            "invalid": "Ilość musi być liczbą całkowitą.",
+            "min_value": "Ilość musi być większa od zera.",
+        },
+    )
+
+    def error(self):
+        """The first error of the quantity, to be displayed on the page."""
+        return self.errors["qty"][0]
+
+
 class GuestForm(forms.Form):
     """
     The one of order forms for personal data of the buyer
@@ -206,3 +250,61 @@ class OrderForm(forms.ModelForm):
             "address_zipcode": forms.TextInput(attrs={"placeholder": "XX-XXX"}),
             "address_country": forms.TextInput(attrs={"value": "Polska"}),
         }
+
+
+class ProductAdminForm(forms.ModelForm):
+    """
+    The admin form for products.
+    The stock of existing products is changed with stock movements,
+    so instead of editing the stock, the change of the stock is entered.
+    """
+
+    stock_change = forms.IntegerField(
+        required=False,
+        label="Zmiana stanu",
+        help_text="Dostawa - liczba dodatnia, korekta - liczba dodatnia lub ujemna.",
+    )
+    stock_change_kind = forms.ChoiceField(
+        choices=[("restock", "Dostawa"), ("adjustment", "Korekta")],
+        initial="restock",
+        label="Rodzaj zmiany",
+    )
+
+    class Meta:
+        model = Product
+        exclude = ["slug"]
+
+    def current_stock(self):
+        return current_stock(self.instance)
+
+    def clean(self):
+        """A delivery adds to the stock, no change can take the current stock below zero."""
+        cleaned_data = super().clean()
+        change = cleaned_data.get("stock_change")
+        if change:
+            if cleaned_data.get("stock_change_kind") == "restock" and change < 0:
+                self.add_error("stock_change", "Dostawa musi być liczbą dodatnią.")
+            elif self.instance.pk and self.current_stock() + change < 0:
+                self.add_error("stock_change", "Stan nie może spaść poniżej zera.")
+        return cleaned_data
+
+
+class ProductVariantAdminForm(ProductAdminForm):
+    """
+    The admin form for variants of products, within the product.
+    The stock is entered for new variants only, like for products.
+    """
+
+    class Meta:
+        model = ProductVariant
+        fields = ["name", "code", "price", "stock"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields["stock"].disabled = True
+        else:
+            self.fields["stock_change"].disabled = True
+
+    def current_stock(self):
+        return current_stock(self.instance.product, variant=self.instance)
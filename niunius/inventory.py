@@ -0,0 +1,235 @@
+"""
+Stock ledger and stock reservations.
+
+Every change of the stock is recorded as a StockMovement row, so placing orders does not update product rows.
+Product.stock is the balance as of the last compaction of the ledger (compact_ledger),
+the current stock is the balance plus stock movements not applied yet.
+
+Adding a product to a shopping cart reserves its quantity for some time (settings.STOCK_RESERVATION_TTL),
+so several carts cannot hold the last unit of a product.
+The quantity available to sell is the current stock minus active (not expired) reservations.
+
+Products with variants are sold by variants: stock movements and reservations of a variant refer
+to both the variant and its product, so the stock and the quantity available to sell of the product
+are those of all its variants together.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .catalog import record_changes
+from .models import Product, ProductVariant, StockMovement, StockReservation
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, "STOCK_RESERVATION_TTL", 30 * 60))
+
+
+def pending_movements(ref, field="product"):
+    """Sum of stock movements not applied yet for the product (or variant) referenced from the outer query."""
+    movements = StockMovement.objects.filter(**{field: OuterRef(ref)}, applied=False)
+    return sum_subquery(movements)
+
+
+def sum_subquery(queryset):
+    total = queryset.values("product").annotate(total=Sum("quantity")).values("total")
+    return Coalesce(Subquery(total), Value(0), output_field=IntegerField())
+
+
+def with_current_stock(queryset, field="product"):
+    """
+    Annotate products (or variants, field="variant") with the current stock:
+    the balance plus stock movements not applied yet.
+    """
+    return queryset.annotate(current_stock=F("stock") + pending_movements("pk", field))
+
+
+def current_stock(product, variant=None):
+    """
+    Current stock of the product (or of its variant): the balance plus stock movements not applied yet,
+    in one query.
+    """
+    if variant is not None:
+        queryset = with_current_stock(ProductVariant.objects.filter(pk=variant.pk), "variant")
+    else:
+        queryset = with_current_stock(Product.objects.filter(pk=product.pk))
+    return queryset.values_list("current_stock", flat=True).get()
+
+
+def available_expression(field, exclude_cart=None, prefix=""):
+    """
+    The quantity available to sell of products or variants (field "product" or "variant"),
+    referenced through the given prefix: the current stock minus active reservations.
+    """
+    reservations = StockReservation.objects.filter(
+        **{field: OuterRef(f"{prefix}pk")}, expires__gt=timezone.now()
+    )
+    if exclude_cart is not None:
+        reservations = reservations.exclude(cart=exclude_cart)
+    return F(f"{prefix}stock") + pending_movements(f"{prefix}pk", field) - sum_subquery(reservations)
+
+
+def with_available(queryset, exclude_cart=None, prefix=""):
+    """
+    Annotate products (or objects related to products through the given prefix, e.g. "product__")
+    with the quantity available to sell: the current stock minus active reservations.
+    Reservations of exclude_cart are not subtracted - the cart can keep what it has already reserved.
+    """
+    return queryset.annotate(available=available_expression("product", exclude_cart, prefix))
+
+
+def with_variant_available(queryset, exclude_cart=None, prefix=""):
+    """Annotate variants (or objects related to variants through the given prefix) like with_available()."""
+    return queryset.annotate(available=available_expression("variant", exclude_cart, prefix))
+
+
+def with_items_available(items, cart):
+    """Annotate cart items with the quantity of their variants (or products) available to the cart."""
+    return items.annotate(
+        available=Case(
+            When(variant=None, then=available_expression("product", cart, "product__")),
+            default=available_expression("variant", cart, "variant__"),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def available_to_sell(product, exclude_cart=None, variant=None):
+    """Quantity of the product (or of its variant) available to sell, computed with one aggregate query."""
+    if variant is not None:
+        queryset = with_variant_available(ProductVariant.objects.filter(pk=variant.pk), exclude_cart)
+    else:
+        queryset = with_available(Product.objects.filter(pk=product.pk), exclude_cart)
+    return queryset.values_list("available", flat=True).get()
+
+
+def reserve(product, cart, quantity, variant=None):
+    """
+    Reserve the given quantity of the product (or of its given variant) for the cart
+    (replacing the previous reservation of the cart, if any) and extend the reservation time.
+    The product row is locked for the time of the check, so concurrent reservations
+    of the same product or its variants are checked one after another.
+
+    Return True if reserved, False if the quantity is not available.
+    """
+    with transaction.atomic():
+        Product.objects.select_for_update().filter(pk=product.pk).values_list("pk").get()
+        if quantity > available_to_sell(product, exclude_cart=cart, variant=variant):
+            return False
+        StockReservation.objects.update_or_create(
+            cart=cart,
+            product=product,
+            variant=variant,
+            defaults={"quantity": quantity, "expires": timezone.now() + reservation_ttl()},
+        )
+    return True
+
+
+def release(cart, product=None, variant=None):
+    """Release reservations of the cart: all of them or only the one of the given product (and variant)."""
+    reservations = StockReservation.objects.filter(cart=cart)
+    if product is not None:
+        reservations = reservations.filter(product=product, variant=variant)
+    reservations.delete()
+
+
+def release_expired(batch_size=1000):
+    """Delete expired reservations in batches. Return the number of deleted reservations."""
+    deleted = 0
+    while True:
+        batch = list(
+            StockReservation.objects.filter(expires__lte=timezone.now()).values_list("pk", flat=True)[
+                :batch_size
+            ]
+        )
+        if not batch:
+            return deleted
+        deleted += StockReservation.objects.filter(pk__in=batch).delete()[0]
+
+
+def record_movement(product, kind, quantity, order=None, variant=None):
+    """Record the change of the stock of the product (or of its variant) in the stock ledger."""
+    return StockMovement.objects.create(
+        product=product, variant=variant, kind=kind, quantity=quantity, order=order
+    )
+
+
+class ConcurrentCompaction(Exception):
+    """Some of the stock movements have been applied by another compaction in the meantime."""
+
+
+def compact_ledger(batch_size=1000):
+    """
+    Apply stock movements not applied yet to Product.stock and ProductVariant.stock, in batches of movements.
+    Each batch is one transaction: one update of the products (and of the variants)
+    and one update of the movements.
+    A movement applied by a concurrent compaction makes the batch roll back and it is retried.
+
+    Return the number of applied movements.
+    """
+    applied = 0
+    while True:
+        movements = list(
+            StockMovement.objects.filter(applied=False)
+            .order_by("pk")
+            .values_list("pk", "product_id", "variant_id", "quantity")[:batch_size]
+        )
+        if not movements:
+            return applied
+        deltas, variant_deltas = {}, {}
+        for _, product_id, variant_id, quantity in movements:
+            deltas[product_id] = deltas.get(product_id, 0) + quantity
+            if variant_id is not None:
+                variant_deltas[variant_id] = variant_deltas.get(variant_id, 0) + quantity
+        pks = [pk for pk, _, _, _ in movements]
+        try:
+            with transaction.atomic():
+                marked = StockMovement.objects.filter(pk__in=pks, applied=False).update(applied=True)
+                if marked != len(pks):
+                    raise ConcurrentCompaction
+                for model, changes in ((Product, deltas), (ProductVariant, variant_deltas)):
+                    if changes:
+                        model.objects.filter(pk__in=changes).update(
+                            stock=Case(
+                                *[When(pk=pk, then=F("stock") + delta) for pk, delta in changes.items()]
+                            )
+                        )
+                # the catalog index reads the stock of changed products again
+                record_changes(Product, deltas)
+        except ConcurrentCompaction:
+            continue
+        applied += len(pks)
+
+
+def reconcile(batch_size=1000, fix=False, model=Product):
+    """
+    Compare the stock of products (or of variants, model=ProductVariant) with the sum
+    of their applied stock movements, in batches. If fix is True, set the stock to the sum from the ledger.
+
+    Yield (pk, stock, sum from the ledger) for each mismatch.
+    """
+    field = "variant" if model is ProductVariant else "product"
+    applied = sum_subquery(StockMovement.objects.filter(**{field: OuterRef("pk")}, applied=True))
+    last_pk = 0
+    while True:
+        batch = list(
+            model.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .annotate(ledger=applied)
+            .values_list("pk", "stock", "ledger")[:batch_size]
+        )
+        if not batch:
+            return
+        mismatches = [(pk, stock, ledger) for pk, stock, ledger in batch if stock != ledger]
+        if fix and mismatches:
+            # the sum is computed again in the update, so a concurrent compaction is taken into account
+            fixed = [pk for pk, _, _ in mismatches]
+            model.objects.filter(pk__in=fixed).update(stock=applied)
+            if model is Product:
+                record_changes(Product, fixed)
+        yield from mismatches
+        last_pk = batch[-1][0]
@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from niunius.models import CartItem, Order
+
+
+class Command(BaseCommand):
+    """
+    Save unit prices of cart items and totals of placed orders which were placed
+    before prices and totals were saved at the purchase.
+    The original prices are not known, so current prices of products are used.
+    Orders are processed in batches, each batch in its own transaction.
+    """
+
+    help = "Backfill unit prices and totals of placed orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        pending = Order.objects.filter(status=Order.PLACED, total__isnull=True).order_by("pk")
+        last_pk = 0
+        done = 0
+        while True:
+            orders = list(pending.filter(pk__gt=last_pk).only("pk", "cart_id")[: options["batch_size"]])
+            if not orders:
+                break
+            with transaction.atomic():
+                self.backfill(orders)
+            last_pk = orders[-1].pk
+            done += len(orders)
+            self.stdout.write(f"{done} orders backfilled")
+        self.stdout.write(self.style.SUCCESS(f"Done, {done} orders backfilled."))
+
+    def backfill(self, orders):
+        items = list(
+            CartItem.objects.filter(cart_id__in=[order.cart_id for order in orders])
+            .select_related("product")
+            .only("quantity", "unit_price", "cart_id", "product__price")
+        )
+        subtotals = {order.cart_id: Decimal("0.00") for order in orders}
+        for item in items:
+            if item.unit_price is None:
+                item.unit_price = item.product.price
+            subtotals[item.cart_id] += item.quantity * item.unit_price
+        CartItem.objects.bulk_update(items, ["unit_price"], batch_size=1000)
+        for order in orders:
+            order.subtotal = order.total = subtotals[order.cart_id]
+        Order.objects.bulk_update(orders, ["subtotal", "total"], batch_size=1000)
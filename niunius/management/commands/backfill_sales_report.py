@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from niunius.models import Order
+from niunius.reports import rebuild_day
+
+
+class Command(BaseCommand):
+    """
+    Rebuild daily sales aggregates from placed orders, one day (and one transaction) at a time.
+    New orders are rolled up when they are placed, so it is needed for the history only.
+    By default days until yesterday are rebuilt - rebuilding a day while orders are being placed
+    may conflict with them.
+    """
+
+    help = "Rebuild daily sales aggregates of products, categories and cars from placed orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="first day to rebuild, YYYY-MM-DD")
+        parser.add_argument("--until", help="last day to rebuild, YYYY-MM-DD (default: yesterday)")
+
+    def handle(self, *args, **options):
+        since = self.parse_day(options["since"]) if options["since"] else None
+        until = (
+            self.parse_day(options["until"])
+            if options["until"]
+            else timezone.localdate() - timedelta(days=1)
+        )
+        days = (
+            Order.objects.filter(status=Order.PLACED)
+            .dates("placed_at", "day")
+            .filter(placed_at__date__lte=until)
+        )
+        if since is not None:
+            days = days.filter(placed_at__date__gte=since)
+        rebuilt = 0
+        for day in days.iterator():
+            rebuild_day(day)
+            rebuilt += 1
+            self.stdout.write(f"{day} rebuilt")
+        self.stdout.write(self.style.SUCCESS(f"Done, {rebuilt} days rebuilt."))
+
+    def parse_day(self, value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Invalid date: {value}")
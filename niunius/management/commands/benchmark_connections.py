@@ -0,0 +1,106 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+
+from niunius.management.commands.loadtest import summarize
+
+
+class Command(BaseCommand):
+    """
+    Measure how much opening database connections adds to request latency.
+
+    The pages are requested in-process (without an HTTP server), connections are closed at the start
+    and at the end of each request as in real ones, in two modes:
+        per-request - CONN_MAX_AGE = 0, each request opens and closes its own connection
+        persistent - CONN_MAX_AGE of the settings profile (at least 60 seconds), the connection is reused
+    The report contains latency percentiles per mode, the number of connections opened
+    and the mean time of opening one.
+    """
+
+    help = "Benchmark request latency with per-request and persistent database connections."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", default="shop,blog", help="URL names of pages without arguments")
+        parser.add_argument("--requests", type=int, default=200, help="requests per mode")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--output", default="benchmark_connections.json")
+
+    def handle(self, *args, **options):
+        try:
+            paths = [reverse(name.strip()) for name in options["pages"].split(",")]
+        except NoReverseMatch as e:
+            raise CommandError(e)
+        connection = connections[options["database"]]
+        max_age = connection.settings_dict["CONN_MAX_AGE"]
+        persistent_age = max(max_age or 0, 60) if max_age is not None else None
+
+        report = {
+            "meta": {
+                "started": timezone.now().isoformat(),
+                "vendor": connection.vendor,
+                "requests": options["requests"],
+                "paths": paths,
+                "connect_ms": self.connect_time(connection),
+            },
+            "modes": {},
+        }
+        try:
+            for mode, conn_max_age in (("per-request", 0), ("persistent", persistent_age)):
+                report["modes"][mode] = self.run(connection, conn_max_age, paths, options["requests"])
+        finally:
+            connection.close()
+            connection.settings_dict["CONN_MAX_AGE"] = max_age
+
+        with open(options["output"], "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        self.stdout.write(f"opening a connection: {report['meta']['connect_ms']} ms")
+        for mode, result in report["modes"].items():
+            self.stdout.write(
+                f"{mode:12} p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  "
+                f"mean {result['mean_ms']} ms  connections opened {result['connections_opened']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def connect_time(self, connection, repeat=10):
+        connection.close()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            connection.connect()
+            connection.close()
+        return round((time.perf_counter() - start) / repeat * 1000, 2)
+
+    def run(self, connection, conn_max_age, paths, requests):
+        connection.close()
+        connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        hosts = [host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"]
+        client = Client(HTTP_HOST=hosts[0] if hosts else "localhost")
+        samples = []
+        connection_created.connect(count)
+        try:
+            start = time.perf_counter()
+            for i in range(requests):
+                request_start = time.perf_counter()
+                close_old_connections()
+                response = client.get(paths[i % len(paths)])
+                close_old_connections()
+                samples.append((time.perf_counter() - request_start, response.status_code == 200))
+            elapsed = time.perf_counter() - start
+        finally:
+            connection_created.disconnect(count)
+        result = summarize(samples, elapsed)
+        result["conn_max_age"] = conn_max_age
+        result["connections_opened"] = opened.count(connection.alias)
+        return result
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from niunius.catalog import compact_changes
+
+
+class Command(BaseCommand):
+    """
+    Remove changes of products, cars and categories deleted more than
+    settings.CATALOG_CHANGES_RETENTION_DAYS ago from the changes served by the catalog API.
+    Clients which have not synchronized since then download the whole catalog again.
+    Run it periodically, e.g. once a day from cron.
+    """
+
+    help = "Compact changes of the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=None, help="keep changes from the given number of days"
+        )
+
+    def handle(self, *args, **options):
+        removed = compact_changes(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"{removed} changes of deleted objects removed."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from niunius.inventory import compact_ledger
+
+
+class Command(BaseCommand):
+    """
+    Apply stock movements (purchases, restocks, adjustments) recorded since the last compaction
+    to the stock of products, in batches.
+    Run it periodically, e.g. every minute from cron - product lists skip products with no stock
+    according to the stock as of the last compaction.
+    """
+
+    help = "Apply pending stock movements to the stock of products."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        applied = compact_ledger(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{applied} stock movements applied."))
@@ -0,0 +1,203 @@
+import json
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from niunius.management.commands.loadtest import summarize
+from niunius.models import Article, Car, Category, Product
+
+# Mode: gunicorn worker class serving the app.
+SERVERS = {
+    "wsgi": ("my_django_project.wsgi:application", "sync"),
+    "asgi": ("my_django_project.asgi:application", "uvicorn.workers.UvicornWorker"),
+}
+
+
+class Command(BaseCommand):
+    """
+    Compare the WSGI and the ASGI mode serving the read-only shop and blog pages.
+
+    For each mode a gunicorn server is started with the same number of worker processes
+    (sync workers for WSGI, uvicorn workers for ASGI). Fast clients request pages one after another
+    while slow clients keep connections busy: they send the request and read the response
+    a few bytes at a time, like phones on a poor mobile network.
+    The report contains req/s and latency percentiles of the fast clients and the number of
+    requests completed by the slow clients, per mode.
+
+    Use seed_shop to generate the data set first.
+    """
+
+    help = "Benchmark the WSGI and the ASGI mode under concurrent slow clients."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", default="wsgi,asgi")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8010, help="port of the first server")
+        parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+        parser.add_argument("--duration", type=float, default=30, help="seconds per mode")
+        parser.add_argument("--concurrency", type=int, default=8, help="fast clients")
+        parser.add_argument("--slow-clients", type=int, default=16)
+        parser.add_argument(
+            "--slow-delay",
+            type=float,
+            default=0.2,
+            help="seconds between chunks sent or read by a slow client",
+        )
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--output", default="compare_servers.json")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options["modes"].split(",") if mode.strip()]
+        for mode in modes:
+            if mode not in SERVERS:
+                raise CommandError(f"Unknown mode: {mode}")
+        random.seed(options["seed"])
+        self.paths = self.load_paths()
+
+        report = {
+            "meta": {
+                "started": timezone.now().isoformat(),
+                "workers": options["workers"],
+                "duration_s": options["duration"],
+                "concurrency": options["concurrency"],
+                "slow_clients": options["slow_clients"],
+                "slow_delay_s": options["slow_delay"],
+            },
+            "modes": {},
+        }
+        for offset, mode in enumerate(modes):
+            address = (options["host"], options["port"] + offset)
+            server = self.start_server(mode, address, options["workers"])
+            try:
+                report["modes"][mode] = self.run(address, options)
+            finally:
+                server.terminate()
+                server.wait()
+
+        with open(options["output"], "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        for mode, result in report["modes"].items():
+            fast = result["fast"]
+            self.stdout.write(
+                f"{mode:5} {fast['req_per_s']:8} req/s  p50 {fast['p50_ms']} ms  p99 {fast['p99_ms']} ms  "
+                f"errors {fast['error_rate']:.2%}  slow requests {result['slow_requests']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def load_paths(self):
+        products = list(Product.objects.exclude(stock=0).values_list("slug", flat=True)[:1000])
+        if not products:
+            raise CommandError("No products in stock. Run 'manage.py seed_shop' first.")
+        paths = [reverse("shop"), reverse("blog")]
+        paths += [reverse("product", args=[slug]) for slug in products]
+        paths += [reverse("car", args=[slug]) for slug in Car.objects.values_list("slug", flat=True)]
+        paths += [
+            reverse("category", args=[slug]) for slug in Category.objects.values_list("slug", flat=True)
+        ]
+        paths += [
+            reverse("article-detail", args=[slug])
+            for slug in Article.objects.exclude(slug="o-klubie").values_list("slug", flat=True)[:1000]
+        ]
+        return paths
+
+    def start_server(self, mode, address, workers):
+        app, worker_class = SERVERS[mode]
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                app,
+                "--worker-class",
+                worker_class,
+                "--workers",
+                str(workers),
+                "--bind",
+                f"{address[0]}:{address[1]}",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        url = f"http://{address[0]}:{address[1]}{reverse('shop')}"
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(url, timeout=1).read()
+                return server
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"gunicorn did not start the {mode} mode on {address[0]}:{address[1]}")
+
+    def run(self, address, options):
+        base_url = f"http://{address[0]}:{address[1]}"
+        samples = []
+        slow_requests = []
+        lock = threading.Lock()
+        deadline = time.monotonic() + options["duration"]
+
+        def fast_client():
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(
+                        base_url + random.choice(self.paths), timeout=options["timeout"]
+                    ) as response:
+                        response.read()
+                    ok = True
+                except (urllib.error.URLError, OSError):
+                    ok = False
+                with lock:
+                    samples.append((time.perf_counter() - start, ok))
+
+        def slow_client():
+            while time.monotonic() < deadline:
+                if self.slow_request(address, random.choice(self.paths), options):
+                    with lock:
+                        slow_requests.append(1)
+
+        threads = [threading.Thread(target=fast_client, daemon=True) for _ in range(options["concurrency"])]
+        threads += [threading.Thread(target=slow_client, daemon=True) for _ in range(options["slow_clients"])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return {"fast": summarize(samples, elapsed), "slow_requests": len(slow_requests)}
+
+    def slow_request(self, address, path, options):
+        """Send the request one header line at a time and read the response in small chunks."""
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {address[0]}",
+            "User-Agent: slow-client",
+            "Connection: close",
+        ]
+        try:
+            with socket.create_connection(address, timeout=options["timeout"]) as sock:
+                for line in lines:
+                    sock.sendall(f"{line}\r\n".encode())
+                    time.sleep(options["slow_delay"])
+                sock.sendall(b"\r\n")
+                received = b""
+                while True:
+                    chunk = sock.recv(1024)
+                    if not chunk:
+                        break
+                    received += chunk
+                    time.sleep(options["slow_delay"])
+        except OSError:
+            return False
+        return received.startswith(b"HTTP/1.1 200")
@@ -0,0 +1,71 @@
+import os
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from niunius.blobs import BLOB_FIELDS, recount_references
+from niunius.storage import BLOB_DIR, ContentAddressedStorage, is_blob
+
+
+class Command(BaseCommand):
+    """
+    Move media files uploaded before the content-addressed storage into it:
+    every file used by article photos, products or cars is saved as a blob (once per content),
+    the objects are updated to use the blob and the original file is deleted.
+    Finally the reference counts of all blobs are rebuilt and blobs not used by any object are deleted.
+    """
+
+    help = "Deduplicate uploaded media files into the content-addressed storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="only report what would be done")
+        parser.add_argument("--keep-originals", action="store_true", help="do not delete original files")
+
+    def handle(self, *args, **options):
+        storage = ContentAddressedStorage(location=default_storage.location)
+        dry_run = options["dry_run"]
+        blobs = {}
+        saved = 0
+        seen = set()
+        for model, field in BLOB_FIELDS.items():
+            names = (
+                model.objects.exclude(**{field: ""})
+                .exclude(**{f"{field}__startswith": BLOB_DIR + "/"})
+                .values_list(field, flat=True)
+                .distinct()
+            )
+            for name in names.iterator():
+                if name not in blobs:
+                    if not storage.exists(name):
+                        self.stderr.write(f"Missing file: {name}")
+                        continue
+                    if dry_run:
+                        blobs[name] = None
+                        continue
+                    with storage.open(name) as f:
+                        blobs[name] = storage.save(name, File(f))
+                    if blobs[name] in seen:
+                        saved += storage.size(name)
+                    seen.add(blobs[name])
+                if not dry_run:
+                    updated = model.objects.filter(**{field: name}).update(**{field: blobs[name]})
+                    self.stdout.write(f"{model.__name__}: {name} -> {blobs[name]} ({updated})")
+
+        if dry_run:
+            self.stdout.write(f"{len(blobs)} files would be moved to the content-addressed storage.")
+            return
+
+        unused = recount_references()
+        for name in unused:
+            storage.delete(name)
+        if not options["keep_originals"]:
+            for name in blobs:
+                if not is_blob(name) and os.path.exists(storage.path(name)):
+                    storage.delete(name)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(blobs)} files moved to {len(seen)} blobs, {saved} bytes saved; "
+                f"{len(unused)} unused blobs deleted."
+            )
+        )
@@ -0,0 +1,50 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from niunius.exports import FORMATS, export
+from niunius.models import Order
+
+
+class Command(BaseCommand):
+    """
+    Export orders with their items, buyer details and totals for accounting,
+    as CSV (one row per ordered item) or JSON Lines (one order per line).
+    Orders are read in chunks and written out as they are read, so the export runs in constant memory.
+    --since and --until select orders by the day they were placed (drafts have no such day).
+    """
+
+    help = "Export orders to CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--output", help="output file (default: standard output)")
+        parser.add_argument("--since", help="first day the orders were placed, YYYY-MM-DD")
+        parser.add_argument("--until", help="last day the orders were placed, YYYY-MM-DD")
+        parser.add_argument(
+            "--all", action="store_true", help="export draft orders too, not only placed orders"
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if not options["all"]:
+            orders = orders.filter(status=Order.PLACED)
+        if options["since"]:
+            orders = orders.filter(placed_at__date__gte=self.parse_day(options["since"]))
+        if options["until"]:
+            orders = orders.filter(placed_at__date__lte=self.parse_day(options["until"]))
+
+        lines = export(orders, options["format"], options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
+
+    def parse_day(self, value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Invalid date: {value}")
@@ -0,0 +1,297 @@
+import json
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from niunius.models import Article, Car, Category, Product
+
+# Scenario name: default weight in the traffic mix.
+SCENARIOS = {
+    "browse": 45,
+    "search": 15,
+    "cart": 10,
+    "checkout": 5,
+    "blog": 25,
+}
+
+GUEST_ORDER_DATA = {
+    "guest_first_name": "Jan",
+    "guest_last_name": "Kowalski",
+    "guest_email": "jan.kowalski@example.com",
+    "address_street": "Leśna 1",
+    "address_zipcode": "00-001",
+    "address_city": "Warszawa",
+    "address_country": "Polska",
+    "delivery_method": "Kurier",
+    "payment_method": "Przelew",
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(values))))
+    return values[min(rank, len(values)) - 1]
+
+
+def summarize(samples, elapsed):
+    """
+    Summarize (latency in seconds, ok) samples of one scenario:
+    throughput, error rate and latency percentiles in milliseconds.
+    """
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    summary = {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0,
+        "req_per_s": round(len(samples) / elapsed, 2) if elapsed else 0,
+    }
+    for name, pct in (("p50", 50), ("p90", 90), ("p95", 95), ("p99", 99), ("max", 100)):
+        value = percentile(latencies, pct)
+        summary[f"{name}_ms"] = round(value * 1000, 2) if value is not None else None
+    summary["mean_ms"] = round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None
+    return summary
+
+
+class Session:
+    """One simulated user: keeps cookies (session, csrftoken) between requests."""
+
+    def __init__(self, base_url, timeout, recorder, scenario):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.recorder = recorder
+        self.scenario = scenario
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == "csrftoken":
+                return cookie.value
+        return ""
+
+    def request(self, path, data=None):
+        """
+        Send GET (or POST if data given) and record its latency.
+        Return the final url (after redirects) and the response body, or None if the request failed.
+        """
+        if data is not None:
+            data = dict(data, csrfmiddlewaretoken=self.csrf_token())
+            data = urllib.parse.urlencode(data).encode()
+        start = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, data=data, timeout=self.timeout) as response:
+                result = response.geturl(), response.read().decode()
+            ok = True
+        except (urllib.error.URLError, OSError):
+            result = None
+            ok = False
+        self.recorder(self.scenario, time.perf_counter() - start, ok)
+        return result
+
+
+class Command(BaseCommand):
+    """
+    Replay a mix of shop and blog traffic against a running server
+    and write req/s, latency percentiles and error rates per scenario to a JSON file.
+
+    Scenarios:
+        browse - shop page, car, category and product pages
+        search - search for a word from a product name
+        cart - add a product to the cart and view the cart
+        checkout - guest checkout: cart, guest order form, order confirmation and confirmed purchase
+        blog - blog page and article details
+
+    Use seed_shop to generate the data set first.
+    """
+
+    help = "Load test the shop and the blog with a mix of realistic traffic."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--start-server",
+            action="store_true",
+            help="start 'manage.py runserver' on the --base-url port for the time of the test",
+        )
+        parser.add_argument("--duration", type=float, default=30, help="seconds")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--timeout", type=float, default=10)
+        parser.add_argument(
+            "--mix",
+            default=",".join(f"{name}={weight}" for name, weight in SCENARIOS.items()),
+            help="scenario weights, e.g. browse=50,checkout=10",
+        )
+        parser.add_argument("--output", default="loadtest.json")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options["mix"])
+        random.seed(options["seed"])
+        self.targets = self.load_targets()
+
+        server = self.start_server(options["base_url"]) if options["start_server"] else None
+        try:
+            report = self.run(
+                options["base_url"],
+                mix,
+                options["duration"],
+                options["concurrency"],
+                options["timeout"],
+            )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        with open(options["output"], "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        for name, summary in sorted(report["scenarios"].items()):
+            self.stdout.write(
+                f"{name:10} {summary['req_per_s']:8} req/s  p50 {summary['p50_ms']} ms  "
+                f"p99 {summary['p99_ms']} ms  errors {summary['error_rate']:.2%}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def parse_mix(self, value):
+        mix = {}
+        for part in value.split(","):
+            name, _, weight = part.partition("=")
+            if name not in SCENARIOS:
+                raise CommandError(f"Unknown scenario: {name}")
+            mix[name] = float(weight or 1)
+        return mix
+
+    def load_targets(self):
+        targets = {
+            "products": list(Product.objects.exclude(stock=0).values_list("slug", flat=True)[:5000]),
+            "cars": list(Car.objects.values_list("slug", flat=True)),
+            "categories": list(Category.objects.values_list("slug", flat=True)),
+            "articles": list(
+                Article.objects.exclude(slug="o-klubie").values_list("slug", flat=True)[:5000]
+            ),
+        }
+        if not targets["products"]:
+            raise CommandError("No products in stock. Run 'manage.py seed_shop' first.")
+        words = {
+            word
+            for name in Product.objects.values_list("name", flat=True)[:1000]
+            for word in name.split()
+            if len(word) > 3
+        }
+        targets["queries"] = sorted(words) or ["a"]
+        return targets
+
+    def start_server(self, base_url):
+        address = urllib.parse.urlparse(base_url).netloc
+        server = subprocess.Popen(
+            [sys.executable, "manage.py", "runserver", "--noreload", address],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(base_url + reverse("shop"), timeout=1).read()
+                return server
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"Server did not start on {address}")
+
+    def run(self, base_url, mix, duration, concurrency, timeout):
+        samples = {name: [] for name in mix}
+        lock = threading.Lock()
+
+        def record(scenario, latency, ok):
+            with lock:
+                samples[scenario].append((latency, ok))
+
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        deadline = time.monotonic() + duration
+
+        def worker():
+            while time.monotonic() < deadline:
+                scenario = random.choices(names, weights)[0]
+                session = Session(base_url, timeout, record, scenario)
+                getattr(self, f"scenario_{scenario}")(session)
+
+        started = timezone.now()
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        all_samples = [sample for scenario in samples.values() for sample in scenario]
+        return {
+            "meta": {
+                "base_url": base_url,
+                "started": started.isoformat(),
+                "duration_s": round(elapsed, 2),
+                "concurrency": concurrency,
+                "mix": mix,
+            },
+            "scenarios": {name: summarize(values, elapsed) for name, values in samples.items()},
+            "total": summarize(all_samples, elapsed),
+        }
+
+    # Scenarios
+
+    def scenario_browse(self, session):
+        session.request(reverse("shop"))
+        if self.targets["cars"]:
+            session.request(reverse("car", args=[random.choice(self.targets["cars"])]))
+        if self.targets["categories"]:
+            session.request(reverse("category", args=[random.choice(self.targets["categories"])]))
+        session.request(reverse("product", args=[random.choice(self.targets["products"])]))
+
+    def scenario_search(self, session):
+        query = urllib.parse.urlencode({"query": random.choice(self.targets["queries"])})
+        session.request(f"{reverse('search')}?{query}")
+
+    def add_to_cart(self, session):
+        url = reverse("product", args=[random.choice(self.targets["products"])])
+        session.request(url)
+        return session.request(url, {"qty": 1})
+
+    def scenario_cart(self, session):
+        self.add_to_cart(session)
+
+    def scenario_checkout(self, session):
+        for _ in range(random.randint(1, 3)):
+            if self.add_to_cart(session) is None:
+                return
+        session.request(reverse("guest-order"))
+        result = session.request(reverse("guest-order"), GUEST_ORDER_DATA)
+        if result is None:
+            return
+        url, body = result
+        order = re.search(r"/(\d+)/$", url)
+        key = re.search(r'name="idempotency_key" value="([^"]+)"', body)
+        if order and key:
+            session.request(
+                reverse("purchase", args=[order.group(1)]), {"idempotency_key": key.group(1)}
+            )
+
+    def scenario_blog(self, session):
+        session.request(reverse("blog"))
+        if self.targets["articles"]:
+            session.request(reverse("article-detail", args=[random.choice(self.targets["articles"])]))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from niunius.inventory import reconcile
+from niunius.models import Product, ProductVariant
+
+
+class Command(BaseCommand):
+    """
+    Verify, in batches of products and then of variants, that the stock of each product and variant
+    equals the sum of its applied stock movements. List mismatches and, with --fix, correct the stock.
+    """
+
+    help = "Verify the stock of products against the stock ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="set the stock of products and variants to the sum from the ledger",
+        )
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for model, label in ((Product, "Product"), (ProductVariant, "Variant")):
+            for pk, stock, ledger in reconcile(options["batch_size"], options["fix"], model):
+                mismatches += 1
+                self.stdout.write(f"{label} {pk}: stock {stock}, ledger {ledger}")
+        if mismatches and not options["fix"]:
+            raise CommandError(f"{mismatches} products and variants do not match the stock ledger.")
+        self.stdout.write(self.style.SUCCESS(f"Done, {mismatches} mismatches found."))
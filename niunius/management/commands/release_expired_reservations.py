@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from niunius.inventory import release_expired
+
+
+class Command(BaseCommand):
+    """
+    Delete expired stock reservations, in batches.
+    Expired reservations are not counted anyway, so this command only keeps the table small;
+    run it periodically, e.g. from cron.
+    """
+
+    help = "Release expired stock reservations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = release_expired(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} expired reservations released."))
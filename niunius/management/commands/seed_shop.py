@@ -0,0 +1,162 @@
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils.text import slugify
+from faker import Faker
+
+from niunius.catalog import record_changes
+from niunius.models import Article, ArticleComment, Car, Category, Product, StockMovement
+
+BATCH_SIZE = 1000
+
+
+def bulk_create(model, objs, key):
+    """
+    Insert objs in batches and return them with primary keys set.
+    Not every database backend sets primary keys on bulk-created objects,
+    so the rows are fetched back by the given unique field.
+    """
+    model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    values = [getattr(obj, key) for obj in objs]
+    created = []
+    for i in range(0, len(values), 500):
+        created.extend(model.objects.filter(**{f"{key}__in": values[i:i + 500]}))
+    return created
+
+
+class Command(BaseCommand):
+    """
+    Generate a large synthetic data set for load testing:
+    cars, categories, products (related to cars and categories), articles and comments.
+    Generated rows are marked with the "lt" suffix in slugs and the "LT-" prefix in product codes.
+    """
+
+    help = "Fill the database with a synthetic data set for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cars", type=int, default=50)
+        parser.add_argument("--categories", type=int, default=30)
+        parser.add_argument("--products", type=int, default=5000)
+        parser.add_argument("--articles", type=int, default=300)
+        parser.add_argument("--comments", type=int, default=5, help="per article")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        fake = Faker("pl_PL")
+        if options["seed"] is not None:
+            Faker.seed(options["seed"])
+            random.seed(options["seed"])
+
+        start = Car.objects.count() + Category.objects.count() + Product.objects.count()
+        cars = self.create_cars(fake, options["cars"], start)
+        categories = self.create_categories(fake, options["categories"], start)
+        products = self.create_products(fake, options["products"], start)
+        self.relate_products(products, cars, categories)
+        # bulk_create() does not send signals recording changes of the catalog
+        for model, objs in ((Car, cars), (Category, categories), (Product, products)):
+            record_changes(model, [obj.pk for obj in objs])
+        articles = self.create_articles(fake, options["articles"], start, options["comments"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(cars)} cars, {len(categories)} categories, "
+                f"{len(products)} products and {len(articles)} articles."
+            )
+        )
+
+    def create_cars(self, fake, count, start):
+        cars = []
+        for i in range(start, start + count):
+            brand = fake.company().split()[0]
+            model = f"{fake.word().capitalize()} {i}"
+            cars.append(
+                Car(brand=brand, model=model, slug=f"{slugify(brand + ' ' + model)}-lt", image="test.gif")
+            )
+        return bulk_create(Car, cars, "slug")
+
+    def create_categories(self, fake, count, start):
+        """Create a two-level tree: every fifth category is a top level one, the others are subcategories."""
+        roots, children = [], []
+        for i in range(start, start + count):
+            name = f"{fake.word().capitalize()} {i}"
+            # tree fields are set by Category.objects.rebuild() below
+            category = Category(name=name, slug=f"{slugify(name)}-lt", tree_id=0, lft=0, rght=0, level=0)
+            (roots if (i - start) % 5 == 0 else children).append(category)
+        roots = bulk_create(Category, roots, "slug")
+        for category in children:
+            category.parent = random.choice(roots)
+        categories = roots + bulk_create(Category, children, "slug")
+        Category.objects.rebuild()
+        return categories
+
+    def create_products(self, fake, count, start):
+        products = []
+        for i in range(start, start + count):
+            name = f"{fake.word().capitalize()} {fake.word()} {i}"
+            products.append(
+                Product(
+                    name=name,
+                    slug=f"{slugify(name)}-lt",
+                    code=f"LT-{i:08d}",
+                    stock=random.randint(0, 500),
+                    description=fake.paragraph(nb_sentences=4),
+                    price=fake.pydecimal(left_digits=4, right_digits=2, positive=True),
+                    image="test.gif",
+                )
+            )
+        products = bulk_create(Product, products, "code")
+        # bulk_create() does not call Product.save(), so the opening stock is recorded here
+        StockMovement.objects.bulk_create(
+            [
+                StockMovement(
+                    product=product, kind=StockMovement.OPENING, quantity=product.stock, applied=True
+                )
+                for product in products
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return products
+
+    def relate_products(self, products, cars, categories):
+        """Relate every product to 1-3 cars and 1-2 categories."""
+        car_links = []
+        category_links = []
+        for product in products:
+            if cars:
+                for car in random.sample(cars, min(len(cars), random.randint(1, 3))):
+                    car_links.append(Product.cars.through(product_id=product.pk, car_id=car.pk))
+            if categories:
+                for category in random.sample(categories, min(len(categories), random.randint(1, 2))):
+                    category_links.append(
+                        Product.categories.through(product_id=product.pk, category_id=category.pk)
+                    )
+        Product.cars.through.objects.bulk_create(car_links, batch_size=BATCH_SIZE)
+        Product.categories.through.objects.bulk_create(category_links, batch_size=BATCH_SIZE)
+
+    def create_articles(self, fake, count, start, comments_per_article):
+        author, _ = User.objects.get_or_create(username="loadtest")
+        articles = []
+        for i in range(start, start + count):
+            title = f"{fake.sentence(nb_words=5).rstrip('.')} {i}"
+            articles.append(
+                Article(
+                    title=title,
+                    slug=f"{slugify(title)}-lt"[:128],
+                    content=fake.text(max_nb_chars=2000),
+                    added_by=author,
+                )
+            )
+        articles = bulk_create(Article, articles, "slug")
+        # bulk_create bypasses django-mptt: every comment starts a thread, a tree of its own
+        last_tree_id = ArticleComment.objects.aggregate(last=Max("tree_id"))["last"] or 0
+        comments = [
+            ArticleComment(article=article, text=fake.sentence(), user=author, lft=1, rght=2, level=0)
+            for article in articles
+            for _ in range(comments_per_article)
+        ]
+        for tree_id, comment in enumerate(comments, last_tree_id + 1):
+            comment.tree_id = tree_id
+        ArticleComment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+        return articles
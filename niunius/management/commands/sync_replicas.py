@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from niunius.replicas import replicas
+
+
+class Command(BaseCommand):
+    """
+    Copy the primary SQLite database to the replicas (settings.DATABASE_REPLICAS).
+
+    For trying the replicas out locally, with SQLite files standing in for the primary and the replicas.
+    PostgreSQL replicas are kept up to date by the streaming replication of PostgreSQL itself.
+    """
+
+    help = "Copy the primary SQLite database to the SQLite replicas."
+
+    def handle(self, *args, **options):
+        aliases = replicas()
+        if not aliases:
+            raise CommandError("No replicas configured in DATABASES / DATABASE_REPLICAS.")
+        primary = connections[DEFAULT_DB_ALIAS]
+        for alias in aliases:
+            replica = connections[alias]
+            if primary.vendor != "sqlite" or replica.vendor != "sqlite":
+                raise CommandError(
+                    f"{alias}: only SQLite databases can be copied, "
+                    "replicate PostgreSQL with its streaming replication."
+                )
+            primary.ensure_connection()
+            replica.ensure_connection()
+            primary.connection.backup(replica.connection)
+            self.stdout.write(f"Copied to {alias}")
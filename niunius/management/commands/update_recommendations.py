@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from niunius.recommendations import rebuild_recommendations, update_recommendations
+
+
+class Command(BaseCommand):
+    """
+    Count products ordered together in orders placed since the last run
+    and update "frequently bought together" recommendations of those products.
+    Run it periodically, e.g. every hour from cron; --rebuild counts all orders again.
+    """
+
+    help = "Update recommendations of products frequently bought together."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="carts per transaction")
+        parser.add_argument("--rebuild", action="store_true", help="count all orders again")
+
+    def handle(self, *args, **options):
+        update = rebuild_recommendations if options["rebuild"] else update_recommendations
+        updated = update(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Recommendations of {updated} products updated."))
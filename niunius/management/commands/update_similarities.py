@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from niunius.similarity import update_similarities
+
+
+class Command(BaseCommand):
+    """
+    Compute similar products (by names and descriptions) and related articles (by titles and contents)
+    again and replace the saved ones.
+    Run it periodically, e.g. every night from cron, or after larger changes of the catalog.
+    """
+
+    help = "Compute similar products and related articles."
+
+    def handle(self, *args, **options):
+        products, articles = update_similarities()
+        self.stdout.write(
+            self.style.SUCCESS(f"{products} similar products and {articles} related articles saved.")
+        )
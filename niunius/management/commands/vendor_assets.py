@@ -0,0 +1,42 @@
+import os
+import urllib.request
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from niunius.assets import VENDOR_ASSETS, integrity
+
+
+class Command(BaseCommand):
+    """
+    Download third-party assets (Bootstrap, jQuery, Popper) from their CDN into the static files
+    of the app, verifying them with their integrity hashes.
+    Commit the downloaded files - pages link to the vendored copies as soon as they exist.
+    """
+
+    help = "Vendor third-party static assets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="download assets already vendored")
+        parser.add_argument("--timeout", type=float, default=30)
+
+    def handle(self, *args, **options):
+        static_root = os.path.join(apps.get_app_config("niunius").path, "static")
+        for name, asset in VENDOR_ASSETS.items():
+            path = os.path.join(static_root, *asset["path"].split("/"))
+            if os.path.exists(path) and not options["force"]:
+                self.stdout.write(f"{name}: already vendored")
+                continue
+            try:
+                with urllib.request.urlopen(asset["url"], timeout=options["timeout"]) as response:
+                    content = response.read()
+            except OSError as e:
+                raise CommandError(f"{name}: download failed: {e}")
+            algorithm = asset["integrity"].split("-", 1)[0]
+            if integrity(content, algorithm) != asset["integrity"]:
+                raise CommandError(f"{name}: integrity check failed for {asset['url']}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(content)
+            self.stdout.write(f"{name}: saved {asset['path']}")
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,162 @@
+"""
+Serving of uploaded media files (photos of products, cars and articles).
+
+Depending on settings.MEDIA_SERVING the file is sent by:
+    "django" - the app itself (e.g. runserver without a front proxy),
+    "x-accel" - nginx, told by the X-Accel-Redirect header which internal location to send,
+    "x-sendfile" - Apache (mod_xsendfile) or lighttpd, told by the X-Sendfile header which file to send.
+In any mode conditional requests (If-None-Match, If-Modified-Since) are answered here with 304,
+without touching the file. The app sends single byte ranges itself (Range, If-Range),
+offloaded files are sent in ranges by the front proxy.
+
+Files saved in the content-addressed storage (blobs) never change, so they are cached as immutable.
+
+The ETag has the same format as the one of nginx, so it does not change depending on who sends the file.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .storage import is_blob
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def file_etag(stat):
+    """ETag of the file as made by nginx: hex modification time and size."""
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Parse the Range header for a file of the given size.
+    Return (first byte, last byte) of the range, or None if the whole file is to be sent:
+    there is no Range header, it is malformed or it asks for several ranges (allowed to be ignored).
+    Raise RangeNotSatisfiable if the range is outside of the file.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """Check whether the range can be sent: there is no If-Range or it matches the current file."""
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/"')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def read_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def cache_control(path):
+    if is_blob(path):
+        max_age = getattr(settings, "MEDIA_BLOB_CACHE_MAX_AGE", 365 * 24 * 60 * 60)
+        return f"public, max-age={max_age}, immutable"
+    return f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 24 * 60 * 60)}"
+
+
+def set_file_headers(response, path, etag, last_modified, content_type=None):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = cache_control(path)
+    if content_type is not None:
+        response["Content-Type"] = content_type
+    return response
+
+
+def offload(path, full_path, mode):
+    """Empty response telling the front proxy to send the file."""
+    response = HttpResponse()
+    if mode == "x-accel":
+        prefix = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/")
+        response["X-Accel-Redirect"] = prefix + quote(path)
+    else:
+        # header values are latin-1 strings standing for bytes, the path is sent as raw filesystem bytes
+        response["X-Sendfile"] = os.fsencode(full_path).decode("latin-1")
+    return response
+
+
+def serve_media(request, path):
+    """Send the media file at the given path, relative to MEDIA_ROOT."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Nie znaleziono pliku")
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404("Nie znaleziono pliku")
+    if not os.path.isfile(full_path):
+        raise Http404("Nie znaleziono pliku")
+
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return set_file_headers(not_modified, path, etag, last_modified)
+
+    mode = getattr(settings, "MEDIA_SERVING", "django")
+    if mode in ("x-accel", "x-sendfile"):
+        return set_file_headers(offload(path, full_path, mode), path, etag, last_modified, content_type)
+
+    size = stat.st_size
+    byte_range = None
+    if if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+    if byte_range is None:
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(full_path, start, end - start + 1), status=206, content_type=content_type
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+    response["Accept-Ranges"] = "bytes"
+    return set_file_headers(response, path, etag, last_modified)
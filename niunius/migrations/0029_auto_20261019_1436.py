@@ -0,0 +1,33 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:36
+
+from django.db import migrations, models
+import uuid
+
+
+def set_status_and_keys(apps, schema_editor):
+    """Orders of ordered carts are placed; every order gets its own idempotency key."""
+    Order = apps.get_model('niunius', 'Order')
+    Order.objects.filter(cart__is_ordered=True).update(status='placed')
+    for order in Order.objects.only('pk').iterator():
+        Order.objects.filter(pk=order.pk).update(idempotency_key=uuid.uuid4())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0028_auto_20210228_1708'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='idempotency_key',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Szkic'), ('placed', 'Złożone')], default='draft', max_length=16, verbose_name='Status'),
+        ),
+        migrations.RunPython(set_status_and_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:38
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_address_book(apps, schema_editor):
+    """The address of the latest order of each user becomes the default address of the user."""
+    Order = apps.get_model('niunius', 'Order')
+    Address = apps.get_model('niunius', 'Address')
+    seen = set()
+    addresses = []
+    for order in Order.objects.filter(buyer__isnull=False).order_by('buyer_id', '-pk').iterator():
+        if order.buyer_id in seen:
+            continue
+        seen.add(order.buyer_id)
+        addresses.append(
+            Address(
+                user_id=order.buyer_id,
+                street=order.address_street,
+                zipcode=order.address_zipcode,
+                city=order.address_city,
+                country=order.address_country,
+                is_default=True,
+            )
+        )
+    Address.objects.bulk_create(addresses, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('niunius', '0029_auto_20261019_1436'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Address',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('street', models.CharField(max_length=64, verbose_name='Ulica')),
+                ('zipcode', models.CharField(max_length=6, validators=[django.core.validators.RegexValidator(regex='\\d{2}-\\d{3}')], verbose_name='Kod pocztowy')),
+                ('city', models.CharField(max_length=64, verbose_name='Miasto')),
+                ('country', models.CharField(max_length=64, verbose_name='Kraj')),
+                ('is_default', models.BooleanField(default=False, verbose_name='Domyślny')),
+                ('last_used', models.DateTimeField(auto_now=True, verbose_name='Ostatnio użyty')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='addresses', to=settings.AUTH_USER_MODEL, verbose_name='Użytkownik')),
+            ],
+            options={
+                'verbose_name': 'Adres',
+                'verbose_name_plural': 'Adresy',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['user', '-is_default', '-last_used'], name='niunius_add_user_id_dee24b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(condition=models.Q(is_default=True), fields=('user',), name='one_default_address_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(fields=('user', 'street', 'zipcode', 'city', 'country'), name='unique_user_address'),
+        ),
+        migrations.RunPython(fill_address_book, migrations.RunPython.noop),
+    ]
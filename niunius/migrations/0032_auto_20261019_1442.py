@@ -0,0 +1,40 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0031_auto_20261019_1439'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Ilość')),
+                ('expires', models.DateTimeField(verbose_name='Wygasa')),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='niunius.shoppingcart', verbose_name='Koszyk')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='niunius.product', verbose_name='Produkt')),
+            ],
+            options={
+                'verbose_name': 'Rezerwacja',
+                'verbose_name_plural': 'Rezerwacje',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockreservation',
+            index=models.Index(fields=['product', 'expires'], name='niunius_sto_product_c8a8d2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockreservation',
+            index=models.Index(fields=['expires'], name='niunius_sto_expires_10ef8e_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockreservation',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='one_reservation_per_cart_product'),
+        ),
+    ]
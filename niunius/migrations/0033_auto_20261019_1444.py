@@ -0,0 +1,46 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def open_stock_ledger(apps, schema_editor):
+    """The current stock of every product becomes its opening stock movement."""
+    Product = apps.get_model('niunius', 'Product')
+    StockMovement = apps.get_model('niunius', 'StockMovement')
+    movements = [
+        StockMovement(product_id=pk, kind='opening', quantity=stock, applied=True)
+        for pk, stock in Product.objects.values_list('pk', 'stock').iterator()
+    ]
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0032_auto_20261019_1442'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('opening', 'Stan początkowy'), ('purchase', 'Sprzedaż'), ('restock', 'Dostawa'), ('adjustment', 'Korekta')], max_length=16, verbose_name='Rodzaj')),
+                ('quantity', models.IntegerField(verbose_name='Zmiana stanu')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Data')),
+                ('applied', models.BooleanField(default=False, verbose_name='Uwzględnione w stanie')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='niunius.order', verbose_name='Zamówienie')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='niunius.product', verbose_name='Produkt')),
+            ],
+            options={
+                'verbose_name': 'Ruch magazynowy',
+                'verbose_name_plural': 'Ruchy magazynowe',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(applied=False), fields=['product'], name='stock_movement_pending_idx'),
+        ),
+        migrations.RunPython(open_stock_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0033_auto_20261019_1444'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dzień')),
+                ('units', models.IntegerField(default=0, verbose_name='Sprzedane sztuki')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Przychód')),
+                ('orders', models.IntegerField(default=0, verbose_name='Zamówienia')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='niunius.product', verbose_name='Produkt')),
+            ],
+            options={
+                'verbose_name': 'Sprzedaż dzienna - produkt',
+                'verbose_name_plural': 'Sprzedaż dzienna - produkty',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCategorySales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dzień')),
+                ('units', models.IntegerField(default=0, verbose_name='Sprzedane sztuki')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Przychód')),
+                ('orders', models.IntegerField(default=0, verbose_name='Zamówienia')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='niunius.category', verbose_name='Kategoria')),
+            ],
+            options={
+                'verbose_name': 'Sprzedaż dzienna - kategoria',
+                'verbose_name_plural': 'Sprzedaż dzienna - kategorie',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCarSales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dzień')),
+                ('units', models.IntegerField(default=0, verbose_name='Sprzedane sztuki')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Przychód')),
+                ('orders', models.IntegerField(default=0, verbose_name='Zamówienia')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='niunius.car', verbose_name='Auto')),
+            ],
+            options={
+                'verbose_name': 'Sprzedaż dzienna - auto',
+                'verbose_name_plural': 'Sprzedaż dzienna - auta',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dailyproductsales',
+            index=models.Index(fields=['product', 'day'], name='niunius_dai_product_00bd5a_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyproductsales',
+            constraint=models.UniqueConstraint(fields=('day', 'product'), name='one_product_sales_per_day'),
+        ),
+        migrations.AddIndex(
+            model_name='dailycategorysales',
+            index=models.Index(fields=['category', 'day'], name='niunius_dai_categor_86e304_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycategorysales',
+            constraint=models.UniqueConstraint(fields=('day', 'category'), name='one_category_sales_per_day'),
+        ),
+        migrations.AddIndex(
+            model_name='dailycarsales',
+            index=models.Index(fields=['car', 'day'], name='niunius_dai_car_id_a9289a_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycarsales',
+            constraint=models.UniqueConstraint(fields=('day', 'car'), name='one_car_sales_per_day'),
+        ),
+    ]
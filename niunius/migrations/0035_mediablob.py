@@ -0,0 +1,27 @@
+# Generated by Django 3.1.5 on 2026-10-19 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0034_auto_20261019_1448'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Plik')),
+                ('size', models.BigIntegerField(default=0, verbose_name='Rozmiar')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Liczba odwołań')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Dodano')),
+            ],
+            options={
+                'verbose_name': 'Plik',
+                'verbose_name_plural': 'Pliki',
+            },
+        ),
+    ]
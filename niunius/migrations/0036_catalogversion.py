@@ -0,0 +1,25 @@
+# Generated by Django 3.1.5 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0035_mediablob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Wersja')),
+                ('changed', models.DateTimeField(auto_now=True, verbose_name='Zmieniono')),
+            ],
+            options={
+                'verbose_name': 'Wersja katalogu',
+                'verbose_name_plural': 'Wersje katalogu',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.5 on 2026-10-19 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0036_catalogversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField(unique=True, verbose_name='Numer zmiany')),
+                ('kind', models.CharField(choices=[('product', 'produkt'), ('car', 'auto'), ('category', 'kategoria')], max_length=16, verbose_name='Rodzaj')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Id obiektu')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Usunięty')),
+                ('changed', models.DateTimeField(auto_now_add=True, verbose_name='Zmieniono')),
+            ],
+            options={
+                'verbose_name': 'Zmiana katalogu',
+                'verbose_name_plural': 'Zmiany katalogu',
+            },
+        ),
+        migrations.AddField(
+            model_name='catalogversion',
+            name='compacted',
+            field=models.BigIntegerField(default=0, verbose_name='Skompaktowano do wersji'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogchange',
+            index=models.Index(fields=['kind', 'object_id'], name='niunius_cat_kind_9e5b5e_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.5 on 2026-10-19 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0037_catalogchange'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price'], name='niunius_pro_price_50e023_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-added'], name='niunius_pro_added_cf871e_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 3.1.5 on 2026-10-19 13:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0038_product_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoPurchase',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(verbose_name='Liczba zamówień')),
+            ],
+            options={
+                'verbose_name': 'Zakup razem',
+                'verbose_name_plural': 'Zakupy razem',
+            },
+        ),
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Pozycja')),
+                ('score', models.PositiveIntegerField(verbose_name='Liczba zamówień')),
+            ],
+            options={
+                'verbose_name': 'Polecany produkt',
+                'verbose_name_plural': 'Polecane produkty',
+            },
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='co_purchases_counted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(condition=models.Q(('co_purchases_counted', False), ('is_ordered', True)), fields=['id'], name='cart_co_purchases_pending_idx'),
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='niunius.product', verbose_name='Produkt'),
+        ),
+        migrations.AddField(
+            model_name='recommendation',
+            name='recommended',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_with', to='niunius.product', verbose_name='Polecany produkt'),
+        ),
+        migrations.AddField(
+            model_name='copurchase',
+            name='other',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='niunius.product', verbose_name='Kupowany razem z'),
+        ),
+        migrations.AddField(
+            model_name='copurchase',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_purchases', to='niunius.product', verbose_name='Produkt'),
+        ),
+        migrations.AddConstraint(
+            model_name='recommendation',
+            constraint=models.UniqueConstraint(fields=('product', 'rank'), name='one_recommendation_per_rank'),
+        ),
+        migrations.AddConstraint(
+            model_name='copurchase',
+            constraint=models.UniqueConstraint(fields=('product', 'other'), name='one_co_purchase_per_pair'),
+        ),
+    ]
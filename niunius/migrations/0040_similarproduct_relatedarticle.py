@@ -0,0 +1,50 @@
+# Generated by Django 3.1.5 on 2026-10-19 13:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0039_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarProduct',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Pozycja')),
+                ('score', models.FloatField(verbose_name='Podobieństwo')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_products', to='niunius.product', verbose_name='Produkt')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='niunius.product', verbose_name='Podobny produkt')),
+            ],
+            options={
+                'verbose_name': 'Podobny produkt',
+                'verbose_name_plural': 'Podobne produkty',
+            },
+        ),
+        migrations.CreateModel(
+            name='RelatedArticle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Pozycja')),
+                ('score', models.FloatField(verbose_name='Podobieństwo')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_articles', to='niunius.article', verbose_name='Artykuł')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_to', to='niunius.article', verbose_name='Powiązany artykuł')),
+            ],
+            options={
+                'verbose_name': 'Powiązany artykuł',
+                'verbose_name_plural': 'Powiązane artykuły',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarproduct',
+            constraint=models.UniqueConstraint(fields=('product', 'rank'), name='one_similar_product_per_rank'),
+        ),
+        migrations.AddConstraint(
+            model_name='relatedarticle',
+            constraint=models.UniqueConstraint(fields=('article', 'rank'), name='one_related_article_per_rank'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.1.5 on 2026-10-19 15:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import mptt.fields
+
+
+def make_roots(apps, schema_editor):
+    """Existing categories become top level categories, each its own tree, in the order of names."""
+    Category = apps.get_model('niunius', 'Category')
+    categories = list(Category.objects.order_by('name', 'pk'))
+    for tree_id, category in enumerate(categories, 1):
+        category.tree_id, category.lft, category.rght, category.level = tree_id, 1, 2, 0
+    Category.objects.bulk_update(categories, ['tree_id', 'lft', 'rght', 'level'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0040_similarproduct_relatedarticle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='level',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='lft',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=mptt.fields.TreeForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='niunius.category', verbose_name='Kategoria nadrzędna'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='rght',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='tree_id',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(make_roots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 3.1.5 on 2026-10-19 13:46
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0041_category_tree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, verbose_name='Wariant')),
+                ('code', models.CharField(max_length=128, unique=True, verbose_name='Kod wariantu')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='Cena')),
+                ('stock', models.IntegerField(validators=[django.core.validators.MinValueValidator(0)], verbose_name='Dostępność')),
+            ],
+            options={
+                'verbose_name': 'Wariant produktu',
+                'verbose_name_plural': 'Warianty produktów',
+                'ordering': ['product', 'name'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='stockreservation',
+            name='one_reservation_per_cart_product',
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='niunius.product', verbose_name='Produkt'),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='variant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='niunius.productvariant', verbose_name='Wariant'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='variant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='movements', to='niunius.productvariant', verbose_name='Wariant'),
+        ),
+        migrations.AddField(
+            model_name='stockreservation',
+            name='variant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='niunius.productvariant', verbose_name='Wariant'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(('applied', False), ('variant__isnull', False)), fields=['variant'], name='variant_movement_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockreservation',
+            index=models.Index(fields=['variant', 'expires'], name='niunius_sto_variant_25c285_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockreservation',
+            constraint=models.UniqueConstraint(condition=models.Q(variant=None), fields=('cart', 'product'), name='one_reservation_per_cart_product'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockreservation',
+            constraint=models.UniqueConstraint(condition=models.Q(variant__isnull=False), fields=('cart', 'variant'), name='one_reservation_per_cart_variant'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.1.5 on 2026-10-19 16:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import mptt.fields
+
+
+def make_threads(apps, schema_editor):
+    """Existing comments start threads of their own, numbered in the order they were added."""
+    ArticleComment = apps.get_model('niunius', 'ArticleComment')
+    comments = list(ArticleComment.objects.order_by('added', 'pk'))
+    for tree_id, comment in enumerate(comments, 1):
+        comment.tree_id, comment.lft, comment.rght, comment.level = tree_id, 1, 2, 0
+    ArticleComment.objects.bulk_update(comments, ['tree_id', 'lft', 'rght', 'level'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0042_product_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articlecomment',
+            name='level',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='articlecomment',
+            name='lft',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='articlecomment',
+            name='parent',
+            field=mptt.fields.TreeForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='niunius.articlecomment', verbose_name='Odpowiedź na'),
+        ),
+        migrations.AddField(
+            model_name='articlecomment',
+            name='rght',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='articlecomment',
+            name='tree_id',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(make_threads, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='articlecomment',
+            index=models.Index(condition=models.Q(parent=None), fields=['article', '-tree_id'], name='comment_threads_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.1.5 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+def set_placed_at(apps, schema_editor):
+    """The time of placing earlier orders is unknown, the time of creating them is the closest one."""
+    Order = apps.get_model('niunius', 'Order')
+    Order.objects.filter(status='placed').update(placed_at=models.F('date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('niunius', '0043_threaded_comments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='placed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Data złożenia'),
+        ),
+        migrations.RunPython(set_placed_at, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,12 @@
+import uuid
+
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
 from django.utils.text import slugify
+from mptt.models import MPTTModel, TreeForeignKey
 
 
 class Article(models.Model):
@@ -73,12 +78,16 @@ class ArticlePhoto(models.Model):
         return self.photo.name
 
 
-class ArticleComment(models.Model):
+class ArticleComment(MPTTModel):
     """
     Article: Article object
     Text: text of the comment
     User: who has added the comment, User object
     Added: when the comment was added
+    Parent: ArticleComment object the comment replies to, empty for comments starting a thread
+    Tree id, Lft, Rght, Level: position of the comment in its thread (django-mptt); every thread
+        is a tree of its own, so a new thread has the highest tree id
+        and a reply moves only its thread
     """
 
     article = models.ForeignKey(
@@ -87,10 +96,24 @@ class ArticleComment(models.Model):
     text = models.TextField(verbose_name="Tekst")
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Użytkownik")
     added = models.DateTimeField(auto_now_add=True, verbose_name="Dodano")
+    parent = TreeForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="replies",
+        verbose_name="Odpowiedź na",
+    )
 
     class Meta:
         verbose_name = "Artykuł-komentarz"
         verbose_name_plural = "Artykuł-komentarze"
+        # threads of the article, the newest first
+        indexes = [
+            models.Index(
+                fields=["article", "-tree_id"], condition=models.Q(parent=None), name="comment_threads_idx"
+            )
+        ]
 
     def __str__(self):
         return f"komentarz dodany {self.added} przez {self.user}"
@@ -123,33 +146,63 @@ class Car(models.Model):
         return self.name
 
     def get_available_products(self):
-        """Display only these products related to the car for which stock is not equal to 0."""
-        return self.product_set.exclude(stock=0)
+        """
+        Display only these products related to the car for which stock is not equal to 0,
+        with their variants (one more query for all of them).
+        """
+        return self.product_set.exclude(stock=0).prefetch_related("variants")
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.name)
         super(Car, self).save(*args, **kwargs)
 
 
-class Category(models.Model):
+class Category(MPTTModel):
     """
     Name: name of the category
     Slug: slugified name of the category
+    Parent: Category object the category is a subcategory of, empty for top level categories
+    Tree id, Lft, Rght, Level: position of the category in the tree of categories (django-mptt);
+        the category with all its subcategories are categories of its tree with lft from its lft to rght
     """
 
     name = models.CharField(max_length=64, verbose_name="Nazwa")
     slug = models.SlugField(unique=True, blank=True, max_length=64)
+    parent = TreeForeignKey(
+        "self",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="children",
+        verbose_name="Kategoria nadrzędna",
+    )
 
     class Meta:
         verbose_name = "Kategoria"
         verbose_name_plural = "Kategorie"
 
+    class MPTTMeta:
+        order_insertion_by = ["name"]
+
     def __str__(self):
         return self.name
 
     def get_available_products(self):
-        """Display only these products related to the category for which stock is not equal to 0."""
-        return self.product_set.exclude(stock=0)
+        """
+        Display only these products related to the category or any of its subcategories
+        for which stock is not equal to 0. The subtree is a range of lft, so it is one query,
+        and one more for variants of all the products.
+        """
+        return (
+            Product.objects.filter(
+                categories__tree_id=self.tree_id,
+                categories__lft__gte=self.lft,
+                categories__lft__lte=self.rght,
+            )
+            .exclude(stock=0)
+            .distinct()
+            .prefetch_related("variants")
+        )
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.name)
@@ -162,9 +215,11 @@ class Product(models.Model):
     Slug: slugified name of the product
     Added: when the product was added
     Code: unique code of the product
-    Stock: available quantity of the product
+    Stock: quantity of the product in stock as of the last compaction of the stock ledger;
+        the current stock is the stock plus stock movements not applied yet (see StockMovement);
+        for a product with variants it is the sum of stocks of its variants
     Description: description of the product
-    Price: price of the product
+    Price: price of the product, the lowest one of its variants for a product with variants
     Image: image of the product
     Cars: set of Car objects to which the product is related
     Categories: set of Category objects to which the product is related
@@ -188,13 +243,76 @@ class Product(models.Model):
     class Meta:
         verbose_name = "Produkt"
         verbose_name_plural = "Produkty"
+        # price bands of the facets and the newest products first
+        indexes = [models.Index(fields=["price"]), models.Index(fields=["-added"])]
 
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
+        """Save the product. Record the stock of a new product as the opening stock movement."""
+        adding = self._state.adding
         self.slug = slugify(self.name)
         super(Product, self).save(*args, **kwargs)
+        if adding:
+            StockMovement.objects.create(
+                product=self,
+                kind=StockMovement.OPENING,
+                quantity=self.stock,
+                applied=True,
+            )
+
+
+class ProductVariant(models.Model):
+    """
+    A version of a product which is sold separately, e.g. a size or a colour of the part.
+    Product: Product object the variant is of
+    Name: what makes the variant different, e.g. "rozmiar L"
+    Code: unique code of the variant
+    Price: price of the variant
+    Stock: quantity of the variant in stock as of the last compaction of the stock ledger,
+        stock movements of the variant are also stock movements of its product (see StockMovement)
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="variants", verbose_name="Produkt"
+    )
+    name = models.CharField(max_length=64, verbose_name="Wariant")
+    code = models.CharField(max_length=128, unique=True, verbose_name="Kod wariantu")
+    price = models.DecimalField(max_digits=8, decimal_places=2, verbose_name="Cena")
+    stock = models.IntegerField(validators=[MinValueValidator(0)], verbose_name="Dostępność")
+
+    class Meta:
+        verbose_name = "Wariant produktu"
+        verbose_name_plural = "Warianty produktów"
+        ordering = ["product", "name"]
+
+    def __str__(self):
+        return f"{self.product.name}, {self.name}"
+
+    def save(self, *args, **kwargs):
+        """
+        Save the variant. The stock of a new variant is added to the stock of its product
+        (recorded as a change of the catalog, the update bypasses its receivers)
+        and recorded as the opening stock movement of both.
+        """
+        # the catalog module imports models
+        from .catalog import record_changes
+
+        with transaction.atomic():
+            adding = self._state.adding
+            if adding:
+                Product.objects.filter(pk=self.product_id).update(stock=F("stock") + self.stock)
+                record_changes(Product, [self.product_id])
+            super().save(*args, **kwargs)
+            if adding:
+                StockMovement.objects.create(
+                    product_id=self.product_id,
+                    variant=self,
+                    kind=StockMovement.OPENING,
+                    quantity=self.stock,
+                    applied=True,
+                )
 
 
 class ShoppingCart(models.Model):
@@ -203,17 +321,36 @@ class ShoppingCart(models.Model):
         False - when the shopping cart is created for logged-in users
         True - when the order related to the shopping cart is finalized, only for logged-in users
         Null - for anonymous users
+    Co_purchases_counted: True once products of the ordered cart are counted in CoPurchase
+        (see niunius.recommendations)
     """
 
     is_ordered = models.BooleanField(null=True)
+    co_purchases_counted = models.BooleanField(default=False)
 
     class Meta:
         verbose_name = "Koszyk"
         verbose_name_plural = "Koszyki"
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_ordered=True, co_purchases_counted=False),
+                name="cart_co_purchases_pending_idx",
+            )
+        ]
 
     def total(self):
-        """Calculate the total value of the shopping cart, amount to pay."""
-        return sum([item.value for item in self.cartitem_set.all()])
+        """
+        Calculate the total value of the shopping cart, amount to pay.
+        Unit prices saved at the purchase take precedence over current prices of products.
+        """
+        total = self.cartitem_set.aggregate(
+            total=Sum(
+                F("quantity") * Coalesce("unit_price", "variant__price", "product__price"),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )["total"]
+        return total or 0
 
     def __str__(self):
         return f"Koszyk nr: {self.id}"
@@ -222,32 +359,188 @@ class ShoppingCart(models.Model):
 class CartItem(models.Model):
     """
     Product: related Product object
+    Variant: chosen ProductVariant object of the product, empty for products without variants
     Quantity: quantity of a given product in a given shopping cart
     Cart: related ShoppingCart object
+    Unit_price: price of the product at the time of the purchase, null till the order is placed
     """
 
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, verbose_name="Produkt"
     )
+    variant = models.ForeignKey(
+        ProductVariant, null=True, blank=True, on_delete=models.CASCADE, verbose_name="Wariant"
+    )
     quantity = models.IntegerField(
         verbose_name="Ilość", validators=[MinValueValidator(0)]
     )
     cart = models.ForeignKey(
         ShoppingCart, on_delete=models.CASCADE, verbose_name="Koszyk"
     )
+    unit_price = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Cena jednostkowa",
+    )
+
+    @property
+    def price(self):
+        """Unit price saved at the purchase or the current price of the variant or the product."""
+        if self.unit_price is not None:
+            return self.unit_price
+        return self.variant.price if self.variant_id else self.product.price
 
     @property
     def value(self):
-        return self.quantity * self.product.price
+        return self.quantity * self.price
 
     class Meta:
         verbose_name = "W koszyku"
         verbose_name_plural = "W koszyku"
 
     def __str__(self):
+        if self.variant_id:
+            return f"{self.product.name} ({self.variant.name}), {self.quantity} szt."
         return f"{self.product.name}, {self.quantity} szt."
 
 
+class StockReservation(models.Model):
+    """
+    Product: reserved Product object
+    Variant: reserved ProductVariant object of the product, empty for products without variants
+    Cart: ShoppingCart object for which the product is reserved;
+        one reservation per product (or variant of the product) in the cart
+    Quantity: reserved quantity, the same as the quantity of the product in the cart
+    Expires: date & time when the reservation expires and the quantity is available to sell again
+    """
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Produkt",
+    )
+    variant = models.ForeignKey(
+        ProductVariant,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Wariant",
+    )
+    cart = models.ForeignKey(
+        ShoppingCart,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Koszyk",
+    )
+    quantity = models.PositiveIntegerField(verbose_name="Ilość")
+    expires = models.DateTimeField(verbose_name="Wygasa")
+
+    class Meta:
+        verbose_name = "Rezerwacja"
+        verbose_name_plural = "Rezerwacje"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart", "product"],
+                condition=models.Q(variant=None),
+                name="one_reservation_per_cart_product",
+            ),
+            models.UniqueConstraint(
+                fields=["cart", "variant"],
+                condition=models.Q(variant__isnull=False),
+                name="one_reservation_per_cart_variant",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["product", "expires"]),
+            models.Index(fields=["variant", "expires"]),
+            models.Index(fields=["expires"]),
+        ]
+
+    def __str__(self):
+        return f"{self.product}, {self.quantity} szt. do {self.expires}"
+
+
+class StockMovement(models.Model):
+    """
+    Stock ledger: every change of the stock of a product is a new row, rows are never updated
+    (except for marking them as applied). Purchases do not have to write to the product row.
+
+    Product: Product object which stock is changed
+    Variant: ProductVariant object which stock is changed, empty for products without variants;
+        the movement changes the stock of both the variant and its product
+    Kind: opening (stock of a new product), purchase, restock or manual adjustment
+    Quantity: change of the stock, negative for purchases
+    Order: placed Order object, for purchases only
+    Created: date & time of the stock movement
+    Applied: True once the quantity is added to Product.stock by the compaction of the ledger
+    """
+
+    OPENING = "opening"
+    PURCHASE = "purchase"
+    RESTOCK = "restock"
+    ADJUSTMENT = "adjustment"
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="movements",
+        verbose_name="Produkt",
+    )
+    # variants with stock movements are not deleted (unless with their product),
+    # the stock of their product would not add up
+    variant = models.ForeignKey(
+        ProductVariant,
+        null=True,
+        blank=True,
+        on_delete=models.RESTRICT,
+        related_name="movements",
+        verbose_name="Wariant",
+    )
+    kind = models.CharField(
+        max_length=16,
+        choices=[
+            (OPENING, "Stan początkowy"),
+            (PURCHASE, "Sprzedaż"),
+            (RESTOCK, "Dostawa"),
+            (ADJUSTMENT, "Korekta"),
+        ],
+        verbose_name="Rodzaj",
+    )
+    quantity = models.IntegerField(verbose_name="Zmiana stanu")
+    order = models.ForeignKey(
+        "Order",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        verbose_name="Zamówienie",
+    )
+    created = models.DateTimeField(auto_now_add=True, verbose_name="Data")
+    applied = models.BooleanField(default=False, verbose_name="Uwzględnione w stanie")
+
+    class Meta:
+        verbose_name = "Ruch magazynowy"
+        verbose_name_plural = "Ruchy magazynowe"
+        indexes = [
+            models.Index(
+                fields=["product"],
+                condition=models.Q(applied=False),
+                name="stock_movement_pending_idx",
+            ),
+            models.Index(
+                fields=["variant"],
+                condition=models.Q(applied=False, variant__isnull=False),
+                name="variant_movement_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product}: {self.quantity:+d} ({self.get_kind_display()})"
+
+
 class Order(models.Model):
     """
     Cart: related ShoppingCart object
@@ -260,12 +553,24 @@ class Order(models.Model):
         the e-mail the buyer-guest who placed the order, can be null if buyer (logged-in user) exists
     Address_city, Address_zipcode, Address_street, Address_country:
         details for the address of the buyer who placed the order
-    Date: date & time of the order
+    Date: date & time of the order (of creating its draft)
+    Placed_at: date & time of placing the order, empty for draft orders; sales reports count it on this day
     Delivery: delivery method chosen for the order
     Payment: payment method chosen for the order
     Paid: True if the order was paid for, False otherwise
+    Status:
+        draft - the order details are saved, but the purchase is not confirmed yet
+        placed - the purchase is confirmed, the stock is decreased
+    Idempotency_key: key of the confirmation form, renewed every time the draft order changes;
+        the purchase is placed only once for the key, even if the form is submitted again
+    Subtotal: value of all ordered items, saved when the order is placed
+    Total: amount to pay for the order, saved when the order is placed;
+        equal to the subtotal as long as delivery is free of charge
     """
 
+    DRAFT = "draft"
+    PLACED = "placed"
+
     cart = models.OneToOneField(ShoppingCart, on_delete=models.CASCADE)
     buyer = models.ForeignKey(
         User,
@@ -291,6 +596,7 @@ class Order(models.Model):
     address_street = models.CharField(max_length=64, verbose_name="Ulica")
     address_country = models.CharField(max_length=64, verbose_name="Kraj")
     date = models.DateTimeField(auto_now_add=True, verbose_name="Data zamówienia")
+    placed_at = models.DateTimeField(null=True, blank=True, verbose_name="Data złożenia")
     delivery = models.CharField(
         max_length=32,
         choices=[("Kurier", "Kurier"), ("Odbiór własny", "Odbiór własny")],
@@ -305,15 +611,96 @@ class Order(models.Model):
         verbose_name="Sposób płatności",
     )
     paid = models.BooleanField(default=False, verbose_name="Zapłacone")
+    status = models.CharField(
+        max_length=16,
+        choices=[(DRAFT, "Szkic"), (PLACED, "Złożone")],
+        default=DRAFT,
+        verbose_name="Status",
+    )
+    idempotency_key = models.UUIDField(default=uuid.uuid4, editable=False)
+    subtotal = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Wartość produktów",
+    )
+    total = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name="Razem",
+    )
 
     class Meta:
         verbose_name = "Zamówienie"
         verbose_name_plural = "Zamówienia"
+        indexes = [models.Index(fields=["buyer", "-date"])]
 
     def __str__(self):
         output = f"Zamówienie nr: {self.id}"
         return output
 
+    def get_total(self):
+        """Amount to pay: saved total of the placed order or current total of the shopping cart."""
+        return self.total if self.total is not None else self.cart.total()
+
+
+class Address(models.Model):
+    """
+    User: owner of the address, User object
+    Street, Zipcode, City, Country: details of the address
+    Is_default: True for the address used to fill in the order form, only one default address per user
+    Last_used: when the address was used in an order for the last time
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="addresses",
+        verbose_name="Użytkownik",
+    )
+    street = models.CharField(max_length=64, verbose_name="Ulica")
+    zipcode = models.CharField(
+        max_length=6,
+        validators=[RegexValidator(regex=r"\d{2}-\d{3}")],
+        verbose_name="Kod pocztowy",
+    )
+    city = models.CharField(max_length=64, verbose_name="Miasto")
+    country = models.CharField(max_length=64, verbose_name="Kraj")
+    is_default = models.BooleanField(default=False, verbose_name="Domyślny")
+    last_used = models.DateTimeField(auto_now=True, verbose_name="Ostatnio użyty")
+
+    class Meta:
+        verbose_name = "Adres"
+        verbose_name_plural = "Adresy"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(is_default=True),
+                name="one_default_address_per_user",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "street", "zipcode", "city", "country"],
+                name="unique_user_address",
+            ),
+        ]
+        indexes = [models.Index(fields=["user", "-is_default", "-last_used"])]
+
+    def __str__(self):
+        return f"{self.street}, {self.zipcode} {self.city}, {self.country}"
+
+    def as_order_data(self):
+        """Address details named as the address fields of the Order model."""
+        return {
+            "address_street": self.street,
+            "address_zipcode": self.zipcode,
+            "address_city": self.city,
+            "address_country": self.country,
+        }
+
 
 class CarService(models.Model):
     """
@@ -334,3 +721,305 @@ class CarService(models.Model):
     class Meta:
         verbose_name = "Warsztat - usługa"
         verbose_name_plural = "Warsztat - usługi"
+
+
+class DailySales(models.Model):
+    """
+    Sales of one day, rolled up from placed orders (see niunius.reports).
+    Day: date of the orders (local time)
+    Units: number of sold items
+    Revenue: value of sold items, at unit prices saved at the purchase
+    Orders: number of orders with sold items
+    """
+
+    day = models.DateField(verbose_name="Dzień")
+    units = models.IntegerField(default=0, verbose_name="Sprzedane sztuki")
+    revenue = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name="Przychód"
+    )
+    orders = models.IntegerField(default=0, verbose_name="Zamówienia")
+
+    class Meta:
+        abstract = True
+
+
+class DailyProductSales(DailySales):
+    """
+    Product: sold Product object
+    """
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="daily_sales",
+        verbose_name="Produkt",
+    )
+
+    class Meta:
+        verbose_name = "Sprzedaż dzienna - produkt"
+        verbose_name_plural = "Sprzedaż dzienna - produkty"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "product"], name="one_product_sales_per_day")
+        ]
+        indexes = [models.Index(fields=["product", "day"])]
+
+    def __str__(self):
+        return f"{self.day}: {self.product}"
+
+
+class DailyCategorySales(DailySales):
+    """
+    Category: Category object of sold products; a product in several categories is counted in each of them
+    """
+
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="daily_sales",
+        verbose_name="Kategoria",
+    )
+
+    class Meta:
+        verbose_name = "Sprzedaż dzienna - kategoria"
+        verbose_name_plural = "Sprzedaż dzienna - kategorie"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "category"], name="one_category_sales_per_day")
+        ]
+        indexes = [models.Index(fields=["category", "day"])]
+
+    def __str__(self):
+        return f"{self.day}: {self.category}"
+
+
+class DailyCarSales(DailySales):
+    """
+    Car: Car object which sold products fit; a product which fits several cars is counted for each of them
+    """
+
+    car = models.ForeignKey(
+        Car,
+        on_delete=models.CASCADE,
+        related_name="daily_sales",
+        verbose_name="Auto",
+    )
+
+    class Meta:
+        verbose_name = "Sprzedaż dzienna - auto"
+        verbose_name_plural = "Sprzedaż dzienna - auta"
+        constraints = [models.UniqueConstraint(fields=["day", "car"], name="one_car_sales_per_day")]
+        indexes = [models.Index(fields=["car", "day"])]
+
+    def __str__(self):
+        return f"{self.day}: {self.car}"
+
+
+class MediaBlob(models.Model):
+    """
+    Name: name of the uploaded file in the content-addressed media storage (niunius.storage)
+    Size: size of the file, in bytes
+    References: number of objects (article photos, products, cars) using the file;
+        the file is deleted when it is not used any more
+    Created: date & time when the file was uploaded for the first time
+    """
+
+    name = models.CharField(max_length=255, unique=True, verbose_name="Plik")
+    size = models.BigIntegerField(default=0, verbose_name="Rozmiar")
+    references = models.PositiveIntegerField(default=0, verbose_name="Liczba odwołań")
+    created = models.DateTimeField(auto_now_add=True, verbose_name="Dodano")
+
+    class Meta:
+        verbose_name = "Plik"
+        verbose_name_plural = "Pliki"
+
+    def __str__(self):
+        return f"{self.name} ({self.references})"
+
+
+class CatalogVersion(models.Model):
+    """
+    Version: number increased on every change of products, cars and categories (see niunius.catalog);
+        ETags of the catalog API are made of it, changes of the catalog are numbered with it
+    Changed: date & time of the last change
+    Compacted: version up to which changes of deleted objects have been compacted away;
+        clients synchronized before it must download the whole catalog again
+    """
+
+    version = models.BigIntegerField(default=0, verbose_name="Wersja")
+    changed = models.DateTimeField(auto_now=True, verbose_name="Zmieniono")
+    compacted = models.BigIntegerField(default=0, verbose_name="Skompaktowano do wersji")
+
+    class Meta:
+        verbose_name = "Wersja katalogu"
+        verbose_name_plural = "Wersje katalogu"
+
+    def __str__(self):
+        return str(self.version)
+
+
+class CatalogChange(models.Model):
+    """
+    Seq: version of the catalog at which the object was changed, increasing in the order of commits
+    Kind: kind of the changed object: product, car or category
+    Object id: id of the changed object
+    Deleted: whether the object has been deleted
+    Changed: date & time of the change
+    Only the last change of each object is kept (see niunius.catalog).
+    """
+
+    PRODUCT = "product"
+    CAR = "car"
+    CATEGORY = "category"
+    KIND_CHOICES = [
+        (PRODUCT, "produkt"),
+        (CAR, "auto"),
+        (CATEGORY, "kategoria"),
+    ]
+
+    seq = models.BigIntegerField(unique=True, verbose_name="Numer zmiany")
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, verbose_name="Rodzaj")
+    object_id = models.PositiveIntegerField(verbose_name="Id obiektu")
+    deleted = models.BooleanField(default=False, verbose_name="Usunięty")
+    changed = models.DateTimeField(auto_now_add=True, verbose_name="Zmieniono")
+
+    class Meta:
+        verbose_name = "Zmiana katalogu"
+        verbose_name_plural = "Zmiany katalogu"
+        indexes = [models.Index(fields=["kind", "object_id"])]
+
+    def __str__(self):
+        return f"{self.seq}: {self.kind} {self.object_id}"
+
+
+class CoPurchase(models.Model):
+    """
+    Product: Product object
+    Other: another Product object ordered together with the product
+    Count: number of placed orders containing both products
+    Each pair of products is stored in both directions (see niunius.recommendations).
+    """
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="co_purchases",
+        verbose_name="Produkt",
+    )
+    other = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Kupowany razem z",
+    )
+    count = models.PositiveIntegerField(verbose_name="Liczba zamówień")
+
+    class Meta:
+        verbose_name = "Zakup razem"
+        verbose_name_plural = "Zakupy razem"
+        constraints = [
+            models.UniqueConstraint(fields=["product", "other"], name="one_co_purchase_per_pair")
+        ]
+
+    def __str__(self):
+        return f"{self.product} + {self.other}: {self.count}"
+
+
+class Recommendation(models.Model):
+    """
+    Product: Product object on whose page the recommendation is shown
+    Recommended: Product object frequently bought together with the product
+    Rank: position of the recommendation, from 0 (the most frequently bought together)
+    Score: number of placed orders containing both products
+    """
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="recommendations",
+        verbose_name="Produkt",
+    )
+    recommended = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="recommended_with",
+        verbose_name="Polecany produkt",
+    )
+    rank = models.PositiveSmallIntegerField(verbose_name="Pozycja")
+    score = models.PositiveIntegerField(verbose_name="Liczba zamówień")
+
+    class Meta:
+        verbose_name = "Polecany produkt"
+        verbose_name_plural = "Polecane produkty"
+        constraints = [
+            models.UniqueConstraint(fields=["product", "rank"], name="one_recommendation_per_rank")
+        ]
+
+    def __str__(self):
+        return f"{self.product}: {self.rank}. {self.recommended}"
+
+
+class SimilarProduct(models.Model):
+    """
+    Product: Product object on whose page the similar product is shown
+    Similar: Product object with a similar name and description
+    Rank: position of the similar product, from 0 (the most similar)
+    Score: cosine similarity of TF-IDF vectors of both products (see niunius.similarity)
+    """
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="similar_products",
+        verbose_name="Produkt",
+    )
+    similar = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="similar_to",
+        verbose_name="Podobny produkt",
+    )
+    rank = models.PositiveSmallIntegerField(verbose_name="Pozycja")
+    score = models.FloatField(verbose_name="Podobieństwo")
+
+    class Meta:
+        verbose_name = "Podobny produkt"
+        verbose_name_plural = "Podobne produkty"
+        constraints = [
+            models.UniqueConstraint(fields=["product", "rank"], name="one_similar_product_per_rank")
+        ]
+
+    def __str__(self):
+        return f"{self.product}: {self.rank}. {self.similar}"
+
+
+class RelatedArticle(models.Model):
+    """
+    Article: Article object under which the related article is shown
+    Related: Article object with a similar title and content
+    Rank: position of the related article, from 0 (the most similar)
+    Score: cosine similarity of TF-IDF vectors of both articles (see niunius.similarity)
+    """
+
+    article = models.ForeignKey(
+        Article,
+        on_delete=models.CASCADE,
+        related_name="related_articles",
+        verbose_name="Artykuł",
+    )
+    related = models.ForeignKey(
+        Article,
+        on_delete=models.CASCADE,
+        related_name="related_to",
+        verbose_name="Powiązany artykuł",
+    )
+    rank = models.PositiveSmallIntegerField(verbose_name="Pozycja")
+    score = models.FloatField(verbose_name="Podobieństwo")
+
+    class Meta:
+        verbose_name = "Powiązany artykuł"
+        verbose_name_plural = "Powiązane artykuły"
+        constraints = [
+            models.UniqueConstraint(fields=["article", "rank"], name="one_related_article_per_rank")
+        ]
+
+    def __str__(self):
+        return f"{self.article}: {self.rank}. {self.related}"
@@ -0,0 +1,178 @@
+"""
+Ingestion of photos uploaded with articles.
+
+Uploads are streamed to temporary files on disk in chunks (LimitedUploadHandler), files larger than
+settings.UPLOAD_MAX_FILE_SIZE are skipped while they are being received.
+The article form checks only headers of the photos (format and dimensions, without decoding them),
+then the photos are moved to a spool directory and handed over to a pool of worker threads,
+so the request returns at once. A worker decodes each photo, scales it down to
+settings.ARTICLE_PHOTO_MAX_DIMENSION, re-encodes it and saves it, and finally inserts ArticlePhoto rows
+of the whole article with one bulk_create. Photos are processed one by one and the pool is small,
+so the memory used does not depend on the number of photos.
+"""
+import logging
+import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from .blobs import add_reference
+from .models import ArticlePhoto
+
+logger = logging.getLogger(__name__)
+
+PHOTO_FORMATS = {"JPEG", "PNG", "GIF", "WEBP"}
+
+_executor = None
+
+
+def photo_setting(name):
+    defaults = {
+        "UPLOAD_MAX_FILE_SIZE": 20 * 1024 * 1024,
+        "ARTICLE_PHOTO_MAX_PIXELS": 50_000_000,
+        "ARTICLE_PHOTO_MAX_DIMENSION": 2048,
+        "ARTICLE_PHOTO_WORKERS": 2,
+        "ARTICLE_PHOTO_SPOOL_DIR": os.path.join(tempfile.gettempdir(), "niunius-photos"),
+    }
+    return getattr(settings, name, defaults[name])
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream every uploaded file to a temporary file on disk, never to memory,
+    and skip files larger than settings.UPLOAD_MAX_FILE_SIZE as soon as the limit is exceeded.
+    Names of skipped files are kept in request.skipped_uploads.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > photo_setting("UPLOAD_MAX_FILE_SIZE"):
+            self.file.close()
+            if not hasattr(self.request, "skipped_uploads"):
+                self.request.skipped_uploads = []
+            self.request.skipped_uploads.append(self.file_name)
+            raise SkipFile
+        return super().receive_data_chunk(raw_data, start)
+
+
+def check_photo(upload):
+    """
+    Check the uploaded photo by its header only: the format and the dimensions.
+    Raise ValidationError if it is not a supported image or it is too large.
+    """
+    try:
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(f"Plik {upload.name} nie jest obsługiwanym zdjęciem.")
+    finally:
+        upload.seek(0)
+    if image_format not in PHOTO_FORMATS:
+        raise ValidationError(f"Plik {upload.name} nie jest obsługiwanym zdjęciem.")
+    if width * height > photo_setting("ARTICLE_PHOTO_MAX_PIXELS"):
+        raise ValidationError(f"Zdjęcie {upload.name} ma zbyt duże wymiary.")
+
+
+def spool(upload):
+    """Move the uploaded file to the spool directory, so it outlives the request. Return its path."""
+    spool_dir = photo_setting("ARTICLE_PHOTO_SPOOL_DIR")
+    os.makedirs(spool_dir, exist_ok=True)
+    path = os.path.join(spool_dir, f"{uuid.uuid4().hex}{os.path.splitext(upload.name)[1].lower()}")
+    if hasattr(upload, "temporary_file_path"):
+        try:
+            os.replace(upload.temporary_file_path(), path)
+            return path
+        except OSError:
+            pass  # another file system - copied below
+    with open(path, "wb") as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    return path
+
+
+def reencode(path):
+    """Decode the photo, scale it down and re-encode it. Return the name and the content of the new file."""
+    max_dimension = photo_setting("ARTICLE_PHOTO_MAX_DIMENSION")
+    with Image.open(path) as image:
+        if image.width * image.height > photo_setting("ARTICLE_PHOTO_MAX_PIXELS"):
+            raise ValueError("image too large")
+        image.draft("RGB", (max_dimension, max_dimension))  # JPEG is decoded at a smaller scale
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension))
+        output = BytesIO()
+        if image.mode in ("RGBA", "LA", "P"):
+            image.save(output, "PNG", optimize=True)
+            extension = ".png"
+        else:
+            image.convert("RGB").save(output, "JPEG", quality=85, optimize=True, progressive=True)
+            extension = ".jpg"
+    return f"{os.path.splitext(os.path.basename(path))[0]}{extension}", output.getvalue()
+
+
+def ingest(article_id, paths):
+    """Re-encode and save the spooled photos, then insert ArticlePhoto rows of the article in one query."""
+    upload_to = ArticlePhoto._meta.get_field("photo").upload_to
+    names = []
+    try:
+        for path in paths:
+            try:
+                name, content = reencode(path)
+            except Exception:
+                logger.exception("Photo %s of article %s rejected", path, article_id)
+                continue
+            names.append(default_storage.save(os.path.join(upload_to, name), ContentFile(content)))
+        with transaction.atomic():
+            ArticlePhoto.objects.bulk_create(
+                [ArticlePhoto(article_id=article_id, photo=name) for name in names]
+            )
+            # bulk_create does not send signals counting references to the files
+            for name in names:
+                add_reference(name)
+    finally:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=photo_setting("ARTICLE_PHOTO_WORKERS"), thread_name_prefix="photos"
+        )
+    return _executor
+
+
+def run_in_worker(article_id, paths):
+    try:
+        ingest(article_id, paths)
+    finally:
+        # connections are per thread, do not leave them open in the pool
+        connections.close_all()
+
+
+def ingest_uploads(article, uploads):
+    """
+    Spool the uploaded (already checked) photos of the article and process them in the worker pool,
+    once the article is saved. With settings.ARTICLE_PHOTO_WORKERS = 0 they are processed at once.
+    """
+    paths = [spool(upload) for upload in uploads]
+    if not paths:
+        return
+    if photo_setting("ARTICLE_PHOTO_WORKERS") == 0:
+        ingest(article.pk, paths)
+    else:
+        transaction.on_commit(lambda: executor().submit(run_in_worker, article.pk, paths))
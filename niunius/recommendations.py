@@ -0,0 +1,166 @@
+"""
+"Frequently bought together": products most often ordered together with a product.
+
+Co-purchase counts - for each pair of products, the number of placed orders containing both -
+form a sparse symmetric matrix stored as CoPurchase rows (each pair in both directions).
+update_recommendations() (the update_recommendations command) counts products of ordered carts
+(ShoppingCart.is_ordered) not counted yet, so each run processes only new purchases,
+and saves the top settings.RECOMMENDATIONS_PER_PRODUCT products of every product with new pairs
+as its Recommendation rows. A product page reads them with one indexed query.
+
+Counting is vectorized with NumPy: the items of a batch of carts are expanded to all pairs
+within their carts and counted with np.unique, the top products are chosen with one sort.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import CartItem, CoPurchase, Product, Recommendation, ShoppingCart
+
+BATCH_SIZE = 500
+
+
+def per_product():
+    return getattr(settings, "RECOMMENDATIONS_PER_PRODUCT", 6)
+
+
+def group_starts(values):
+    """Positions at which runs of equal values of the sorted array start."""
+    return np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+
+
+def count_pairs(cart_ids, product_ids):
+    """
+    Count pairs of different products ordered in the same carts.
+    cart_ids, product_ids: arrays of distinct items of carts, in any order.
+    Return arrays (products, others, counts) with each pair in both directions.
+    """
+    if not len(cart_ids):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+    order = np.lexsort((product_ids, cart_ids))
+    carts, products = cart_ids[order], product_ids[order]
+    starts = group_starts(carts)
+    sizes = np.diff(np.r_[starts, len(carts)])
+    # the item at position i is paired with all items of its cart: positions start..start + size - 1
+    item_sizes = np.repeat(sizes, sizes)
+    item_starts = np.repeat(starts, sizes)
+    left = np.repeat(np.arange(len(carts)), item_sizes)
+    first_pair = np.cumsum(item_sizes) - item_sizes
+    right = np.repeat(item_starts - first_pair, item_sizes) + np.arange(len(left))
+    different = left != right
+    # a pair is counted as one number, np.unique of rows is much slower
+    base = np.int64(products.max()) + 1
+    keys = products[left[different]] * base + products[right[different]]
+    pairs, counts = np.unique(keys, return_counts=True)
+    return pairs // base, pairs % base, counts
+
+
+def top_pairs(products, others, counts, k):
+    """Top k pairs of each product, the highest counts first, then the lowest ids; with their ranks."""
+    if not len(products):
+        return products, others, counts, products
+    order = np.lexsort((others, -counts, products))
+    products, others, counts = products[order], others[order], counts[order]
+    starts = group_starts(products)
+    ranks = np.arange(len(products)) - np.repeat(starts, np.diff(np.r_[starts, len(products)]))
+    top = ranks < k
+    return products[top], others[top], counts[top], ranks[top]
+
+
+def add_co_purchases(products, others, counts):
+    """Add counts of pairs to the CoPurchase rows, creating rows of new pairs."""
+    new = {(int(a), int(b)): int(n) for a, b, n in zip(products, others, counts)}
+    changed = []
+    product_ids = sorted({a for a, _ in new})
+    for i in range(0, len(product_ids), BATCH_SIZE):
+        for row in CoPurchase.objects.filter(product_id__in=product_ids[i:i + BATCH_SIZE]):
+            count = new.pop((row.product_id, row.other_id), None)
+            if count is not None:
+                row.count += count
+                changed.append(row)
+    CoPurchase.objects.bulk_update(changed, ["count"], batch_size=BATCH_SIZE)
+    CoPurchase.objects.bulk_create(
+        [CoPurchase(product_id=a, other_id=b, count=n) for (a, b), n in new.items()],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class ConcurrentUpdate(Exception):
+    """Some of the carts have been counted by another update in the meantime."""
+
+
+def count_new_carts(batch_size=BATCH_SIZE):
+    """
+    Count products of ordered carts not counted yet, in batches of carts;
+    each batch is one transaction. Return ids of products with new pairs.
+    """
+    touched = set()
+    while True:
+        carts = list(
+            ShoppingCart.objects.filter(is_ordered=True, co_purchases_counted=False)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not carts:
+            return touched
+        try:
+            with transaction.atomic():
+                marked = ShoppingCart.objects.filter(pk__in=carts, co_purchases_counted=False).update(
+                    co_purchases_counted=True
+                )
+                if marked != len(carts):
+                    raise ConcurrentUpdate
+                items = CartItem.objects.filter(cart_id__in=carts).values_list("cart_id", "product_id")
+                items = np.array(list(items.distinct()), dtype=np.int64).reshape(-1, 2)
+                products, others, counts = count_pairs(items[:, 0], items[:, 1])
+                add_co_purchases(products, others, counts)
+        except ConcurrentUpdate:
+            continue
+        touched.update(int(pk) for pk in np.unique(products))
+
+
+def save_recommendations(product_ids, k=None):
+    """Save top k products bought together with each of the given products as its recommendations."""
+    k = per_product() if k is None else k
+    product_ids = sorted(product_ids)
+    for i in range(0, len(product_ids), BATCH_SIZE):
+        batch = product_ids[i:i + BATCH_SIZE]
+        rows = CoPurchase.objects.filter(product_id__in=batch).values_list("product_id", "other_id", "count")
+        rows = np.array(list(rows), dtype=np.int64).reshape(-1, 3)
+        products, others, counts, ranks = top_pairs(rows[:, 0], rows[:, 1], rows[:, 2], k)
+        with transaction.atomic():
+            Recommendation.objects.filter(product_id__in=batch).delete()
+            Recommendation.objects.bulk_create(
+                [
+                    Recommendation(product_id=a, recommended_id=b, score=n, rank=rank)
+                    for a, b, n, rank in zip(*(array.tolist() for array in (products, others, counts, ranks)))
+                ],
+                batch_size=BATCH_SIZE,
+            )
+
+
+def update_recommendations(batch_size=BATCH_SIZE):
+    """Count new purchases, update recommendations of their products and return the number of the products."""
+    touched = count_new_carts(batch_size)
+    save_recommendations(touched)
+    return len(touched)
+
+
+def rebuild_recommendations(batch_size=BATCH_SIZE):
+    """Count all purchases again and replace all recommendations."""
+    with transaction.atomic():
+        CoPurchase.objects.all().delete()
+        Recommendation.objects.all().delete()
+        ShoppingCart.objects.filter(co_purchases_counted=True).update(co_purchases_counted=False)
+    return update_recommendations(batch_size)
+
+
+def recommended_products(slug, limit=None):
+    """Available products recommended on the page of the product with the given slug, in one query."""
+    limit = per_product() if limit is None else limit
+    return (
+        Product.objects.filter(recommended_with__product__slug=slug)
+        .exclude(stock=0)
+        .order_by("recommended_with__rank")[:limit]
+    )
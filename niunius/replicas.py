@@ -0,0 +1,137 @@
+"""
+Reads of the catalog and the blog from database replicas.
+
+settings.DATABASE_REPLICAS lists aliases of replicas of the "default" (primary) database
+(by default all databases other than "default"). Catalog and blog models are read from a replica
+only during GET requests of the read-only pages (REPLICA_URL_NAMES), one replica chosen per request.
+Everything else - carts, orders, purchases, the admin site, management commands - reads from
+and writes to the primary.
+
+Replicas lag behind the primary, so once a request has written anything, the session of the client
+is pinned to the primary for settings.REPLICA_PIN_SECONDS and the client reads its own writes.
+
+The state of the current request is kept in a context variable, so it is seen by the router
+in the thread of a sync view as well as in threads running queries of async views.
+"""
+import asyncio
+import contextvars
+import random
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_URL_NAMES = {"shop", "search", "products", "car", "category", "product", "blog", "article-detail"}
+
+REPLICA_MODELS = {
+    "niunius.car",
+    "niunius.category",
+    "niunius.product",
+    "niunius.productvariant",
+    "niunius.product_cars",
+    "niunius.product_categories",
+    "niunius.recommendation",
+    "niunius.similarproduct",
+    "niunius.article",
+    "niunius.articlephoto",
+    "niunius.articlecomment",
+    "niunius.relatedarticle",
+}
+
+PIN_SESSION_KEY = "_primary_db_until"
+
+_routing = contextvars.ContextVar("replica_routing", default=None)
+
+
+class Routing:
+    """
+    Replica: alias of the replica chosen for the request, or None
+    Wrote: whether the request has written anything
+    """
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+def replicas():
+    aliases = getattr(settings, "DATABASE_REPLICAS", None)
+    if aliases is None:
+        aliases = [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+    return aliases
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None and routing.replica and model._meta.label_lower in REPLICA_MODELS:
+            return routing.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        # sessions are saved by every request using them, the pin itself is saved in the session
+        if routing is not None and model._meta.app_label != "sessions":
+            routing.wrote = True
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db in replicas():
+            # objects read from a replica are saved to the primary
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """Choose the database of the request and pin the session to the primary after a write."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = _routing.set(Routing())
+        try:
+            response = self.get_response(request)
+            self.pin(request)
+        finally:
+            _routing.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        token = _routing.set(Routing())
+        try:
+            response = await self.get_response(request)
+            await sync_to_async(self.pin, thread_sensitive=True)(request)
+        finally:
+            _routing.reset(token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = _routing.get()
+        aliases = replicas()
+        if (
+            routing is None
+            or not aliases
+            or request.method not in ("GET", "HEAD")
+            or request.resolver_match.url_name not in REPLICA_URL_NAMES
+            or request.session.get(PIN_SESSION_KEY, 0) > time.time()
+        ):
+            return None
+        routing.replica = random.choice(aliases)
+        return None
+
+    def pin(self, request):
+        if _routing.get().wrote and replicas():
+            request.session[PIN_SESSION_KEY] = time.time() + getattr(settings, "REPLICA_PIN_SECONDS", 10)
@@ -0,0 +1,211 @@
+"""
+Sales reports.
+
+Placed orders are rolled up into daily aggregates per product, per category and per car
+(DailyProductSales, DailyCategorySales, DailyCarSales) when they are placed,
+so sales reports read a few rows per day instead of scanning orders and cart items.
+Sales of a product count for its categories and all their ancestors (once per category,
+even if the product is in several of its subcategories), so a parent category shows the sales
+of its whole subtree.
+Orders placed before the reports were introduced are rolled up with the backfill_sales_report command.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CartItem, Category, DailyCarSales, DailyCategorySales, DailyProductSales, Order, Product
+
+# Aggregate model: field of the sold product it is rolled up by.
+ROLLUPS = {
+    DailyProductSales: "product",
+    DailyCategorySales: "category",
+    DailyCarSales: "car",
+}
+
+
+def add_sales(model, field, day, key, units, revenue):
+    """Add sales of one order to the aggregate row of the day, creating the row if needed."""
+    rows = model.objects.filter(day=day, **{f"{field}_id": key})
+    increment = {"units": F("units") + units, "revenue": F("revenue") + revenue, "orders": F("orders") + 1}
+    if rows.update(**increment):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(day=day, units=units, revenue=revenue, orders=1, **{f"{field}_id": key})
+    except IntegrityError:
+        # the row has been created by a concurrent order in the meantime
+        rows.update(**increment)
+
+
+def category_links(product_ids):
+    """
+    Categories the sales of the products count for: their categories and the ancestors of those,
+    as {product id: set of category ids}. Two queries - the categories of the products
+    with their positions in the tree, then their ancestors by the positions.
+    """
+    categories = Product.categories.through.objects.filter(product_id__in=product_ids).values_list(
+        "product_id", "category__tree_id", "category__lft", "category__rght"
+    )
+    positions = {}
+    for product_id, *position in categories:
+        positions.setdefault(product_id, set()).add(tuple(position))
+    nodes = set().union(*positions.values())
+    if not nodes:
+        return {}
+    ancestors = Q()
+    for tree_id, lft, rght in nodes:
+        ancestors |= Q(tree_id=tree_id, lft__lte=lft, rght__gte=rght)
+    rows = list(Category.objects.filter(ancestors).values_list("pk", "tree_id", "lft", "rght"))
+    return {
+        product_id: {
+            pk
+            for pk, tree_id, lft, rght in rows
+            for node_tree_id, node_lft, node_rght in nodes
+            if tree_id == node_tree_id and lft <= node_lft and rght >= node_rght
+        }
+        for product_id, nodes in positions.items()
+    }
+
+
+def roll_up_order(order, items):
+    """
+    Add the ordered items (CartItem objects with unit prices set) to the daily sales aggregates.
+    Called when the order is placed, within the same transaction; the order counts on the day it is placed.
+    """
+    day = timezone.localdate(order.placed_at)
+    totals = {field: {} for field in ROLLUPS.values()}
+
+    def add(field, key, units, revenue):
+        current = totals[field].get(key, (0, 0))
+        totals[field][key] = (current[0] + units, current[1] + revenue)
+
+    cars = Product.cars.through.objects.filter(product_id__in=[i.product_id for i in items])
+    links = {"category": category_links([i.product_id for i in items]), "car": {}}
+    for product_id, car_id in cars.values_list("product_id", "car_id"):
+        links["car"].setdefault(product_id, []).append(car_id)
+
+    for item in items:
+        revenue = item.quantity * item.unit_price
+        add("product", item.product_id, item.quantity, revenue)
+        for field in ("category", "car"):
+            for key in links[field].get(item.product_id, []):
+                add(field, key, item.quantity, revenue)
+
+    for model, field in ROLLUPS.items():
+        for key, (units, revenue) in totals[field].items():
+            add_sales(model, field, day, key, units, revenue)
+
+
+def sold_items(day):
+    """Cart items of orders placed on the given day."""
+    return CartItem.objects.filter(cart__order__status=Order.PLACED, cart__order__placed_at__date=day)
+
+
+def category_rows(day, price):
+    """
+    Sales of the given day per category, with the ancestors of the categories of products
+    (category_links) - summed from the items of the day, so an item is counted once per category.
+    """
+    items = list(
+        sold_items(day)
+        .annotate(sold_price=price)
+        .values_list("cart_id", "product_id", "quantity", "sold_price")
+    )
+    links = category_links({product_id for _, product_id, _, _ in items})
+    totals = {}
+    for cart_id, product_id, quantity, unit_price in items:
+        for category_id in links.get(product_id, ()):
+            row = totals.setdefault(category_id, {"units": 0, "revenue": 0, "carts": set()})
+            row["units"] += quantity
+            row["revenue"] += quantity * unit_price
+            row["carts"].add(cart_id)
+    return [
+        {"category": key, "units": row["units"], "revenue": row["revenue"], "orders": len(row["carts"])}
+        for key, row in totals.items()
+    ]
+
+
+def rebuild_day(day):
+    """
+    Recompute the daily sales aggregates of the given day from placed orders, with one grouped query
+    per aggregate model (categories are summed from the items, see category_rows).
+    Unit prices of items of old orders may be missing, current prices are used then.
+    """
+    price = Coalesce("unit_price", "variant__price", "product__price")
+    lookups = {"product": "product", "category": "category", "car": "product__cars"}
+    with transaction.atomic():
+        for model, field in ROLLUPS.items():
+            model.objects.filter(day=day).delete()
+            if field == "category":
+                rows = category_rows(day, price)
+            else:
+                rows = (
+                    sold_items(day)
+                    .filter(**{f"{lookups[field]}__isnull": False})
+                    .values(lookups[field])
+                    .annotate(
+                        units=Sum("quantity"),
+                        revenue=Sum(
+                            F("quantity") * price, output_field=DecimalField(max_digits=12, decimal_places=2)
+                        ),
+                        orders=Count("cart", distinct=True),
+                    )
+                    .order_by()
+                )
+            model.objects.bulk_create(
+                [
+                    model(
+                        day=day,
+                        units=row["units"],
+                        revenue=row["revenue"],
+                        orders=row["orders"],
+                        **{f"{field}_id": row[lookups[field]]},
+                    )
+                    for row in rows
+                ]
+            )
+
+
+def sales_by_day(since):
+    """Units and revenue per day since the given day, one indexed query."""
+    return list(
+        DailyProductSales.objects.filter(day__gte=since)
+        .values("day")
+        .annotate(units=Sum("units"), revenue=Sum("revenue"))
+        .order_by("day")
+    )
+
+
+def top_sales(model, since, labels, limit=10):
+    """
+    Best selling objects of the aggregate model (by revenue) since the given day.
+    Labels are the fields of the related object returned along with the sums, e.g. ["product__name"].
+    """
+    return list(
+        model.objects.filter(day__gte=since)
+        .values(ROLLUPS[model], *labels)
+        .annotate(units=Sum("units"), revenue=Sum("revenue"))
+        .order_by("-revenue")[:limit]
+    )
+
+
+def sales_dashboard(days=30):
+    """Data of the sales dashboard for the last given number of days (including today)."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    daily = sales_by_day(since)
+    top_revenue = max((row["revenue"] for row in daily), default=0)
+    for row in daily:
+        row["percent"] = round(row["revenue"] / top_revenue * 100) if top_revenue else 0
+    return {
+        "days": days,
+        "since": since,
+        "daily": daily,
+        "revenue": sum((row["revenue"] for row in daily), 0),
+        "units": sum(row["units"] for row in daily),
+        "products": top_sales(DailyProductSales, since, ["product__name", "product__code"]),
+        "categories": top_sales(DailyCategorySales, since, ["category__name"]),
+        "cars": top_sales(DailyCarSales, since, ["car__brand", "car__model"]),
+    }
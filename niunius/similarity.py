@@ -0,0 +1,209 @@
+"""
+Similar products and related articles, by the similarity of their texts.
+
+Texts (names and descriptions of products, titles and contents of articles) are folded to lowercase
+ASCII (so "Łożysko" and "lozysko" are the same word), split into words and stripped of Polish
+stop words; words in more than MAX_DF of the texts (like stop words of the shop) are left out too.
+Each text becomes a TF-IDF vector:
+sublinear term frequency times smoothed inverse document frequency, cut to its MAX_TERMS heaviest
+words and normalized, so the dot product of two vectors is their cosine similarity.
+
+Similarities of all pairs are a sparse matrix product computed with NumPy in batches of rows:
+each word of a row is expanded to all texts with the same word and the products of their weights
+are summed per pair with np.bincount; the top k texts of each row are kept. Batches are cut
+so that both the scores and the expanded pairs fit in BATCH_CELLS - words shared by many texts
+(a product line, like "opona" of all tyres) make batches of fewer rows, not larger ones.
+
+update_similarities() (the update_similarities command) computes them offline
+and replaces SimilarProduct and RelatedArticle rows; pages read them with one indexed query.
+"""
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import Article, Product, RelatedArticle, SimilarProduct
+
+# Scores of a batch of rows against all texts, and pairs of texts sharing words within a batch:
+# at most this many of each (8 bytes per cell).
+BATCH_CELLS = 4_000_000
+
+# Words kept in a vector: the heaviest ones, the rest hardly changes the similarity.
+MAX_TERMS = 32
+
+# Words in a larger part of texts (and in more than two) are left out, like stop words.
+# Words of a group of products (e.g. "lampa" of all lamps) make them similar, so only words
+# of most of the texts are left out.
+MAX_DF = 0.5
+
+STOP_WORDS = frozenset("""
+a aby ale albo ani az bez bo by byc byl byla byli bylo byly chociaz czy czyli dla do gdy gdyz go i ich
+ile im innych jak jaki jako je jednak jego jej jest jestem jesli jezeli juz ku lecz lub ma maja mi
+miedzy mnie moze mu na nad nam nas nawet nic nie niz no o od oraz po pod poniewaz przed przez przy
+sa sie sobie tak takze tam te tego tej ten to toz tu tym tylko u w we wiec wszystko z za ze zeby
+""".split())
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text):
+    """Lowercase text without Polish (and other) diacritics."""
+    text = text.lower().replace("ł", "l")
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def words(text):
+    return [word for word in WORD_RE.findall(fold(text)) if len(word) > 1 and word not in STOP_WORDS]
+
+
+def vectorize(texts, max_terms=MAX_TERMS, max_df=MAX_DF):
+    """
+    TF-IDF vectors of the texts as a sparse matrix: arrays (rows, terms, weights) sorted by rows,
+    without words in more than max_df of the texts, each row cut to max_terms heaviest terms
+    and normalized to the unit length.
+    """
+    vocabulary = {}
+    rows, terms, counts = [], [], []
+    for row, text in enumerate(texts):
+        for word, count in Counter(words(text)).items():
+            rows.append(row)
+            terms.append(vocabulary.setdefault(word, len(vocabulary)))
+            counts.append(count)
+    rows, terms = np.array(rows, dtype=np.int64), np.array(terms, dtype=np.int64)
+    if not len(rows):
+        return rows, terms, np.array([], dtype=np.float64)
+    df = np.bincount(terms, minlength=len(vocabulary))
+    idf = np.log((1 + len(texts)) / (1 + df)) + 1
+    weights = (1 + np.log(np.array(counts, dtype=np.float64))) * idf[terms]
+    rare = df[terms] <= max(max_df * len(texts), 2)
+    rows, terms, weights = rows[rare], terms[rare], weights[rare]
+    # the heaviest terms of each row first, the rest is cut
+    order = np.lexsort((-weights, rows))
+    rows, terms, weights = rows[order], terms[order], weights[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    positions = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+    kept = positions < max_terms
+    rows, terms, weights = rows[kept], terms[kept], weights[kept]
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(texts)))
+    return rows, terms, weights / norms[rows] if len(rows) else weights
+
+
+def batches(costs, max_rows, limit):
+    """
+    Split rows with the given costs into consecutive batches (first, last) of at most max_rows rows,
+    with at most the limit of costs together (or one row, if it costs more by itself).
+    """
+    ends = np.cumsum(costs)
+    first = 0
+    while first < len(costs):
+        start = ends[first - 1] if first else 0
+        last = int(np.searchsorted(ends, start + limit, side="right"))
+        last = min(max(last, first + 1), first + max_rows, len(costs))
+        yield first, last
+        first = last
+
+
+def nearest(texts, k, max_df=MAX_DF):
+    """
+    Top k most similar texts of each text (only with a similarity above 0).
+    Return arrays (sources, targets, scores, ranks) of positions of texts in the list.
+    """
+    n = len(texts)
+    top = min(k, n - 1)
+    result = [], [], [], []
+    if top <= 0:
+        return tuple(np.array([], dtype=dtype) for dtype in (np.int64, np.int64, np.float64, np.int64))
+    rows, terms, weights = vectorize(texts, max_df=max_df)
+    # postings: rows of each term, for expanding terms of a batch to all rows sharing them
+    by_term = np.argsort(terms, kind="stable")
+    posting_rows, posting_weights = rows[by_term], weights[by_term]
+    posting_starts = np.searchsorted(terms[by_term], np.arange(terms.max() + 1 if len(terms) else 0))
+    posting_sizes = np.diff(np.r_[posting_starts, len(terms)])
+    row_starts = np.searchsorted(rows, np.arange(n + 1))
+    # pairs of each row with the texts sharing its words
+    expanded = np.bincount(rows, weights=posting_sizes[terms], minlength=n)
+    for first, last in batches(expanded, max(1, BATCH_CELLS // n), BATCH_CELLS):
+        batch = slice(row_starts[first], row_starts[last])
+        batch_rows, batch_terms, batch_weights = rows[batch] - first, terms[batch], weights[batch]
+        sizes = posting_sizes[batch_terms]
+        # position of each expanded pair within the postings of its term
+        offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        postings = np.repeat(posting_starts[batch_terms], sizes) + offsets
+        scores = np.bincount(
+            np.repeat(batch_rows, sizes) * n + posting_rows[postings],
+            weights=np.repeat(batch_weights, sizes) * posting_weights[postings],
+            minlength=(last - first) * n,
+        ).reshape(last - first, n)
+        scores[np.arange(last - first), np.arange(first, last)] = 0  # not similar to itself
+        candidates = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        # the most similar first, ties by position
+        order = np.lexsort((candidates, -candidate_scores), axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        ranks = np.broadcast_to(np.arange(top), candidates.shape)
+        sources = np.broadcast_to(np.arange(first, last)[:, None], candidates.shape)
+        similar = candidate_scores > 0
+        for values, array in zip(result, (sources, candidates, candidate_scores, ranks)):
+            values.append(array[similar])
+    return tuple(np.concatenate(values) for values in result)
+
+
+def replace_similar(model, source, target, pks, texts, k):
+    """Replace all rows of the model with the top k most similar objects of each object (by pks)."""
+    sources, targets, scores, ranks = nearest(texts, k)
+    with transaction.atomic():
+        model.objects.all().delete()
+        model.objects.bulk_create(
+            [
+                model(**{f"{source}_id": pks[i], f"{target}_id": pks[j], "score": score, "rank": rank})
+                for i, j, score, rank in zip(*(array.tolist() for array in (sources, targets, scores, ranks)))
+            ],
+            batch_size=500,
+        )
+    return len(sources)
+
+
+def update_similarities():
+    """Compute similar products and related articles again. Return numbers of saved rows of both."""
+    products = list(Product.objects.order_by("pk").values_list("pk", "name", "description"))
+    # the name says more about the product than its description, it is counted twice
+    saved_products = replace_similar(
+        SimilarProduct,
+        "product",
+        "similar",
+        [pk for pk, _, _ in products],
+        [f"{name} {name} {description}" for _, name, description in products],
+        getattr(settings, "SIMILAR_PRODUCTS_PER_PRODUCT", 5),
+    )
+    articles = list(
+        Article.objects.exclude(slug="o-klubie").order_by("pk").values_list("pk", "title", "content")
+    )
+    saved_articles = replace_similar(
+        RelatedArticle,
+        "article",
+        "related",
+        [pk for pk, _, _ in articles],
+        [f"{title} {title} {content}" for _, title, content in articles],
+        getattr(settings, "RELATED_ARTICLES_PER_ARTICLE", 3),
+    )
+    return saved_products, saved_articles
+
+
+def similar_products(slug, limit=None):
+    """Available products similar to the product with the given slug, in one query."""
+    limit = getattr(settings, "SIMILAR_PRODUCTS_PER_PRODUCT", 5) if limit is None else limit
+    return (
+        Product.objects.filter(similar_to__product__slug=slug)
+        .exclude(stock=0)
+        .order_by("similar_to__rank")[:limit]
+    )
+
+
+def related_articles(slug, limit=None):
+    """Articles related to the article with the given slug, in one query."""
+    limit = getattr(settings, "RELATED_ARTICLES_PER_ARTICLE", 3) if limit is None else limit
+    return Article.objects.filter(related_to__article__slug=slug).order_by("related_to__rank")[:limit]
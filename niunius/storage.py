@@ -0,0 +1,110 @@
+"""
+Storages: of the collected static files and of the uploaded media files.
+
+Static files:
+
+collectstatic saves every static file under a name with the hash of its content
+(e.g. style.css -> style.6f2b4c3a9d1e.css), so the files can be cached by browsers forever,
+and saves gzip and brotli compressed copies next to text files,
+so the web server sends them compressed without compressing them on every request
+(see deploy/nginx/static.conf).
+
+Media files:
+uploaded files are saved under names made of the hash of their content (content-addressed "blobs"),
+so identical files uploaded many times are saved once and names never collide.
+Objects using a blob are counted in MediaBlob rows (see niunius/blobs.py).
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:  # brotli compressed copies are optional
+    brotli = None
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    compress_extensions = (".css", ".js", ".svg", ".json", ".txt", ".html", ".map", ".ico")
+    compress_min_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(self.compress_extensions):
+                self.compress(name)
+
+    def compress(self, name):
+        """Save compressed copies of the file, if they are smaller than the file."""
+        with self.open(name) as f:
+            content = f.read()
+        if len(content) < self.compress_min_size:
+            return
+        # mtime=0 makes the compressed copies the same on every build
+        variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(content, quality=11)
+        for suffix, compressed in variants.items():
+            if len(compressed) >= len(content):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+
+BLOB_DIR = "blobs"
+
+
+def blob_name(digest, extension=""):
+    """Name of the blob with the given SHA-256 hex digest, spread over subdirectories."""
+    return f"{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}"
+
+
+def is_blob(name):
+    return name.startswith(BLOB_DIR + "/")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage saving every file as a blob named by the SHA-256 digest of its content.
+    The name given when saving (e.g. from upload_to) is used for its extension only.
+    The content is hashed while it is written to a temporary file, which is then moved to the blob name -
+    or dropped if the blob exists already.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # a blob name stands for one content only, there is no collision to avoid
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1]
+        temp_dir = self.path(os.path.join(BLOB_DIR, "tmp"))
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, "wb") as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+            name = blob_name(digest.hexdigest(), extension)
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(temp_path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
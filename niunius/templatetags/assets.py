@@ -0,0 +1,38 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from niunius.assets import VENDOR_ASSETS, is_vendored, read_static
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor_asset(name, defer=False):
+    """
+    Link to the third-party asset: to its vendored copy if there is one, otherwise to the CDN.
+    A deferred stylesheet does not block rendering - used on pages with critical CSS inlined.
+    """
+    asset = VENDOR_ASSETS[name]
+    if is_vendored(asset["path"]):
+        url, attrs = static(asset["path"]), ""
+    else:
+        url = asset["url"]
+        attrs = format_html(' integrity="{}" crossorigin="anonymous"', asset["integrity"])
+    if asset["path"].endswith(".js"):
+        return format_html('<script src="{}"{}></script>', url, attrs)
+    if defer:
+        return format_html(
+            '<link rel="preload" href="{0}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'"{1}>'
+            '<noscript><link rel="stylesheet" href="{0}"{1}></noscript>',
+            url,
+            attrs,
+        )
+    return format_html('<link rel="stylesheet" href="{}"{}>', url, attrs)
+
+
+@register.simple_tag
+def inline_static(*paths):
+    """Content of the given static files (critical CSS), to be inlined into the page."""
+    return mark_safe("\n".join(read_static(path) for path in paths))
@@ -1,6 +1,64 @@
 import pytest
+from django.core.cache import cache
 from mixer.backend.django import mixer
 
+from niunius.catalog_index import reset as reset_catalog_index
+
+# Random values of tree fields would be taken by django-mptt for a position set up for insertion.
+mixer.register("niunius.Category", tree_id=mixer.SKIP, lft=mixer.SKIP, rght=mixer.SKIP, level=mixer.SKIP)
+mixer.register(
+    "niunius.ArticleComment", tree_id=mixer.SKIP, lft=mixer.SKIP, rght=mixer.SKIP, level=mixer.SKIP
+)
+
+
+@pytest.fixture(autouse=True)
+def static_files_storage(settings):
+    """Tests run without collectstatic, so there are no hashed names of static files."""
+    settings.STATICFILES_STORAGE = "django.contrib.staticfiles.storage.StaticFilesStorage"
+
+
+@pytest.fixture(autouse=True)
+def photo_workers(settings):
+    """Process uploaded photos within the request - tests run in transactions never committed."""
+    settings.ARTICLE_PHOTO_WORKERS = 0
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog_index():
+    """Each test has its own catalog, the index of the process must not outlive it."""
+    reset_catalog_index()
+    yield
+    reset_catalog_index()
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    """Cached data (like the tree of categories) must not outlive the database of a test."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def facet_catalog():
+    """Two cars, two categories and four products in different price bands, some out of stock."""
+    niva = mixer.blend("niunius.Car", brand="Łada", model="Niva", image="test.gif")
+    uaz = mixer.blend("niunius.Car", brand="UAZ", model="Hunter", image="test.gif")
+    lights = mixer.blend("niunius.Category", name="Oświetlenie")
+    brakes = mixer.blend("niunius.Category", name="Hamulce")
+    products = {}
+    for name, price, stock, cars, categories in (
+        ("lampa", 40, 3, [niva], [lights]),
+        ("reflektor", 120, 0, [niva, uaz], [lights]),
+        ("klocki", 80, 5, [uaz], [brakes]),
+        ("tarcza", 600, 2, [niva], [brakes]),
+    ):
+        product = mixer.blend("niunius.Product", name=name, price=price, stock=stock, image="test.gif")
+        product.cars.set(cars)
+        product.categories.set(categories)
+        products[name] = product
+    return niva, uaz, lights, brakes, products
+
 
 @pytest.fixture
 def order():
@@ -0,0 +1,106 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.catalog import catalog_version
+from niunius.models import Product
+
+
+@pytest.fixture
+def catalog():
+    car = mixer.blend("niunius.Car", image="test.gif")
+    category = mixer.blend("niunius.Category")
+    products = mixer.cycle(5).blend("niunius.Product", stock=4, image="test.gif")
+    for product in products[:3]:
+        product.cars.add(car)
+        product.categories.add(category)
+    return car, category, products
+
+
+@pytest.mark.django_db
+def test_products_cursor_pagination(client, catalog):
+    _, _, products = catalog
+    url = reverse("api-products") + "?limit=2"
+    ids = []
+    while url:
+        data = client.get(url).json()
+        ids += [row["id"] for row in data["results"]]
+        url = data["next"]
+    assert ids == [product.pk for product in products]
+
+
+@pytest.mark.django_db
+def test_products_sparse_fields_and_ids(client, catalog):
+    car, category, products = catalog
+    ids = f"{products[0].pk},{products[4].pk}"
+    response = client.get(reverse("api-products"), {"fields": "name,cars,categories", "ids": ids})
+    results = response.json()["results"]
+    assert results == [
+        {"name": products[0].name, "cars": [car.pk], "categories": [category.pk]},
+        {"name": products[4].name, "cars": [], "categories": []},
+    ]
+
+
+@pytest.mark.django_db
+def test_products_read_without_instances(client, catalog):
+    with CaptureQueriesContext(connection) as ctx:
+        client.get(reverse("api-products"))
+    # catalog version, products, cars and categories of products
+    assert len(ctx.captured_queries) == 4
+
+
+@pytest.mark.django_db
+def test_unknown_field_rejected(client, catalog):
+    response = client.get(reverse("api-cars"), {"fields": "id,price"})
+    assert response.status_code == 400
+    assert "price" in response.json()["error"]
+
+
+@pytest.mark.django_db
+def test_detail_and_related_lists(client, catalog):
+    car, category, products = catalog
+    data = client.get(reverse("api-product", args=[products[0].pk])).json()["result"]
+    assert data["code"] == products[0].code
+    assert data["image"] == "/media/test.gif"
+    assert len(client.get(reverse("api-car-products", args=[car.pk])).json()["results"]) == 3
+    assert len(client.get(reverse("api-category-products", args=[category.pk])).json()["results"]) == 3
+    assert client.get(reverse("api-car-products", args=[0])).status_code == 404
+    assert client.get(reverse("api-category", args=[0])).status_code == 404
+
+
+@pytest.mark.django_db
+def test_etag_follows_catalog_version(client, catalog):
+    _, _, products = catalog
+    url = reverse("api-products")
+    response = client.get(url)
+    etag = response["ETag"]
+    assert etag == f'"catalog-{catalog_version()}"'
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    products[0].name = "Nowa nazwa"
+    products[0].save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_catalog_version_bumped_on_relation_change(catalog):
+    car, _, products = catalog
+    version = catalog_version()
+    products[4].cars.add(car)
+    assert catalog_version() == version + 1
+    Product.objects.filter(pk=products[4].pk).delete()
+    assert catalog_version() == version + 2
+
+
+@pytest.mark.django_db
+def test_availability(client, catalog):
+    _, _, products = catalog
+    response = client.get(reverse("api-availability"), {"ids": f"{products[0].pk}"})
+    assert response.json()["results"] == [{"id": products[0].pk, "available": 4}]
+    assert "no-store" in response["Cache-Control"]
+    assert client.get(reverse("api-availability")).status_code == 400
@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, AsyncRequestFactory
+from django.urls import resolve, reverse
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius import async_views
+
+
+@pytest.fixture
+def asgi_urls(settings):
+    settings.ROOT_URLCONF = "my_django_project.asgi_urls"
+
+
+async def async_get(url, **kwargs):
+    return await AsyncClient().get(url, **kwargs)
+
+
+def get(url, **kwargs):
+    return async_to_sync(async_get)(url, **kwargs)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_asgi_urls_route_read_only_pages_to_async_views(asgi_urls):
+    assert resolve(reverse("shop")).func is async_views.shop
+    assert resolve(reverse("product", args=["x"])).func is async_views.product
+    assert resolve(reverse("shopping-cart")).func.__name__ == "ShoppingCartView"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_asgi_application_resolves_with_asgi_urls(settings):
+    from my_django_project.asgi import application
+
+    request = AsyncRequestFactory().get(reverse("shop"))
+    response = async_to_sync(application.get_response_async)(request)
+    assert response.status_code == 200
+    assert request.resolver_match.func is async_views.shop
+    # the settings are shared with the WSGI mode, the URLconf of the request is reset when it is finished
+    response.close()
+    assert settings.ROOT_URLCONF == "my_django_project.urls"
+    assert resolve(reverse("shop")).func.__name__ == "ShopView"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_shop_pages(asgi_urls):
+    car = mixer.blend("niunius.Car", brand="Fiat", model="126p", image="test.gif")
+    category = mixer.blend("niunius.Category", name="Silnik")
+    product = mixer.blend("niunius.Product", name="Tłok", stock=3, price=Decimal("10.00"), image="test.gif")
+    product.cars.add(car)
+    product.categories.add(category)
+
+    response = get(reverse("shop"))
+    assert response.status_code == 200
+    assert "Tłok" in response.content.decode()
+    assert "Fiat 126p" in response.content.decode()  # sidebar
+
+    for url in (reverse("car", args=[car.slug]), reverse("category", args=[category.slug])):
+        response = get(url)
+        assert response.status_code == 200
+        assert "Tłok" in response.content.decode()
+
+    response = get(reverse("product", args=[product.slug]))
+    assert response.status_code == 200
+    assert response.context["product"].available == 3
+
+    response = get(reverse("search"), data={"query": "126"})
+    assert list(response.context["search_car"]) == [car]
+
+    assert get(reverse("product", args=["brak"])).status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_blog_pages(asgi_urls):
+    article = mixer.blend("niunius.Article", title="Zlot", slug="zlot")
+    mixer.cycle(2).blend("niunius.ArticleComment", article=article)
+
+    response = get(reverse("blog"))
+    assert response.status_code == 200
+    assert list(response.context["page_obj"]) == [article]
+
+    response = get(reverse("article-detail", args=[article.slug]))
+    assert response.status_code == 200
+    assert response.context["comments_count"] == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_article_post_handled_by_sync_view(asgi_urls, client):
+    article = mixer.blend("niunius.Article", slug="zlot", like=0)
+    response = client.post(reverse("article-detail", args=[article.slug]), {"like": "1"})
+    assert response.status_code == 302
+    article.refresh_from_db()
+    assert article.like == 1
+
+
+def test_compare_servers_rejects_unknown_mode():
+    with pytest.raises(CommandError):
+        call_command("compare_servers", modes="wsgi,http3")
@@ -0,0 +1,83 @@
+import os
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.models import ArticlePhoto, Car, MediaBlob, Product
+
+GIF = b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"  # noqa: E501
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+
+def upload(name="zdjecie.gif", content=GIF):
+    return SimpleUploadedFile(name, content, content_type="image/gif")
+
+
+@pytest.mark.django_db
+def test_identical_uploads_are_stored_once(client, user, media_root):
+    for title in ("Pierwszy", "Drugi"):
+        client.post(
+            reverse("add-article"), {"title": title, "content": "Treść", "photos": [upload()]}
+        )
+    first, second = ArticlePhoto.objects.all()
+    assert first.photo.name == second.photo.name
+    assert first.photo.name.startswith("blobs/")
+    assert MediaBlob.objects.get().references == 2
+    assert len([f for f in (media_root / "blobs").rglob("*.*")]) == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_unused_blob_is_deleted(media_root):
+    article = mixer.blend("niunius.Article")
+    first = ArticlePhoto.objects.create(article=article, photo=upload())
+    second = ArticlePhoto.objects.create(article=article, photo=upload("inna.gif"))
+    path = first.photo.path
+    first.delete()
+    assert MediaBlob.objects.get().references == 1
+    assert os.path.exists(path)
+    second.delete()
+    assert not MediaBlob.objects.exists()
+    assert not os.path.exists(path)
+
+
+@pytest.mark.django_db
+def test_changed_image_moves_reference(media_root):
+    car = Car.objects.create(brand="Mitsubishi", model="Pajero", image=upload())
+    old = car.image.name
+    car.image = upload("nowe.gif", GIF + b"\x00")
+    car.save()
+    assert MediaBlob.objects.get(name=car.image.name).references == 1
+    assert not MediaBlob.objects.filter(name=old).exists()
+
+
+@pytest.mark.django_db
+def test_dedupe_media_command(media_root):
+    for directory, name in (("product_img", "a.gif"), ("product_img", "b.gif"), ("blog_img", "c.gif")):
+        os.makedirs(media_root / "niunius" / directory, exist_ok=True)
+        (media_root / "niunius" / directory / name).write_bytes(GIF)
+    first, second = mixer.cycle(2).blend("niunius.Product")
+    Product.objects.filter(pk=first.pk).update(image="niunius/product_img/a.gif")
+    Product.objects.filter(pk=second.pk).update(image="niunius/product_img/b.gif")
+    mixer.blend("niunius.ArticlePhoto", photo="niunius/blog_img/c.gif")
+    call_command("dedupe_media")
+    names = {p.image.name for p in Product.objects.all()} | {ArticlePhoto.objects.get().photo.name}
+    assert len(names) == 1
+    assert MediaBlob.objects.get().references == 3
+    assert not (media_root / "niunius" / "product_img" / "a.gif").exists()
+
+
+@pytest.mark.django_db
+def test_blob_is_served_as_immutable(client, media_root):
+    car = Car.objects.create(brand="Mitsubishi", model="Colt", image=upload())
+    response = client.get(car.image.url)
+    assert response.status_code == 200
+    assert response["Cache-Control"].endswith("immutable")
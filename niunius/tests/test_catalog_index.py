@@ -0,0 +1,103 @@
+from django.db import connection
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius import catalog_index as ci
+from niunius.facets import ProductFilters, facet_counts
+from niunius.inventory import compact_ledger, record_movement
+from niunius.models import StockMovement
+
+
+def state(index):
+    return {
+        "products": index.products,
+        "cars": {key: value for key, value in index.cars.items()},
+        "categories": {key: value for key, value in index.categories.items()},
+        "prices": index.prices,
+        "in_stock": index.in_stock,
+        "car_ids": index.car_ids,
+        "category_ids": index.category_ids,
+        "category_parents": index.category_parents,
+    }
+
+
+def test_bitmap_ids():
+    ids = [1, 7, 8, 64, 1000]
+    bitmap = ci.bitmap(ids)
+    assert list(ci.bitmap_ids(bitmap)) == ids
+    assert list(ci.bitmap_ids(bitmap, reverse=True)) == ids[::-1]
+    assert ci.popcount(bitmap) == 5
+    assert ci.ProductIds(bitmap)[1:3] == [64, 8]
+
+
+@pytest.mark.django_db
+def test_counts_same_as_from_database(facet_catalog):
+    niva, uaz, lights, brakes, _ = facet_catalog
+    index = ci.CatalogIndex.build()
+    for query in (
+        "",
+        f"car={niva.slug}",
+        f"car={niva.slug}&in_stock=1",
+        f"car={uaz.slug}&category={lights.slug}&category={brakes.slug}&price=50-100&price=100-250",
+        "car=nie-ma-takiego",
+    ):
+        filters = ProductFilters(QueryDict(query))
+        assert index.counts(filters) == facet_counts(filters), query
+
+
+@pytest.mark.django_db
+def test_refresh_applies_changes_of_the_catalog(facet_catalog):
+    niva, uaz, lights, brakes, products = facet_catalog
+    index = ci.CatalogIndex.build()
+    products["lampa"].cars.add(uaz)
+    products["klocki"].price = 300
+    products["klocki"].save()
+    products["tarcza"].delete()
+    brakes.delete()
+    niva.model = "Niva 4x4"
+    niva.save()
+    mixer.blend("niunius.Car", image="test.gif")
+    with CaptureQueriesContext(connection) as ctx:
+        refreshed = index.refresh()
+    assert refreshed is index
+    # only the changed products are read again
+    product_queries = [q["sql"] for q in ctx.captured_queries if 'FROM "niunius_product' in q["sql"]]
+    assert product_queries and all(" IN (" in sql for sql in product_queries)
+    built = ci.CatalogIndex.build()
+    assert index.version == built.version
+    assert state(index) == state(built)
+
+
+@pytest.mark.django_db
+def test_compaction_of_stock_updates_index(facet_catalog):
+    _, _, _, _, products = facet_catalog
+    index = ci.CatalogIndex.build()
+    record_movement(products["lampa"], StockMovement.ADJUSTMENT, -3)
+    compact_ledger()
+    index.refresh()
+    assert list(ci.bitmap_ids(index.in_stock)) == [products["klocki"].pk, products["tarcza"].pk]
+
+
+@pytest.mark.django_db
+def test_snapshot_shared_by_processes(facet_catalog, settings, tmp_path):
+    settings.CATALOG_INDEX_PATH = str(tmp_path / "index.pickle")
+    first = ci.catalog_index()
+    ci.reset()
+    with CaptureQueriesContext(connection) as ctx:
+        loaded = ci.catalog_index()
+    # only the version, the index is loaded from the snapshot
+    assert len(ctx.captured_queries) == 1
+    assert loaded is not first
+    assert state(loaded) == state(first)
+
+
+@pytest.mark.django_db
+def test_products_page_lists_newest_first(client, facet_catalog):
+    niva, _, _, _, products = facet_catalog
+    response = client.get(reverse("products"), {"car": niva.slug})
+    assert [product.name for product in response.context["page_obj"]] == ["tarcza", "reflektor", "lampa"]
+    assert response.context["page_obj"].paginator.count == 3
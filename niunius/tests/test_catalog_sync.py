@@ -0,0 +1,147 @@
+import json
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+from django.utils import timezone
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.api import CHANGE_KINDS, read_rows
+from niunius.catalog import catalog_version
+from niunius.models import CatalogChange, Car, Category, Product
+
+LISTS = {"product": "api-products", "car": "api-cars", "category": "api-categories"}
+
+
+class SyncingClient:
+    """Mobile client keeping a copy of the catalog: downloads it once, then follows the changes."""
+
+    def __init__(self, client):
+        self.client = client
+        self.catalog = {}
+        self.since = None
+
+    def download(self, between_pages=lambda: None):
+        for kind, name in LISTS.items():
+            url = reverse(name) + "?limit=3"
+            while url:
+                data = self.client.get(url).json()
+                if self.since is None:
+                    self.since = data["version"]
+                self.catalog.update({(kind, row["id"]): row for row in data["results"]})
+                url = data["next"]
+                between_pages()
+
+    def pull(self, limit=3):
+        """Apply one batch of changes, return whether there are more."""
+        response = self.client.get(reverse("api-changes"), {"since": self.since, "limit": limit})
+        assert response.status_code == 200
+        data = response.json()
+        for change in data["results"]:
+            key = (change["kind"], change["id"])
+            if change["deleted"]:
+                self.catalog.pop(key, None)
+            else:
+                self.catalog[key] = change["data"]
+        self.since = data["next"]
+        return data["more"]
+
+    def catch_up(self):
+        while self.pull():
+            pass
+
+
+def current_catalog():
+    """The catalog as sent in JSON."""
+    catalog = {}
+    for kind, (model, fields) in CHANGE_KINDS.items():
+        rows = json.loads(json.dumps(read_rows(model.objects.all(), fields), cls=DjangoJSONEncoder))
+        catalog.update({(kind, row["id"]): row for row in rows})
+    return catalog
+
+
+def new_product(rng):
+    product = mixer.blend("niunius.Product", stock=rng.randint(0, 9), image="test.gif")
+    product.cars.set(rng.sample(list(Car.objects.all()), 1))
+    return product
+
+
+class Editor:
+    """Random edits of the catalog, made while the client reads it."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+    def __call__(self):
+        rng = self.rng
+        products = list(Product.objects.all())
+        edit = rng.choice(["create", "price", "delete", "car", "category", "new-car", "delete-car"])
+        if edit == "create" or not products:
+            new_product(rng)
+        elif edit == "price":
+            product = rng.choice(products)
+            product.price = Decimal(rng.randint(1, 999))
+            product.save()
+        elif edit == "delete":
+            rng.choice(products).delete()
+        elif edit == "car":
+            rng.choice(products).cars.add(rng.choice(list(Car.objects.all())))
+        elif edit == "category":
+            category = rng.choice(list(Category.objects.all()))
+            category.name = f"Kategoria {rng.randint(1, 999)}"
+            category.save()
+            rng.choice(products).categories.add(category)
+        elif edit == "new-car":
+            mixer.blend("niunius.Car", image="test.gif")
+        elif Car.objects.count() > 1:
+            rng.choice(list(Car.objects.all())).delete()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_client_stays_in_sync_under_concurrent_edits(client, seed):
+    mixer.cycle(3).blend("niunius.Car", image="test.gif")
+    mixer.cycle(3).blend("niunius.Category")
+    editor = Editor(seed)
+    for _ in range(8):
+        new_product(editor.rng)
+
+    syncing = SyncingClient(client)
+    syncing.download(between_pages=editor)
+    for _ in range(60):
+        editor()
+        syncing.pull()
+    syncing.catch_up()
+
+    assert syncing.catalog == current_catalog()
+    assert syncing.since == catalog_version()
+
+
+@pytest.mark.django_db
+def test_only_last_change_of_object_kept(product):
+    for price in range(3):
+        product.price = Decimal(price + 1)
+        product.save()
+    changes = CatalogChange.objects.filter(kind="product", object_id=product.pk)
+    assert list(changes.values_list("seq", flat=True)) == [catalog_version()]
+
+
+@pytest.mark.django_db
+def test_compaction_of_deleted_objects(client, products):
+    products[0].delete()
+    CatalogChange.objects.filter(deleted=True).update(changed=timezone.now() - timedelta(days=31))
+    products[1].delete()
+    since = catalog_version() - 3
+
+    call_command("compact_catalog_changes")
+
+    assert CatalogChange.objects.filter(deleted=True).count() == 1
+    assert client.get(reverse("api-changes"), {"since": since}).status_code == 410
+    response = client.get(reverse("api-changes"), {"since": catalog_version() - 1})
+    assert response.status_code == 200
+    assert response.json()["results"][0]["deleted"]
@@ -0,0 +1,98 @@
+from django.db import connection
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius import catalog_index as ci
+from niunius.catalog import record_changes
+from niunius.categories import category_tree
+from niunius.facets import ProductFilters, facet_counts
+from niunius.models import Category, Product
+
+
+@pytest.fixture
+def tree():
+    """Parts > Lights > Bulbs and Brakes, with one product in each but Parts; the bulb is out of stock."""
+    parts = Category.objects.create(name="Części")
+    lights = Category.objects.create(name="Oświetlenie", parent=parts)
+    bulbs = Category.objects.create(name="Żarówki", parent=lights)
+    brakes = Category.objects.create(name="Hamulce")
+    for name, category, stock in (("lampa", lights, 3), ("żarówka", bulbs, 0), ("klocki", brakes, 5)):
+        mixer.blend("niunius.Product", name=name, image="test.gif", stock=stock).categories.add(category)
+    # inserting nodes moves others, instances would have stale positions
+    return {category.slug: category for category in Category.objects.all()}
+
+
+@pytest.mark.django_db
+def test_available_products_of_subtree_in_one_query(tree):
+    with CaptureQueriesContext(connection) as ctx:
+        parts = [product.name for product in tree["czesci"].get_available_products()]
+    # products and their variants
+    assert len(ctx.captured_queries) == 2
+    assert parts == ["lampa"]
+    assert list(tree["zarowki"].get_available_products()) == []
+    assert [product.name for product in tree["hamulce"].get_available_products()] == ["klocki"]
+
+
+@pytest.mark.django_db
+def test_category_tree_cached_until_category_changes(tree):
+    assert [(category.name, category.level) for category in category_tree()] == [
+        ("Części", 0),
+        ("Oświetlenie", 1),
+        ("Żarówki", 2),
+        ("Hamulce", 0),
+    ]
+    with CaptureQueriesContext(connection) as ctx:
+        category_tree()
+    # only the version of the catalog
+    assert len(ctx.captured_queries) == 1
+    Category.objects.create(name="Akumulatory", parent=tree["czesci"])
+    assert [category.name for category in category_tree()][:2] == ["Części", "Akumulatory"]
+
+
+@pytest.mark.django_db
+def test_category_tree_follows_changes_made_by_other_processes(tree):
+    category_tree()
+    # another worker saves the category: the database and the version change, not the local cache
+    Category.objects.filter(pk=tree["hamulce"].pk).update(name="Układ hamulcowy")
+    record_changes(Category, [tree["hamulce"].pk])
+    assert category_tree()[-1].name == "Układ hamulcowy"
+
+
+@pytest.mark.django_db
+def test_sidebar_indents_subcategories(client, tree):
+    response = client.get(reverse("shop"))
+    assert 'style="padding-left: 2em"><a href="/sklep/kategoria/zarowki/">' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_choosing_category_lists_its_subcategories(client, tree):
+    response = client.get(reverse("products"), {"category": "czesci"})
+    assert sorted(product.name for product in response.context["page_obj"]) == ["lampa", "żarówka"]
+    counts = ci.catalog_index().counts(ProductFilters(QueryDict("")))["category"]
+    assert counts == {
+        str(tree["czesci"].pk): 2,
+        str(tree["oswietlenie"].pk): 2,
+        str(tree["zarowki"].pk): 1,
+        str(tree["hamulce"].pk): 1,
+    }
+
+
+@pytest.mark.django_db
+def test_index_follows_moved_categories(tree):
+    index = ci.CatalogIndex.build()
+    bulbs = tree["zarowki"]
+    bulbs.parent = tree["hamulce"]
+    bulbs.save()
+    index = index.refresh()
+    for query in ("", "category=czesci", "category=hamulce&in_stock=1"):
+        filters = ProductFilters(QueryDict(query))
+        assert index.counts(filters) == facet_counts(filters), query
+    moved = index.filter(ProductFilters(QueryDict("category=hamulce")))
+    assert sorted(Product.objects.filter(pk__in=ci.bitmap_ids(moved)).values_list("name", flat=True)) == [
+        "klocki",
+        "żarówka",
+    ]
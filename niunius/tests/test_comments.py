@@ -0,0 +1,94 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.comments import add_comment, comment_page
+from niunius.models import ArticleComment
+
+
+@pytest.fixture
+def threads():
+    """Two threads of an article: the older one with a reply and a reply to it, the newer one alone."""
+    article = mixer.blend("niunius.Article", slug="zlot")
+    user = mixer.blend("auth.User", username="jan")
+    first = add_comment(article, user, "pierwszy")
+    reply = add_comment(article, user, "odpowiedź", first)
+    add_comment(article, user, "odpowiedź na odpowiedź", reply)
+    add_comment(article, user, "drugi")
+    return article
+
+
+@pytest.mark.django_db
+def test_page_of_threads_in_order_of_tree(threads):
+    page, comments, count = comment_page(threads.articlecomment_set.all(), 1)
+    with CaptureQueriesContext(connection) as ctx:
+        rows = [(comment.text, comment.level, comment.user.username) for comment in comments]
+    # comments of the threads of the page with their users
+    assert len(ctx.captured_queries) == 1
+    assert rows == [
+        ("drugi", 0, "jan"),
+        ("pierwszy", 0, "jan"),
+        ("odpowiedź", 1, "jan"),
+        ("odpowiedź na odpowiedź", 2, "jan"),
+    ]
+    assert (page.paginator.num_pages, count) == (1, 4)
+
+
+@pytest.mark.django_db
+def test_threads_are_paginated_with_their_replies(threads):
+    page, comments, count = comment_page(threads.articlecomment_set.all(), 2, per_page=1)
+    assert [comment.text for comment in comments] == ["pierwszy", "odpowiedź", "odpowiedź na odpowiedź"]
+    assert (page.paginator.num_pages, count) == (2, 4)
+
+
+@pytest.mark.django_db
+def test_threads_of_other_articles_are_not_moved(threads):
+    other = add_comment(mixer.blend("niunius.Article"), mixer.blend("auth.User"), "inny")
+    reply = ArticleComment.objects.get(text="odpowiedź")
+    add_comment(threads, reply.user, "jeszcze jedna", reply)
+    other.refresh_from_db()
+    assert (other.lft, other.rght) == (1, 2)
+    first = ArticleComment.objects.get(text="pierwszy")
+    replies = [comment.text for comment in first.get_descendants()]
+    assert replies == ["odpowiedź", "odpowiedź na odpowiedź", "jeszcze jedna"]
+
+
+@pytest.mark.django_db
+def test_reply_added_from_article_page(client, user, threads):
+    comment = ArticleComment.objects.get(text="drugi")
+    url = reverse("add-comment", kwargs={"pk": threads.pk})
+    response = client.get(url, {"parent": comment.pk})
+    assert response.context["parent"] == comment
+    assert client.post(url, {"text": "zgoda", "parent": comment.pk}).status_code == 302
+    assert ArticleComment.objects.get(text="zgoda").parent == comment
+
+    response = client.get(reverse("article-detail", kwargs={"slug": threads.slug}))
+    assert response.context["comments_count"] == 5
+    assert '<p style="padding-left: 1em">zgoda<br>' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_reply_only_to_comments_of_the_article(client, user, threads):
+    other = add_comment(mixer.blend("niunius.Article"), user, "inny")
+    url = reverse("add-comment", kwargs={"pk": threads.pk})
+    client.post(url, {"text": "nie tutaj", "parent": other.pk})
+    assert not ArticleComment.objects.filter(text="nie tutaj").exists()
+
+
+@pytest.mark.parametrize(
+    "next_url, expected",
+    [
+        ("/blog/artykul/zlot/?comments=2", "/blog/artykul/zlot/?comments=2"),
+        ("https://example.com/", None),
+        ("", None),
+    ],
+)
+@pytest.mark.django_db
+def test_comment_redirects_to_next_page_of_site(client, user, threads, next_url, expected):
+    url = reverse("add-comment", kwargs={"pk": threads.pk})
+    response = client.post(url, {"text": "wracam", "next": next_url})
+    assert response.status_code == 302
+    assert response.url == (expected or reverse("article-detail", kwargs={"slug": threads.slug}))
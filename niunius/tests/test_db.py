@@ -0,0 +1,49 @@
+import json
+
+from django.core.management import call_command
+from django.db import connection
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.db import check_connections
+
+
+@pytest.fixture
+def closed(monkeypatch):
+    calls = []
+    monkeypatch.setattr(connection, "close", lambda: calls.append(connection.alias))
+    return calls
+
+
+@pytest.mark.django_db(transaction=True)
+def test_unusable_connection_closed_at_request_start(monkeypatch, closed):
+    connection.ensure_connection()
+    monkeypatch.setitem(connection.settings_dict, "CONN_HEALTH_CHECKS", True)
+    monkeypatch.setattr(connection, "is_usable", lambda: True)
+    check_connections()
+    assert closed == []
+    monkeypatch.setattr(connection, "is_usable", lambda: False)
+    check_connections()
+    assert closed == ["default"]
+
+
+@pytest.mark.django_db
+def test_connection_in_transaction_not_checked(monkeypatch, closed):
+    connection.ensure_connection()
+    monkeypatch.setitem(connection.settings_dict, "CONN_HEALTH_CHECKS", True)
+    monkeypatch.setattr(connection, "is_usable", lambda: False)
+    check_connections()
+    assert closed == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_connections_command(tmp_path):
+    mixer.blend("niunius.Product", image="test.gif")
+    output = tmp_path / "report.json"
+    call_command("benchmark_connections", requests=4, output=str(output))
+    report = json.loads(output.read_text())
+    assert set(report["modes"]) == {"per-request", "persistent"}
+    assert report["modes"]["persistent"]["requests"] == 4
+    assert report["modes"]["persistent"]["errors"] == 0
+    assert connection.settings_dict["CONN_MAX_AGE"] == 0
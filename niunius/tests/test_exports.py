@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.exports import export
+from niunius.models import Order
+
+
+def add_order(lines=2, **kwargs):
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=True)
+    for product in mixer.cycle(lines).blend("niunius.Product", image="test.gif", price=Decimal("5.00")):
+        mixer.blend("niunius.CartItem", cart=cart, product=product, quantity=2, unit_price=Decimal("4.50"))
+    kwargs.setdefault("status", Order.PLACED)
+    if kwargs["status"] == Order.PLACED:
+        kwargs.setdefault("placed_at", timezone.now())
+    else:
+        kwargs.setdefault("placed_at", None)
+    return mixer.blend("niunius.Order", cart=cart, total=Decimal("18.00"), **kwargs)
+
+
+@pytest.mark.django_db
+def test_export_csv_one_row_per_item():
+    order = add_order(lines=2, buyer=None, guest_buyer_email="gosc@example.com")
+    rows = list(csv.DictReader(io.StringIO("".join(export(Order.objects.all(), "csv")))))
+    assert len(rows) == 2
+    assert rows[0]["order"] == str(order.pk)
+    assert rows[0]["email"] == "gosc@example.com"
+    assert rows[0]["unit_price"] == "4.50"
+    assert rows[0]["value"] == "9.00"
+    assert rows[0]["placed_at"] == timezone.localtime(order.placed_at).isoformat()
+
+
+@pytest.mark.django_db
+def test_export_jsonl_one_line_per_order():
+    user = mixer.blend("auth.User", email="klient@example.com")
+    first = add_order(lines=3, buyer=user)
+    second = add_order(lines=0, buyer=user)
+    lines = list(export(Order.objects.all(), "jsonl"))
+    orders = [json.loads(line) for line in lines]
+    assert [o["order"] for o in orders] == [first.pk, second.pk]
+    assert len(orders[0]["items"]) == 3
+    assert orders[0]["email"] == "klient@example.com"
+    assert orders[1]["items"] == []
+
+
+@pytest.mark.django_db
+def test_export_reads_orders_with_one_query():
+    for _ in range(5):
+        add_order(lines=3)
+    with CaptureQueriesContext(connection) as ctx:
+        lines = list(export(Order.objects.all(), "csv", chunk_size=4))
+    assert len(lines) == 16
+    assert len(ctx.captured_queries) == 1
+
+
+@pytest.mark.django_db
+def test_export_orders_command(tmp_path):
+    add_order(lines=2)
+    add_order(lines=1, status=Order.DRAFT)
+    output = tmp_path / "orders.jsonl"
+    call_command("export_orders", format="jsonl", output=str(output))
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 1
+    stdout = io.StringIO()
+    call_command("export_orders", "--all", stdout=stdout)
+    assert len(stdout.getvalue().splitlines()) == 4
+
+
+@pytest.mark.django_db
+def test_export_orders_command_selects_day_of_placing():
+    # a cart started in January and placed in February belongs to February
+    january = timezone.make_aware(datetime(2026, 1, 20, 12))
+    february = timezone.make_aware(datetime(2026, 2, 3, 12))
+    order = add_order(lines=1, placed_at=february)
+    add_order(lines=1, placed_at=january)
+    Order.objects.update(date=january)
+    stdout = io.StringIO()
+    call_command("export_orders", "--format", "jsonl", "--since", "2026-02-01", stdout=stdout)
+    orders = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [o["order"] for o in orders] == [order.pk]
+    assert orders[0]["placed_at"] == timezone.localtime(february).isoformat()
+
+
+@pytest.mark.django_db
+def test_order_admin_export_action(client):
+    order = add_order(lines=2)
+    admin = mixer.blend("auth.User", is_staff=True, is_superuser=True)
+    client.force_login(admin)
+    response = client.post(
+        reverse("myadmin:niunius_order_changelist"),
+        {"action": "export_csv", "_selected_action": [order.pk]},
+    )
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Disposition"].startswith('attachment; filename="zamowienia-')
+    assert len(b"".join(response.streaming_content).decode().splitlines()) == 3
@@ -0,0 +1,55 @@
+from django.db import connection
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import pytest
+
+from niunius.facets import ProductFilters, facet_counts, filter_products
+from niunius.models import Product
+
+
+def filtered(query):
+    filters = ProductFilters(QueryDict(query))
+    return {product.name for product in filter_products(Product.objects.all(), filters)}
+
+
+@pytest.mark.django_db
+def test_values_of_a_facet_are_alternatives_and_facets_combined(facet_catalog):
+    niva, uaz, lights, _, _ = facet_catalog
+    assert filtered(f"car={niva.slug}&car={uaz.slug}") == {"lampa", "reflektor", "klocki", "tarcza"}
+    assert filtered(f"car={uaz.slug}&category={lights.slug}") == {"reflektor"}
+    assert filtered(f"car={niva.slug}&price=0-50&price=500-") == {"lampa", "tarcza"}
+    assert filtered(f"car={niva.slug}&in_stock=1") == {"lampa", "tarcza"}
+
+
+@pytest.mark.django_db
+def test_counts_apply_filters_of_other_facets(facet_catalog):
+    niva, uaz, lights, brakes, _ = facet_catalog
+    counts = facet_counts(ProductFilters(QueryDict(f"car={niva.slug}&in_stock=1")))
+    # the chosen car does not narrow its own facet
+    assert counts["car"] == {str(niva.pk): 2, str(uaz.pk): 1}
+    assert counts["category"] == {str(lights.pk): 1, str(brakes.pk): 1}
+    assert counts["price"] == {"0-50": 1, "500-": 1}
+    assert counts["in_stock"] == {"1": 2}
+
+
+@pytest.mark.django_db
+def test_counts_read_with_one_query(facet_catalog):
+    niva, _, lights, _, _ = facet_catalog
+    filters = ProductFilters(QueryDict(f"car={niva.slug}&category={lights.slug}&price=100-250"))
+    with CaptureQueriesContext(connection) as ctx:
+        facet_counts(filters)
+    assert len(ctx.captured_queries) == 1
+
+
+@pytest.mark.django_db
+def test_products_page(client, facet_catalog):
+    niva, _, _, _, _ = facet_catalog
+    response = client.get(reverse("products"), {"car": niva.slug, "price": ["0-50", "100-250"]})
+    assert response.status_code == 200
+    assert [product.name for product in response.context["page_obj"]] == ["reflektor", "lampa"]
+    car_facet = response.context["facets"][0]
+    niva_option = {"value": niva.slug, "label": niva.name, "count": 2, "chosen": True, "level": 0}
+    assert niva_option in car_facet["options"]
+    assert "price=0-50" in response.context["query"]
@@ -0,0 +1,133 @@
+"""
+Media serving, checked against a stand-in of the front proxy.
+
+The same requests are sent with the app sending files itself and with the app offloading them
+to the stand-in (X-Accel-Redirect, like nginx), and both have to send the same bytes
+with the same status - and the bytes have to be the expected slice of the file.
+"""
+import os
+import re
+from urllib.parse import unquote
+
+from django.utils.http import http_date
+
+import pytest
+
+CONTENT = bytes(range(256)) * 40  # 10240 bytes
+
+
+class ProxyStandIn:
+    """
+    Minimal nginx-like front proxy: passes requests to the app and, if the app answers with
+    X-Accel-Redirect, sends the file from the internal location itself, honouring a single byte range.
+    """
+
+    def __init__(self, client, internal_prefix, root):
+        self.client = client
+        self.internal_prefix = internal_prefix
+        self.root = root
+
+    def get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        location = response.get("X-Accel-Redirect")
+        if location is None:
+            body = b"".join(response.streaming_content) if response.streaming else response.content
+            return response.status_code, body, response.get("Content-Range")
+        assert location.startswith(self.internal_prefix)
+        with open(os.path.join(self.root, unquote(location[len(self.internal_prefix):])), "rb") as f:
+            data = f.read()
+        match = re.match(r"^bytes=(\d*)-(\d*)$", headers.get("HTTP_RANGE", ""))
+        if not match:
+            return 200, data, None
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last) if last else len(data) - 1, len(data) - 1)
+        else:
+            start, end = max(len(data) - int(last), 0), len(data) - 1
+        if start >= len(data):
+            return 416, b"", f"bytes */{len(data)}"
+        return 206, data[start:end + 1], f"bytes {start}-{end}/{len(data)}"
+
+
+@pytest.fixture
+def media_file(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    (tmp_path / "niunius" / "product_img").mkdir(parents=True)
+    path = tmp_path / "niunius" / "product_img" / "zdjęcie.jpg"
+    path.write_bytes(CONTENT)
+    return "/media/niunius/product_img/zdjęcie.jpg"
+
+
+@pytest.fixture
+def proxy(client, settings, media_file):
+    return ProxyStandIn(client, settings.MEDIA_ACCEL_PREFIX, settings.MEDIA_ROOT)
+
+
+@pytest.mark.parametrize(
+    "range_header, status, expected",
+    [
+        (None, 200, CONTENT),
+        ("bytes=0-99", 206, CONTENT[:100]),
+        ("bytes=10000-", 206, CONTENT[10000:]),
+        ("bytes=-100", 206, CONTENT[-100:]),
+        ("bytes=10200-20000", 206, CONTENT[10200:]),
+        ("bytes=20000-", 416, b""),
+        ("bytes=0-1,5-6", 200, CONTENT),
+    ],
+)
+def test_media_range_requests(settings, proxy, media_file, range_header, status, expected):
+    headers = {"HTTP_RANGE": range_header} if range_header else {}
+    settings.MEDIA_SERVING = "django"
+    sent = proxy.get(media_file, **headers)
+    settings.MEDIA_SERVING = "x-accel"
+    offloaded = proxy.get(media_file, **headers)
+    assert sent[:2] == (status, expected)
+    assert offloaded[:2] == sent[:2]
+    assert offloaded[2] == sent[2]
+
+
+@pytest.mark.parametrize("mode", ["django", "x-accel", "x-sendfile"])
+def test_media_conditional_requests(client, settings, media_file, mode):
+    settings.MEDIA_SERVING = mode
+    response = client.get(media_file)
+    etag, last_modified = response["ETag"], response["Last-Modified"]
+    assert response["Cache-Control"] == f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+    assert client.get(media_file, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert client.get(media_file, HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+    assert client.get(media_file, HTTP_IF_NONE_MATCH='"other"').status_code == 200
+
+
+def test_media_etag_like_nginx(client, media_file, settings):
+    stat = os.stat(os.path.join(settings.MEDIA_ROOT, "niunius", "product_img", "zdjęcie.jpg"))
+    response = client.get(media_file)
+    assert response["ETag"] == f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    assert response["Last-Modified"] == http_date(int(stat.st_mtime))
+    assert response["Accept-Ranges"] == "bytes"
+    assert response["Content-Type"] == "image/jpeg"
+
+
+def test_media_if_range(client, media_file):
+    etag = client.get(media_file)["ETag"]
+    assert client.get(media_file, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=etag).status_code == 206
+    response = client.get(media_file, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content) == CONTENT
+
+
+def test_media_offload_headers(client, settings, media_file):
+    settings.MEDIA_SERVING = "x-accel"
+    response = client.get(media_file)
+    assert response["X-Accel-Redirect"] == "/protected-media/niunius/product_img/zdj%C4%99cie.jpg"
+    assert response.content == b""
+    settings.MEDIA_SERVING = "x-sendfile"
+    response = client.get(media_file)
+    expected = os.path.join(settings.MEDIA_ROOT, "niunius", "product_img", "zdjęcie.jpg")
+    assert response["X-Sendfile"].encode("latin-1") == os.fsencode(expected)
+
+
+@pytest.mark.parametrize(
+    "path",
+    ["/media/..%2Fmy_django_project/settings/base.py", "/media/niunius/missing.jpg", "/media/niunius/"],
+)
+def test_media_not_found(client, media_file, path):
+    assert client.get(path).status_code == 404
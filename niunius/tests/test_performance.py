@@ -0,0 +1,287 @@
+"""
+Query-count regression tests.
+
+Every public view is requested twice: once against a tiny data set and once
+after the data set has been grown to realistic volumes (hundreds of products,
+dozens of cart lines, long order histories). The number of queries must not
+change between the two requests - otherwise the view has an N+1 pattern -
+and must stay within the budget given for the URL name.
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.models import Product
+
+
+# Upper bound on queries per URL name, including session, auth
+# and the shop sidebar (context processor) queries: the version of the catalog and the tree of categories.
+QUERY_BUDGETS = {
+    "home": 0,
+    "about": 3,
+    "contact": 0,
+    "car-service": 1,
+    "blog": 5,
+    "article-detail": 5,
+    "shop": 4,
+    "search": 7,
+    "car": 6,
+    "category": 6,
+    "product": 8,
+    "shopping-cart": 8,
+    "shopping-cart-guest": 7,
+    "order": 6,
+    "guest-order": 3,
+    "confirm-order": 8,
+    "user-orders": 7,
+}
+
+
+def count_queries(client, url):
+    # the cached tree of categories on the sidebar is counted as read from the database
+    cache.clear()
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(ctx.captured_queries)
+
+
+def assert_constant_queries(client, url_name, url, grow):
+    """
+    Request the url, grow the data set with grow() and request it again.
+    Both requests have to hit the database the same number of times,
+    within the budget given for the url name.
+    """
+    small = count_queries(client, url)
+    grow()
+    large = count_queries(client, url)
+    assert large == small, f"{url_name}: {small} queries before, {large} after growing data"
+    assert large <= QUERY_BUDGETS[url_name], f"{url_name}: {large} queries"
+
+
+def add_products(count, car=None, category=None, **kwargs):
+    """Create products (with stock) related to the given car and category."""
+    products = mixer.cycle(count).blend(
+        "niunius.Product", image="test.gif", stock=10, **kwargs
+    )
+    if car is not None:
+        Product.cars.through.objects.bulk_create(
+            [Product.cars.through(product=p, car=car) for p in products]
+        )
+    if category is not None:
+        Product.categories.through.objects.bulk_create(
+            [Product.categories.through(product=p, category=category) for p in products]
+        )
+    return products
+
+
+def add_variants(products, count):
+    """Create variants of each of the given products."""
+    for product in products:
+        mixer.cycle(count).blend("niunius.ProductVariant", product=product, stock=5)
+
+
+def add_cart_lines(cart, count):
+    for product in add_products(count):
+        mixer.blend("niunius.CartItem", cart=cart, product=product, quantity=2)
+
+
+def add_orders(buyer, count, lines=3):
+    for _ in range(count):
+        cart = mixer.blend("niunius.ShoppingCart", is_ordered=True)
+        add_cart_lines(cart, lines)
+        mixer.blend("niunius.Order", cart=cart, buyer=buyer)
+
+
+@pytest.fixture
+def car():
+    return mixer.blend("niunius.Car", image="test.gif")
+
+
+@pytest.fixture
+def category():
+    return mixer.blend("niunius.Category")
+
+
+@pytest.fixture
+def sidebar():
+    """Grow the shop sidebar, which lists all cars and categories."""
+
+    def grow():
+        mixer.cycle(20).blend("niunius.Car", image="test.gif")
+        mixer.cycle(20).blend("niunius.Category")
+
+    return grow
+
+
+# Static pages
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("url_name", ["home", "contact"])
+def test_static_page_queries(client, url_name):
+    assert count_queries(client, reverse(url_name)) <= QUERY_BUDGETS[url_name]
+
+
+@pytest.mark.django_db
+def test_about_view_queries(client):
+    mixer.blend("niunius.Article", title="O Klubie")
+    assert count_queries(client, reverse("about")) <= QUERY_BUDGETS["about"]
+
+
+@pytest.mark.django_db
+def test_car_service_view_queries(client):
+    def grow():
+        mixer.cycle(30).blend("niunius.CarService")
+
+    assert_constant_queries(client, "car-service", reverse("car-service"), grow)
+
+
+# Blog
+
+
+@pytest.mark.django_db
+def test_blog_view_queries(client):
+    def grow():
+        for article in mixer.cycle(40).blend("niunius.Article"):
+            mixer.cycle(3).blend("niunius.ArticlePhoto", article=article, photo="test.gif")
+
+    mixer.blend("niunius.ArticlePhoto", photo="test.gif")
+    assert_constant_queries(client, "blog", reverse("blog"), grow)
+
+
+@pytest.mark.django_db
+def test_article_detail_view_queries(client, article):
+    def grow():
+        mixer.cycle(10).blend("niunius.ArticlePhoto", article=article, photo="test.gif")
+        for user in mixer.cycle(30).blend("auth.User"):
+            comment = mixer.blend("niunius.ArticleComment", article=article, user=user)
+            mixer.blend("niunius.ArticleComment", article=article, user=user, parent=comment)
+
+    # without threads there is no query of comments at all
+    mixer.blend("niunius.ArticleComment", article=article)
+    url = reverse("article-detail", kwargs={"slug": article.slug})
+    assert_constant_queries(client, "article-detail", url, grow)
+
+
+# Shop
+
+
+@pytest.mark.django_db
+def test_shop_view_queries(client, sidebar):
+    def grow():
+        sidebar()
+        add_products(200)
+
+    assert_constant_queries(client, "shop", reverse("shop"), grow)
+
+
+@pytest.mark.django_db
+def test_search_view_queries(client, sidebar):
+    # products are listed with their variants (one query for all of them) from the start
+    add_variants(add_products(1, name="test"), 1)
+
+    def grow():
+        sidebar()
+        add_variants(add_products(200, name=mixer.sequence("test{0}")), 3)
+        mixer.cycle(20).blend("niunius.Car", model=mixer.sequence("test{0}"), image="test.gif")
+        mixer.cycle(20).blend("niunius.Category", name=mixer.sequence("test{0}"))
+
+    assert_constant_queries(client, "search", reverse("search") + "?query=test", grow)
+
+
+@pytest.mark.django_db
+def test_car_view_queries(client, car, sidebar):
+    add_products(1, car=car)
+
+    def grow():
+        sidebar()
+        add_variants(add_products(200, car=car), 3)
+
+    url = reverse("car", kwargs={"slug": car.slug})
+    assert_constant_queries(client, "car", url, grow)
+
+
+@pytest.mark.django_db
+def test_category_view_queries(client, category, sidebar):
+    add_products(1, category=category)
+
+    def grow():
+        sidebar()
+        add_variants(add_products(200, category=category), 3)
+
+    url = reverse("category", kwargs={"slug": category.slug})
+    assert_constant_queries(client, "category", url, grow)
+
+
+@pytest.mark.django_db
+def test_product_view_queries(client, product, sidebar):
+    def grow():
+        sidebar()
+        cars = mixer.cycle(30).blend("niunius.Car", image="test.gif")
+        product.cars.add(*cars)
+        add_variants([product], 10)
+
+    url = reverse("product", kwargs={"slug": product.slug})
+    assert_constant_queries(client, "product", url, grow)
+
+
+# Shopping cart and checkout
+
+
+@pytest.mark.django_db
+def test_shopping_cart_view_queries_if_logged_user(client, user):
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    add_cart_lines(cart, 1)
+    assert_constant_queries(
+        client, "shopping-cart", reverse("shopping-cart"), lambda: add_cart_lines(cart, 40)
+    )
+
+
+@pytest.mark.django_db
+def test_shopping_cart_view_queries_if_guest(client):
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=None)
+    add_cart_lines(cart, 1)
+    session = client.session
+    session["cart"] = cart.pk
+    session.save()
+    assert_constant_queries(
+        client, "shopping-cart-guest", reverse("shopping-cart"), lambda: add_cart_lines(cart, 40)
+    )
+
+
+@pytest.mark.django_db
+def test_order_view_queries(client, user):
+    def grow():
+        add_orders(user, 30)
+        mixer.cycle(10).blend("niunius.Address", user=user, is_default=False)
+
+    add_orders(user, 1)
+    mixer.blend("niunius.Address", user=user, is_default=True)
+    assert_constant_queries(client, "order", reverse("order"), grow)
+
+
+@pytest.mark.django_db
+def test_guest_order_view_queries(client, sidebar):
+    assert_constant_queries(client, "guest-order", reverse("guest-order"), sidebar)
+
+
+@pytest.mark.django_db
+def test_order_confirmation_view_queries(client, user):
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    add_cart_lines(cart, 1)
+    order = mixer.blend("niunius.Order", cart=cart, buyer=user)
+    url = reverse("confirm-order", kwargs={"pk": order.pk})
+    assert_constant_queries(client, "confirm-order", url, lambda: add_cart_lines(cart, 40))
+
+
+@pytest.mark.django_db
+def test_user_orders_view_queries(client, user):
+    add_orders(user, 1)
+    assert_constant_queries(
+        client, "user-orders", reverse("user-orders"), lambda: add_orders(user, 30)
+    )
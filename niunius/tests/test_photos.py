@@ -0,0 +1,79 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import pytest
+from PIL import Image
+
+from niunius import photos
+from niunius.models import Article, ArticlePhoto, MediaBlob
+
+
+def photo(name="zdjecie.jpg", size=(200, 100), color=(200, 80, 40), image_format="JPEG"):
+    output = BytesIO()
+    Image.new("RGB", size, color).save(output, image_format)
+    return SimpleUploadedFile(name, output.getvalue(), content_type="image/jpeg")
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.ARTICLE_PHOTO_SPOOL_DIR = str(tmp_path / "spool")
+    settings.ARTICLE_PHOTO_MAX_DIMENSION = 64
+    return tmp_path
+
+
+def post_article(client, files):
+    return client.post(reverse("add-article"), {"title": "Rajd", "content": "Treść", "photos": files})
+
+
+@pytest.mark.django_db
+def test_article_photos_are_reencoded_and_bulk_inserted(client, user, media_root):
+    files = [photo(f"{i}.jpg", color=(i * 10, 0, 0)) for i in range(20)]
+    with CaptureQueriesContext(connection) as ctx:
+        response = post_article(client, files)
+    assert response.status_code == 302
+    article = Article.objects.get()
+    assert article.articlephoto_set.count() == 20
+    inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "niunius_articlephoto"')]
+    assert len(inserts) == 1
+    with Image.open(article.articlephoto_set.first().photo.path) as image:
+        assert image.size == (64, 32)
+    assert MediaBlob.objects.count() == 20
+    assert not list((media_root / "spool").iterdir())
+
+
+@pytest.mark.django_db
+def test_article_photo_not_an_image_is_rejected(client, user, media_root):
+    response = post_article(client, [photo(), SimpleUploadedFile("skrypt.jpg", b"<script>")])
+    assert response.status_code == 200
+    assert "skrypt.jpg nie jest obsługiwanym zdjęciem" in response.content.decode()
+    assert not Article.objects.exists()
+
+
+@pytest.mark.django_db
+def test_article_photo_too_large_is_rejected(client, user, media_root, settings):
+    settings.ARTICLE_PHOTO_MAX_PIXELS = 100 * 100
+    response = post_article(client, [photo(size=(200, 100))])
+    assert "ma zbyt duże wymiary" in response.content.decode()
+    settings.UPLOAD_MAX_FILE_SIZE = 100
+    response = post_article(client, [photo(size=(10, 10))])
+    assert "zdjecie.jpg jest zbyt duży" in response.content.decode()
+    assert not Article.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_article_photos_are_processed_in_worker_pool(client, user, media_root, settings):
+    settings.ARTICLE_PHOTO_WORKERS = 1
+    photos._executor = None
+    try:
+        post_article(client, [photo(), photo("png.png", image_format="PNG")])
+        # the pool has one worker, so the work submitted before is done when this one is
+        photos.executor().submit(lambda: None).result(timeout=30)
+    finally:
+        photos.executor().shutdown()
+        photos._executor = None
+    assert ArticlePhoto.objects.filter(article=Article.objects.get()).count() == 2
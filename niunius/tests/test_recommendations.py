@@ -0,0 +1,106 @@
+import itertools
+import random
+from collections import Counter
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import numpy as np
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.models import CoPurchase, Recommendation
+from niunius.recommendations import count_pairs, top_pairs
+
+
+def ordered_cart(products, is_ordered=True):
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=is_ordered)
+    for product in products:
+        mixer.blend("niunius.CartItem", cart=cart, product=product, quantity=1)
+    return cart
+
+
+def recommendations():
+    return {
+        (row.product_id, row.rank): (row.recommended_id, row.score)
+        for row in Recommendation.objects.all()
+    }
+
+
+def test_count_pairs_same_as_counting_carts():
+    rng = random.Random(5)
+    carts = {cart: rng.sample(range(1, 30), rng.randint(1, 6)) for cart in range(200)}
+    items = [(cart, product) for cart, products in carts.items() for product in products]
+    rng.shuffle(items)
+    items = np.array(items)
+    products, others, counts = count_pairs(items[:, 0], items[:, 1])
+    expected = Counter(pair for products in carts.values() for pair in itertools.permutations(products, 2))
+    assert dict(zip(zip(products.tolist(), others.tolist()), counts.tolist())) == expected
+
+
+def test_top_pairs_ranked_by_count_then_id():
+    products, others, counts, ranks = top_pairs(
+        np.array([1, 1, 1, 1, 2]), np.array([5, 3, 4, 2, 1]), np.array([1, 2, 2, 3, 7]), k=3
+    )
+    assert list(zip(products, others, counts, ranks)) == [
+        (1, 2, 3, 0),
+        (1, 3, 2, 1),
+        (1, 4, 2, 2),
+        (2, 1, 7, 0),
+    ]
+
+
+@pytest.mark.django_db
+def test_new_purchases_counted_incrementally():
+    a, b, c, d = mixer.cycle(4).blend("niunius.Product", stock=5, image="test.gif")
+    ordered_cart([a, b, c])
+    ordered_cart([a, b])
+    ordered_cart([c, d], is_ordered=False)
+    call_command("update_recommendations")
+    assert recommendations() == {
+        (a.pk, 0): (b.pk, 2),
+        (a.pk, 1): (c.pk, 1),
+        (b.pk, 0): (a.pk, 2),
+        (b.pk, 1): (c.pk, 1),
+        (c.pk, 0): (a.pk, 1),
+        (c.pk, 1): (b.pk, 1),
+    }
+
+    ordered_cart([c, d])
+    ordered_cart([c, b])
+    call_command("update_recommendations")
+    assert CoPurchase.objects.get(product=b, other=c).count == 2
+    assert recommendations()[(c.pk, 0)] == (b.pk, 2)
+    assert recommendations()[(d.pk, 0)] == (c.pk, 1)
+
+    before = recommendations()
+    call_command("update_recommendations", rebuild=True)
+    assert recommendations() == before
+
+
+@pytest.mark.django_db
+def test_product_page_reads_recommendations_with_one_query(client):
+    a, b, c = mixer.cycle(3).blend("niunius.Product", stock=5, image="test.gif")
+    sold_out = mixer.blend("niunius.Product", stock=0, image="test.gif")
+    ordered_cart([a, b, c, sold_out])
+    ordered_cart([a, c])
+    call_command("update_recommendations")
+    response = client.get(reverse("product", kwargs={"slug": a.slug}))
+    assert list(response.context["recommended"]) == [c, b]
+    assert c.name in response.content.decode()
+    with CaptureQueriesContext(connection) as ctx:
+        list(response.context["recommended"].all())
+    assert len(ctx.captured_queries) == 1
+
+
+@pytest.mark.django_db
+def test_product_page_with_error_keeps_recommendations(client):
+    a, b = mixer.cycle(2).blend("niunius.Product", stock=5, image="test.gif")
+    ordered_cart([a, b])
+    call_command("update_recommendations")
+    response = client.post(reverse("product", kwargs={"slug": a.slug}), data={"qty": 6})
+    assert response.context["error"] == "Brak wystarczającej ilości produktu. Dostępne: 5 szt."
+    assert list(response.context["recommended"]) == [b]
+    assert "similar" in response.context
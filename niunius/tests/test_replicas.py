@@ -0,0 +1,101 @@
+import time
+
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.catalog import record_changes
+from niunius.categories import category_tree
+from niunius.models import Category, Product
+from niunius.tests.test_async_views import get
+from niunius.replicas import PIN_SESSION_KEY
+
+both_databases = pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+
+
+@pytest.fixture
+def replica(settings):
+    settings.DATABASE_REPLICAS = ["replica"]
+    return "replica"
+
+
+def add_products(*names):
+    """Add products to the primary and copy it to the replica."""
+    products = [mixer.blend("niunius.Product", name=name, stock=5, image="test.gif") for name in names]
+    call_command("sync_replicas")
+    return products
+
+
+def rename_on_replica(product, name):
+    """Make the replica differ from the primary."""
+    Product.objects.using("replica").filter(pk=product.pk).update(name=name)
+
+
+@both_databases
+def test_catalog_pages_read_from_replica(client, replica):
+    (product,) = add_products("Filtr")
+    rename_on_replica(product, "Filtr-z-repliki")
+    content = client.get(reverse("shop")).content.decode()
+    assert "Filtr-z-repliki" in content
+
+
+@both_databases
+def test_category_tree_read_from_primary(client, replica):
+    category = mixer.blend("niunius.Category", name="Filtry")
+    call_command("sync_replicas")
+    # the change has not reached the replica yet
+    Category.objects.filter(pk=category.pk).update(name="Filtry oleju")
+    record_changes(Category, [category.pk])
+    content = client.get(reverse("shop")).content.decode()
+    assert "Filtry oleju" in content
+    assert [category.name for category in category_tree()] == ["Filtry oleju"]
+
+
+@both_databases
+def test_other_pages_read_from_primary(client, replica):
+    (product,) = add_products("Filtr")
+    rename_on_replica(product, "Filtr-z-repliki")
+    response = client.post(reverse("product", args=[product.slug]), {"qty": 1})
+    assert response.status_code == 302
+    assert "Filtr-z-repliki" not in client.get(reverse("shopping-cart")).content.decode()
+
+
+@both_databases
+def test_session_pinned_to_primary_after_write(client, replica):
+    product, other = add_products("Filtr", "Olej")
+    rename_on_replica(other, "Olej-z-repliki")
+    client.post(reverse("product", args=[product.slug]), {"qty": 1})
+    assert client.session[PIN_SESSION_KEY] > time.time()
+    content = client.get(reverse("shop")).content.decode()
+    assert "Olej" in content
+    assert "Olej-z-repliki" not in content
+
+
+@both_databases
+def test_read_only_request_does_not_pin(client, replica):
+    add_products("Filtr")
+    client.get(reverse("shop"))
+    assert PIN_SESSION_KEY not in client.session
+
+
+@pytest.mark.django_db
+def test_no_replicas_configured(client):
+    mixer.blend("niunius.Product", name="Filtr", stock=1, image="test.gif")
+    assert "Filtr" in client.get(reverse("shop")).content.decode()
+
+
+@pytest.mark.django_db
+def test_sync_replicas_requires_replicas():
+    with pytest.raises(CommandError):
+        call_command("sync_replicas")
+
+
+@both_databases
+def test_async_views_read_from_replica(settings, replica):
+    settings.ROOT_URLCONF = "my_django_project.asgi_urls"
+    (product,) = add_products("Filtr")
+    rename_on_replica(product, "Filtr-z-repliki")
+    response = get(reverse("product", args=[product.slug]))
+    assert "Filtr-z-repliki" in response.content.decode()
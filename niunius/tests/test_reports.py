@@ -0,0 +1,152 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.models import DailyCarSales, DailyCategorySales, DailyProductSales, Order, ProductVariant
+from niunius.reports import rebuild_day
+
+
+def place(client, items):
+    """Place an order of the given (product, quantity) items through the purchase view."""
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    for product, quantity in items:
+        mixer.blend("niunius.CartItem", cart=cart, product=product, quantity=quantity)
+    order = mixer.blend("niunius.Order", cart=cart, status=Order.DRAFT)
+    client.post(reverse("purchase", kwargs={"pk": order.pk}), {"idempotency_key": order.idempotency_key})
+    return order
+
+
+def aggregates():
+    return {
+        model.__name__: sorted(model.objects.values_list("day", "units", "revenue", "orders"))
+        for model in (DailyProductSales, DailyCategorySales, DailyCarSales)
+    }
+
+
+@pytest.fixture
+def catalog():
+    car = mixer.blend("niunius.Car", image="test.gif")
+    category = mixer.blend("niunius.Category")
+    products = mixer.cycle(2).blend("niunius.Product", image="test.gif", stock=50, price=Decimal("10.00"))
+    for product in products:
+        product.cars.add(car)
+        product.categories.add(category)
+    return products
+
+
+@pytest.mark.django_db
+def test_purchase_rolls_up_daily_sales(client, catalog):
+    first, second = catalog
+    place(client, [(first, 2), (second, 1)])
+    place(client, [(first, 1)])
+    today = timezone.localdate()
+    assert DailyProductSales.objects.get(product=first).units == 3
+    assert DailyProductSales.objects.get(product=first).orders == 2
+    category_sales = DailyCategorySales.objects.get()
+    assert (category_sales.day, category_sales.units, category_sales.revenue) == (today, 4, Decimal("40.00"))
+    assert DailyCarSales.objects.get().orders == 2
+
+
+@pytest.mark.django_db
+def test_order_counted_on_the_day_it_is_placed(client, catalog):
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    mixer.blend("niunius.CartItem", cart=cart, product=catalog[0], quantity=2)
+    order = mixer.blend("niunius.Order", cart=cart, status=Order.DRAFT)
+    # drafted before midnight, placed after it
+    Order.objects.filter(pk=order.pk).update(date=timezone.now() - timedelta(days=1))
+    client.post(reverse("purchase", kwargs={"pk": order.pk}), {"idempotency_key": order.idempotency_key})
+    assert timezone.localdate(Order.objects.get(pk=order.pk).placed_at) == timezone.localdate()
+    assert DailyProductSales.objects.get().day == timezone.localdate()
+    rolled_up = aggregates()
+    DailyProductSales.objects.all().delete()
+    yesterday = timezone.localdate() - timedelta(days=1)
+    call_command("backfill_sales_report", since=yesterday.isoformat(), until=timezone.localdate().isoformat())
+    assert aggregates() == rolled_up
+
+
+@pytest.mark.django_db
+def test_purchase_rolls_up_once(client, catalog):
+    order = place(client, [(catalog[0], 2)])
+    client.post(reverse("purchase", kwargs={"pk": order.pk}), {"idempotency_key": order.idempotency_key})
+    assert DailyProductSales.objects.get().units == 2
+
+
+@pytest.mark.django_db
+def test_backfill_sales_report_command_matches_rollup(client, catalog):
+    place(client, [(catalog[0], 2), (catalog[1], 1)])
+    place(client, [(catalog[1], 3)])
+    rolled_up = aggregates()
+    DailyProductSales.objects.all().delete()
+    DailyCategorySales.objects.all().delete()
+    call_command("backfill_sales_report", until=timezone.localdate().isoformat())
+    assert aggregates() == rolled_up
+
+
+@pytest.mark.django_db
+def test_sales_count_for_ancestors_of_categories_once(client):
+    parent = mixer.blend("niunius.Category", name="Części")
+    first, second = mixer.cycle(2).blend("niunius.Category", parent=parent)
+    other = mixer.blend("niunius.Category", name="Akcesoria")
+    both, one = mixer.cycle(2).blend("niunius.Product", image="test.gif", stock=50, price=Decimal("10.00"))
+    both.categories.add(first, second)
+    one.categories.add(second)
+    place(client, [(both, 2), (one, 1)])
+    units = dict(DailyCategorySales.objects.values_list("category", "units"))
+    assert units == {parent.pk: 3, first.pk: 2, second.pk: 3}
+    assert other.pk not in units
+
+    rolled_up = aggregates()
+    rebuild_day(timezone.localdate())
+    assert aggregates() == rolled_up
+
+
+@pytest.mark.django_db
+def test_rebuilt_day_counts_old_items_of_variants_at_variant_price():
+    product = mixer.blend("niunius.Product", image="test.gif", stock=0, price=Decimal("10.00"))
+    variant = ProductVariant.objects.create(product=product, name="XL", price=Decimal("12.00"), stock=5)
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=True)
+    mixer.blend("niunius.CartItem", cart=cart, product=product, variant=variant, quantity=2, unit_price=None)
+    mixer.blend("niunius.Order", cart=cart, status=Order.PLACED, placed_at=timezone.now())
+    rebuild_day(timezone.localdate())
+    assert DailyProductSales.objects.get().revenue == Decimal("24.00")
+
+
+@pytest.mark.django_db
+def test_backfill_sales_report_command_skips_today_by_default(client, catalog):
+    place(client, [(catalog[0], 2)])
+    DailyProductSales.objects.all().delete()
+    call_command("backfill_sales_report")
+    assert not DailyProductSales.objects.exists()
+
+
+@pytest.mark.django_db
+def test_sales_dashboard(client, catalog):
+    place(client, [(catalog[0], 2)])
+    DailyProductSales.objects.create(
+        product=catalog[1], day=timezone.localdate() - timedelta(days=60), units=5, revenue=50
+    )
+    admin = mixer.blend("auth.User", is_staff=True, is_superuser=True)
+    client.force_login(admin)
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(reverse("myadmin:sales-dashboard"))
+    assert response.status_code == 200
+    assert response.context["revenue"] == Decimal("20.00")
+    assert [row["product__code"] for row in response.context["products"]] == [catalog[0].code]
+    # session, user, daily sales and three best seller lists
+    assert len(ctx.captured_queries) <= 6
+    response = client.get(reverse("myadmin:sales-dashboard"), {"dni": 90})
+    assert response.context["units"] == 7
+
+
+@pytest.mark.django_db
+def test_sales_dashboard_requires_staff(client, user):
+    response = client.get(reverse("myadmin:sales-dashboard"))
+    assert response.status_code == 302
@@ -0,0 +1,79 @@
+from django.core.management import call_command
+from django.urls import reverse
+
+import numpy as np
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.models import SimilarProduct
+from niunius import similarity
+from niunius.similarity import batches, nearest, vectorize, words
+
+
+def test_words_folded_without_stop_words():
+    assert words("Łożysko koła do Łady, ŻÓŁTE i źle") == ["lozysko", "kola", "lady", "zolte", "zle"]
+
+
+def test_vectors_normalized_and_cut():
+    rows, terms, weights = vectorize(["alfa beta gamma delta", "alfa beta", "epsilon"], max_terms=2)
+    assert np.bincount(rows).tolist() == [2, 2, 1]
+    assert np.allclose(np.bincount(rows, weights=weights ** 2), 1)
+
+
+def test_nearest_same_as_dense_cosine():
+    rng = np.random.default_rng(3)
+    vocabulary = [f"slowo{i}" for i in range(60)]
+    texts = [" ".join(rng.choice(vocabulary, size=rng.integers(3, 12))) for _ in range(40)]
+    rows, terms, weights = vectorize(texts, max_df=1)
+    matrix = np.zeros((len(texts), terms.max() + 1))
+    matrix[rows, terms] = weights
+    dense = matrix @ matrix.T
+    np.fill_diagonal(dense, 0)
+    sources, targets, scores, ranks = nearest(texts, 3, max_df=1)
+    for source, target, score, rank in zip(sources, targets, scores, ranks):
+        assert np.isclose(dense[source, target], score)
+        assert np.isclose(np.sort(dense[source])[::-1][rank], score)
+
+
+def test_groups_of_products_are_neighbours(monkeypatch):
+    groups = ["Lampa LED dachowa", "Opona terenowa", "Wyciągarka elektryczna"]
+    texts = [f"{groups[i // 10]} model{i}" for i in range(30)]
+    # batches of a few rows, like for a large catalog
+    monkeypatch.setattr(similarity, "BATCH_CELLS", 100)
+    sources, targets, scores, ranks = nearest(texts, 5)
+    assert len(sources) == 5 * len(texts)
+    assert (sources // 10 == targets // 10).all()
+
+
+def test_batches_limited_by_rows_and_costs():
+    assert list(batches(np.array([1, 1, 5, 1, 1, 1]), 2, 3)) == [(0, 2), (2, 3), (3, 5), (5, 6)]
+
+
+@pytest.mark.django_db
+def test_similar_products_and_related_articles_on_pages(client):
+    lamp, led, brakes = (
+        mixer.blend("niunius.Product", name=name, description=description, stock=3, image="test.gif")
+        for name, description in (
+            ("Lampa tylna LED", "Lampa zespolona z diodami do Łady Nivy."),
+            ("Listwa LED", "Diody do oświetlenia wnętrza, lampa sufitowa."),
+            ("Klocki hamulcowe", "Klocki przednie do UAZ-a."),
+        )
+    )
+    winter, snow, engine = (
+        mixer.blend("niunius.Article", title=title, content=content)
+        for title, content in (
+            ("Zimowy rajd", "Śnieg, łańcuchy i mróz na trasie rajdu."),
+            ("Śnieżna wyprawa", "Łańcuchy na koła i mróz w górach."),
+            ("Remont silnika", "Wymiana uszczelki pod głowicą."),
+        )
+    )
+    call_command("update_similarities")
+    assert SimilarProduct.objects.get(product=lamp, rank=0).similar == led
+    assert not SimilarProduct.objects.filter(product=brakes).exists()
+
+    response = client.get(reverse("product", kwargs={"slug": lamp.slug}))
+    assert list(response.context["similar"]) == [led]
+    response = client.get(reverse("article-detail", kwargs={"slug": winter.slug}))
+    assert list(response.context["related"]) == [snow]
+    assert snow.title in response.content.decode()
+    assert list(client.get(reverse("article-detail", kwargs={"slug": engine.slug})).context["related"]) == []
@@ -0,0 +1,68 @@
+import gzip
+import json
+
+from django.core.management import call_command
+from django.template import Context, Template
+from django.urls import reverse
+
+import pytest
+
+from niunius.assets import VENDOR_ASSETS, integrity, is_vendored
+
+
+@pytest.fixture
+def collected(settings, tmp_path):
+    settings.STATIC_ROOT = str(tmp_path)
+    settings.STATICFILES_STORAGE = "niunius.storage.PrecompressedManifestStaticFilesStorage"
+    call_command("collectstatic", interactive=False, verbosity=0)
+    return tmp_path
+
+
+def test_collectstatic_saves_hashed_and_compressed_files(collected):
+    manifest = json.loads((collected / "staticfiles.json").read_text())["paths"]
+    hashed = manifest["niunius/js/app.js"]
+    assert hashed != "niunius/js/app.js"
+    assert gzip.decompress((collected / f"{hashed}.gz").read_bytes()) == (collected / hashed).read_bytes()
+    # audio is compressed already
+    assert not (collected / f"{manifest['niunius/music/song.m4a']}.gz").exists()
+
+
+def test_vendor_asset_falls_back_to_cdn():
+    is_vendored.cache_clear()
+    html = Template('{% load assets %}{% vendor_asset "bootstrap-css" %}').render(Context())
+    assert VENDOR_ASSETS["bootstrap-css"]["url"] in html
+    assert VENDOR_ASSETS["bootstrap-css"]["integrity"] in html
+
+
+def test_vendor_asset_links_to_vendored_copy(settings, tmp_path):
+    path = tmp_path / VENDOR_ASSETS["jquery"]["path"]
+    path.parent.mkdir(parents=True)
+    path.write_text("jQuery")
+    settings.STATICFILES_DIRS = [str(tmp_path)]
+    is_vendored.cache_clear()
+    try:
+        html = Template('{% load assets %}{% vendor_asset "jquery" %}').render(Context())
+    finally:
+        is_vendored.cache_clear()
+    assert html == f'<script src="/static/{VENDOR_ASSETS["jquery"]["path"]}"></script>'
+
+
+def test_integrity():
+    assert integrity(b"") == "sha384-OLBgp1GsljhM2TJ+sbHjaiH9txEUvgdDTAzHv2P24donTt6/529l+9Ua0vFImLlb"
+
+
+@pytest.mark.django_db
+def test_shop_inlines_critical_css(client):
+    response = client.get(reverse("shop"))
+    content = response.content.decode()
+    assert ".navbar-brand" in content
+    assert 'rel="preload"' in content
+    assert "niunius/css/style.css" not in content
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("url_name", ["shop", "blog"])
+def test_site_rules_inlined_after_bootstrap(client, url_name):
+    content = client.get(reverse(url_name)).content.decode()
+    # Bootstrap would override the site rules (style.css) coming before it
+    assert content.index('rel="preload"') < content.index("font-size: 20px")
@@ -0,0 +1,180 @@
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db.models.deletion import RestrictedError
+from django.urls import reverse
+
+import pytest
+from mixer.backend.django import mixer
+
+from niunius.catalog_index import bitmap_ids, catalog_index
+from niunius.forms import ProductVariantAdminForm
+from niunius.inventory import available_to_sell, reconcile, record_movement, reserve
+from niunius.models import CartItem, Order, Product, ProductVariant, StockMovement, StockReservation
+
+
+@pytest.fixture
+def shirt():
+    """A product sold in two sizes: M (3 in stock) and L (1 in stock)."""
+    product = mixer.blend("niunius.Product", name="Koszulka klubowa", image="test.gif", stock=0, price=50)
+    ProductVariant.objects.create(product=product, name="M", code="KOSZ-M", price=Decimal("50.00"), stock=3)
+    ProductVariant.objects.create(product=product, name="L", code="KOSZ-L", price=Decimal("55.00"), stock=1)
+    product.refresh_from_db()
+    return product
+
+
+@pytest.mark.django_db
+def test_stock_of_product_is_stock_of_its_variants(shirt):
+    medium, large = shirt.variants.get(name="M"), shirt.variants.get(name="L")
+    assert shirt.stock == 4
+    assert available_to_sell(shirt) == 4
+    assert available_to_sell(shirt, variant=large) == 1
+    assert StockMovement.objects.filter(variant=medium, kind=StockMovement.OPENING).get().quantity == 3
+    assert not list(reconcile())
+    assert not list(reconcile(model=ProductVariant))
+
+
+@pytest.mark.django_db
+def test_stock_of_new_variant_reaches_catalog_index(shirt):
+    index = catalog_index()
+    assert shirt.pk in bitmap_ids(index.in_stock)
+    product = mixer.blend("niunius.Product", image="test.gif", stock=0)
+    assert product.pk not in bitmap_ids(catalog_index().in_stock)
+    ProductVariant.objects.create(product=product, name="XL", code="KOSZ-XL", price=Decimal("60.00"), stock=3)
+    assert product.pk in bitmap_ids(catalog_index().in_stock)
+
+
+@pytest.mark.django_db
+def test_reservations_of_variants(shirt):
+    medium, large = shirt.variants.get(name="M"), shirt.variants.get(name="L")
+    carts = mixer.cycle(2).blend("niunius.ShoppingCart")
+    assert reserve(shirt, carts[0], 1, large)
+    assert not reserve(shirt, carts[1], 1, large)
+    assert reserve(shirt, carts[1], 3, medium)
+    assert available_to_sell(shirt) == 0
+    # another quantity replaces the reservation of the cart
+    assert reserve(shirt, carts[1], 2, medium)
+    assert StockReservation.objects.filter(cart=carts[1]).get().quantity == 2
+
+
+@pytest.mark.django_db
+def test_product_page_adds_chosen_variant_to_cart(client, shirt):
+    large = shirt.variants.get(name="L")
+    url = reverse("product", kwargs={"slug": shirt.slug})
+    page = client.get(url)
+    assert [variant.available for variant in page.context["variants"]] == [1, 3]
+
+    assert client.post(url, {"qty": 1}).context["error"] == "Wybierz wariant produktu."
+    assert client.post(url, {"qty": 1, "variant": large.pk}).status_code == 302
+    response = client.post(url, {"qty": 1, "variant": large.pk})
+    assert response.context["error"] == "Brak wystarczającej ilości produktu. Dostępne: 1 szt."
+    item = CartItem.objects.get()
+    assert (item.variant, item.quantity, item.price) == (large, 1, Decimal("55.00"))
+
+    cart = client.get(reverse("shopping-cart"))
+    assert [(i.variant, i.available) for i in cart.context["items"]] == [(large, 1)]
+    assert cart.context["total"] == Decimal("55.00")
+
+
+@pytest.mark.django_db
+def test_purchase_decreases_stock_of_variant(client, shirt):
+    medium = shirt.variants.get(name="M")
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    mixer.blend("niunius.CartItem", cart=cart, product=shirt, variant=medium, quantity=2)
+    order = mixer.blend("niunius.Order", cart=cart, status=Order.DRAFT)
+    client.post(reverse("purchase", kwargs={"pk": order.pk}), data={"idempotency_key": order.idempotency_key})
+    order.refresh_from_db()
+    assert order.total == Decimal("100.00")
+    assert StockMovement.objects.get(kind=StockMovement.PURCHASE).variant == medium
+    assert available_to_sell(shirt, variant=medium) == 1
+    call_command("compact_stock_ledger")
+    medium.refresh_from_db()
+    assert medium.stock == 1
+    assert Product.objects.get(pk=shirt.pk).stock == 2
+    call_command("reconcile_stock")
+
+
+@pytest.mark.django_db
+def test_search_finds_products_by_codes_of_variants(client, shirt):
+    response = client.get(reverse("search"), {"query": "kosz-l"})
+    assert list(response.context["search_product"]) == [shirt]
+    assert "<small>(L, M)</small>" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_variants_with_stock_movements_are_not_deleted(shirt):
+    with pytest.raises(RestrictedError):
+        shirt.variants.get(name="M").delete()
+    # with the whole product its movements are deleted too
+    shirt.delete()
+    assert not ProductVariant.objects.exists()
+
+
+@pytest.mark.django_db
+def test_product_admin_shows_variants(client, shirt):
+    client.force_login(mixer.blend("auth.User", is_staff=True, is_superuser=True))
+    response = client.get(reverse("myadmin:niunius_product_change", args=[shirt.pk]))
+    assert response.status_code == 200
+    assert "KOSZ-L" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_variants_are_not_deleted_in_product_admin(client, shirt):
+    client.force_login(mixer.blend("auth.User", is_staff=True, is_superuser=True))
+    url = reverse("myadmin:niunius_product_change", args=[shirt.pk])
+    page = client.get(url)
+    data = {
+        name: value
+        for name, value in page.context["adminform"].form.initial.items()
+        if name in page.context["adminform"].form.fields and value is not None and name != "image"
+    }
+    data.update(
+        {
+            "cars": [mixer.blend("niunius.Car", image="test.gif").pk],
+            "categories": [mixer.blend("niunius.Category").pk],
+            "stock_change_kind": "restock",
+        }
+    )
+    formset = page.context["inline_admin_formsets"][0].formset
+    data.update(
+        {
+            f"{formset.prefix}-TOTAL_FORMS": 2,
+            f"{formset.prefix}-INITIAL_FORMS": 2,
+            f"{formset.prefix}-MIN_NUM_FORMS": 0,
+            f"{formset.prefix}-MAX_NUM_FORMS": 1000,
+        }
+    )
+    for i, variant in enumerate(shirt.variants.all()):
+        data.update(
+            {
+                f"{formset.prefix}-{i}-id": variant.pk,
+                f"{formset.prefix}-{i}-product": shirt.pk,
+                f"{formset.prefix}-{i}-name": variant.name,
+                f"{formset.prefix}-{i}-code": variant.code,
+                f"{formset.prefix}-{i}-price": variant.price,
+                f"{formset.prefix}-{i}-stock_change_kind": "restock",
+                f"{formset.prefix}-{i}-DELETE": "on",
+            }
+        )
+    response = client.post(url, data)
+    assert response.status_code == 302
+    assert shirt.variants.count() == 2
+    assert "DELETE" not in formset.forms[0].fields
+
+
+@pytest.mark.parametrize(
+    "kind, change, valid",
+    [("restock", 2, True), ("restock", -1, False), ("adjustment", -2, True), ("adjustment", -3, False)],
+)
+@pytest.mark.django_db
+def test_stock_change_of_variant_in_admin_is_checked(shirt, kind, change, valid):
+    medium = shirt.variants.get(name="M")
+    # the current stock of the variant is 2
+    record_movement(shirt, StockMovement.PURCHASE, -1, variant=medium)
+    data = {"name": "M", "code": "KOSZ-M", "price": "50.00"}
+    form = ProductVariantAdminForm(
+        {**data, "stock_change": change, "stock_change_kind": kind}, instance=medium
+    )
+    assert form.is_valid() == valid
+    if not valid:
+        assert "stock_change" in form.errors
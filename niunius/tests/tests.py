@@ -1,14 +1,33 @@
+import datetime
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import AnonymousUser
-from django.test import RequestFactory
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, RequestFactory
 from django.urls import reverse
+from django.utils import timezone
 
 import pytest
 from mixer.backend.django import mixer
 
 from niunius import views
-from niunius.forms import GuestForm, MessageForm, VisitForm
-from niunius.models import CartItem
+from niunius.forms import GuestForm, MessageForm, ProductAdminForm, VisitForm
+from niunius.management.commands.loadtest import summarize
+from niunius.inventory import available_to_sell, current_stock, reconcile, record_movement, reserve
+from niunius.models import (
+    Article,
+    Car,
+    CartItem,
+    Category,
+    Order,
+    Product,
+    StockMovement,
+    StockReservation,
+)
 
 
 # HomeView
@@ -304,6 +323,20 @@ def test_search_view_if_car_model_found(client):
     assert len(response.context["cars"]) == 1
 
 
+@pytest.mark.django_db
+def test_shop_and_search_skip_products_not_available_to_sell(client):
+    sold_out = mixer.blend("niunius.Product", name="test wyprzedany", image="test.gif", stock=2)
+    record_movement(sold_out, StockMovement.PURCHASE, -2)
+    reserved = mixer.blend("niunius.Product", name="test zarezerwowany", image="test.gif", stock=1)
+    reserve(reserved, mixer.blend("niunius.ShoppingCart"), 1)
+    restocked = mixer.blend("niunius.Product", name="test dostarczony", image="test.gif", stock=0)
+    record_movement(restocked, StockMovement.RESTOCK, 5)
+    response = client.get(reverse("shop"))
+    assert list(response.context["latest_products"]) == [restocked]
+    response = client.get(reverse("search"), {"query": "test"})
+    assert list(response.context["search_product"]) == [restocked]
+
+
 # CarView
 
 
@@ -360,6 +393,87 @@ def test_product_view_adding_to_shopping_cart(client, product):
     assert CartItem.objects.count() == count + 1
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "qty, error",
+    [
+        ("-1", "Ilość musi być większa od zera."),
+        ("0", "Ilość musi być większa od zera."),
+        ("abc", "Ilość musi być liczbą całkowitą."),
+        ("", "Podaj ilość produktu."),
+    ],
+)
+def test_product_view_rejects_invalid_quantity(client, product, qty, error):
+    response = client.post(reverse("product", kwargs={"slug": product.slug}), data={"qty": qty})
+    assert response.status_code == 200
+    assert response.context["error"] == error
+    assert not StockReservation.objects.exists()
+    assert not CartItem.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("qty", ["-1", "0", "abc"])
+def test_shopping_cart_view_rejects_invalid_quantity(client, product, qty):
+    Product.objects.filter(pk=product.pk).update(stock=3)
+    client.post(reverse("product", kwargs={"slug": product.slug}), data={"qty": 2})
+    response = client.post(reverse("shopping-cart"), data={"qty": qty, "product": product.pk})
+    assert response.status_code == 200
+    assert "error" in response.context
+    assert CartItem.objects.get().quantity == 2
+    assert StockReservation.objects.get().quantity == 2
+
+
+@pytest.mark.django_db
+def test_product_view_reserves_product(client, product):
+    Product.objects.filter(pk=product.pk).update(stock=3)
+    client.post(reverse("product", kwargs={"slug": product.slug}), data={"qty": 2})
+    other_client = Client()
+    response = other_client.post(reverse("product", kwargs={"slug": product.slug}), data={"qty": 2})
+    assert response.status_code == 200
+    assert "error" in response.context
+    assert StockReservation.objects.get().quantity == 2
+    response = other_client.post(reverse("product", kwargs={"slug": product.slug}), data={"qty": 1})
+    assert response.status_code == 302
+    assert available_to_sell(product) == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_reservations_of_hot_product(product):
+    if not connection.features.has_select_for_update:
+        pytest.skip("the database does not lock rows, concurrent reservations are not checked one by one")
+    Product.objects.filter(pk=product.pk).update(stock=3)
+    carts = mixer.cycle(10).blend("niunius.ShoppingCart")
+    start = threading.Barrier(len(carts))
+
+    def reserve_one(cart):
+        start.wait()
+        try:
+            return reserve(product, cart, 1)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(len(carts)) as executor:
+        reserved = list(executor.map(reserve_one, carts))
+    assert reserved.count(True) == 3
+    assert available_to_sell(product) == 0
+
+
+@pytest.mark.django_db
+def test_expired_reservations_are_available_and_released(product):
+    Product.objects.filter(pk=product.pk).update(stock=3)
+    cart = mixer.blend("niunius.ShoppingCart")
+    mixer.blend(
+        "niunius.StockReservation",
+        product=product,
+        cart=cart,
+        quantity=3,
+        expires=timezone.now() - datetime.timedelta(seconds=1),
+    )
+    assert available_to_sell(product) == 3
+    call_command("release_expired_reservations", batch_size=1)
+    assert StockReservation.objects.count() == 0
+
+
 # DeleteItemView
 
 
@@ -378,6 +492,14 @@ def test_delete_item_view_if_shopping_cart_items_changed(client, product):
     assert CartItem.objects.count() == count - 1
 
 
+@pytest.mark.django_db
+def test_delete_item_view_releases_reservation(client, product):
+    item = mixer.blend("niunius.CartItem", product=product, quantity=1)
+    reserve(product, item.cart, 1)
+    client.post(reverse("delete-item", kwargs={"pk": item.pk}))
+    assert StockReservation.objects.count() == 0
+
+
 # ShoppingCartView
 
 
@@ -399,6 +521,17 @@ def test_shopping_cart_view_changing_item_quantity_if_logged_user(
     assert response.context["items"][0].quantity == 2
 
 
+@pytest.mark.django_db
+def test_shopping_cart_view_if_quantity_not_available(client, user, product):
+    Product.objects.filter(pk=product.pk).update(stock=3)
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    mixer.blend("niunius.CartItem", cart=cart, product=product, quantity=1)
+    data = {"qty": 4, "product": product.id}
+    response = client.post(reverse("shopping-cart"), data=data)
+    assert "error" in response.context
+    assert response.context["items"][0].quantity == 1
+
+
 # OrderView
 
 
@@ -416,6 +549,36 @@ def test_order_view_if_unauthenticated_user():
         views.OrderView.as_view()(request)
 
 
+@pytest.mark.django_db
+def test_order_view_fills_in_default_address(client, user):
+    mixer.blend("niunius.Address", user=user, city="Kraków", is_default=False)
+    mixer.blend("niunius.Address", user=user, city="Warszawa", is_default=True)
+    response = client.get(reverse("order"))
+    assert response.context["form"].initial["address_city"] == "Warszawa"
+
+
+@pytest.mark.django_db
+def test_order_view_saves_default_address(client, user):
+    old = mixer.blend("niunius.Address", user=user, city="Kraków", is_default=True)
+    mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    data = {
+        "first_name": "Jan",
+        "last_name": "Kowalski",
+        "email": "jan@example.com",
+        "address_street": "Leśna 1",
+        "address_zipcode": "00-001",
+        "address_city": "Warszawa",
+        "address_country": "Polska",
+        "delivery_method": "Kurier",
+        "payment_method": "Przelew",
+    }
+    response = client.post(reverse("order"), data=data)
+    old.refresh_from_db()
+    assert response.status_code == 302
+    assert old.is_default is False
+    assert user.addresses.get(is_default=True).city == "Warszawa"
+
+
 # GuestOrderView
 
 
@@ -433,6 +596,33 @@ def test_guest_order_view_if_missing_form_data(client):
     assert response.status_code == 200
 
 
+@pytest.mark.django_db
+def test_guest_order_view_keeps_one_draft_order(client, product):
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=None)
+    session = client.session
+    session["cart"] = cart.pk
+    session.save()
+    data = {
+        "guest_first_name": "Jan",
+        "guest_last_name": "Kowalski",
+        "guest_email": "jan@example.com",
+        "address_street": "Leśna 1",
+        "address_zipcode": "00-001",
+        "address_city": "Warszawa",
+        "address_country": "Polska",
+        "delivery_method": "Kurier",
+        "payment_method": "Przelew",
+    }
+    client.post(reverse("guest-order"), data=data)
+    response = client.post(reverse("guest-order"), data=dict(data, address_city="Kraków"))
+    order = Order.objects.get(cart=cart)
+    assert response.status_code == 302
+    assert Order.objects.count() == 1
+    assert order.status == Order.DRAFT
+    assert order.address_city == "Kraków"
+    assert order.guest_buyer_email == "jan@example.com"
+
+
 # OrderConfirmationView
 
 
@@ -467,3 +657,155 @@ def tes_purchase_view(client, order):
 def test_purchase_view_if_no_order(client):
     response = client.get(reverse("purchase", kwargs={"pk": 0}))
     assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_purchase_view_if_order_not_placed(client, order):
+    Order.objects.filter(pk=order.pk).update(status=Order.DRAFT)
+    response = client.get(reverse("purchase", kwargs={"pk": order.pk}))
+    assert response.status_code == 302
+
+
+@pytest.mark.django_db
+def test_purchase_view_decreases_stock_once(client, product):
+    stock = product.stock
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    mixer.blend("niunius.CartItem", cart=cart, product=product, quantity=2)
+    order = mixer.blend("niunius.Order", cart=cart, status=Order.DRAFT)
+    data = {"idempotency_key": order.idempotency_key}
+    first = client.post(reverse("purchase", kwargs={"pk": order.pk}), data=data)
+    second = client.post(reverse("purchase", kwargs={"pk": order.pk}), data=data)
+    cart.refresh_from_db()
+    assert first.status_code == second.status_code == 200
+    assert current_stock(product) == stock - 2
+    assert cart.is_ordered is True
+    assert Order.objects.get(pk=order.pk).status == Order.PLACED
+
+
+@pytest.mark.django_db
+def test_purchase_view_checks_stock_again(client, product):
+    Product.objects.filter(pk=product.pk).update(stock=2)
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    mixer.blend("niunius.CartItem", cart=cart, product=product, quantity=2)
+    order = mixer.blend("niunius.Order", cart=cart, status=Order.DRAFT)
+    # the reservation of the cart has expired and another cart has reserved the units
+    reserve(product, mixer.blend("niunius.ShoppingCart"), 1)
+    data = {"idempotency_key": order.idempotency_key}
+    response = client.post(reverse("purchase", kwargs={"pk": order.pk}), data=data, follow=True)
+    assert response.redirect_chain == [(reverse("shopping-cart"), 302)]
+    assert f"Brak wystarczającej ilości produktów: {product.name}." in response.content.decode()
+    assert Order.objects.get(pk=order.pk).status == Order.DRAFT
+    assert not StockMovement.objects.filter(kind=StockMovement.PURCHASE).exists()
+
+
+@pytest.mark.django_db
+def test_purchase_view_records_stock_movements(client, product):
+    stock = product.stock
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    mixer.blend("niunius.CartItem", cart=cart, product=product, quantity=2)
+    order = mixer.blend("niunius.Order", cart=cart, status=Order.DRAFT)
+    data = {"idempotency_key": order.idempotency_key}
+    client.post(reverse("purchase", kwargs={"pk": order.pk}), data=data)
+    movement = StockMovement.objects.get(kind=StockMovement.PURCHASE)
+    product.refresh_from_db()
+    assert movement.quantity == -2
+    assert movement.order == order
+    assert product.stock == stock
+    call_command("compact_stock_ledger")
+    product.refresh_from_db()
+    assert product.stock == stock - 2
+    assert not StockMovement.objects.filter(applied=False).exists()
+
+
+@pytest.mark.django_db
+def test_purchase_view_saves_prices_and_totals(client, product):
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    item = mixer.blend("niunius.CartItem", cart=cart, product=product, quantity=2)
+    order = mixer.blend("niunius.Order", cart=cart, status=Order.DRAFT)
+    price = product.price
+    data = {"idempotency_key": order.idempotency_key}
+    client.post(reverse("purchase", kwargs={"pk": order.pk}), data=data)
+    Product.objects.filter(pk=product.pk).update(price=price + 10)
+    order.refresh_from_db()
+    item.refresh_from_db()
+    assert item.unit_price == price
+    assert order.subtotal == order.total == 2 * price
+    assert order.cart.total() == 2 * price
+
+
+@pytest.mark.django_db
+def test_purchase_view_if_stale_idempotency_key(client, product):
+    stock = product.stock
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=False)
+    mixer.blend("niunius.CartItem", cart=cart, product=product, quantity=2)
+    order = mixer.blend("niunius.Order", cart=cart, status=Order.DRAFT)
+    data = {"idempotency_key": uuid.uuid4()}
+    response = client.post(reverse("purchase", kwargs={"pk": order.pk}), data=data)
+    assert response.status_code == 302
+    assert current_stock(product) == stock
+    assert Order.objects.get(pk=order.pk).status == Order.DRAFT
+
+
+# Management commands
+
+
+@pytest.mark.django_db
+def test_seed_shop_command():
+    call_command("seed_shop", cars=3, categories=2, products=20, articles=4, comments=2, seed=1)
+    assert Product.objects.count() == 20
+    assert Car.objects.count() == 3
+    assert [(category.level, category.lft, category.rght) for category in Category.objects.all()] == [
+        (0, 1, 4),
+        (1, 2, 3),
+    ]
+    assert Article.objects.count() == 4
+    assert all(product.cars.exists() for product in Product.objects.all())
+    assert StockMovement.objects.filter(kind=StockMovement.OPENING).count() == 20
+    assert not list(reconcile())
+
+
+@pytest.mark.django_db
+def test_backfill_order_totals_command(product):
+    cart = mixer.blend("niunius.ShoppingCart", is_ordered=True)
+    mixer.blend("niunius.CartItem", cart=cart, product=product, quantity=3)
+    order = mixer.blend("niunius.Order", cart=cart, status=Order.PLACED, subtotal=None, total=None)
+    call_command("backfill_order_totals", batch_size=1)
+    order.refresh_from_db()
+    assert order.total == 3 * product.price
+    assert cart.cartitem_set.get().unit_price == product.price
+
+
+@pytest.mark.parametrize(
+    "kind, change, error", [("restock", -1, True), ("adjustment", -3, False), ("adjustment", -4, True)]
+)
+@pytest.mark.django_db
+def test_stock_change_of_product_in_admin_is_checked(kind, change, error):
+    product = mixer.blend("niunius.Product", image="test.gif", stock=4)
+    record_movement(product, StockMovement.PURCHASE, -1)
+    form = ProductAdminForm({"stock_change": change, "stock_change_kind": kind}, instance=product)
+    form.is_valid()
+    assert ("stock_change" in form.errors) == error
+
+
+@pytest.mark.django_db
+def test_reconcile_stock_command(product):
+    record_movement(product, StockMovement.RESTOCK, 5)
+    call_command("compact_stock_ledger", batch_size=1)
+    call_command("reconcile_stock")
+    Product.objects.filter(pk=product.pk).update(stock=0)
+    with pytest.raises(CommandError):
+        call_command("reconcile_stock")
+    call_command("reconcile_stock", fix=True)
+    product.refresh_from_db()
+    assert product.stock == sum(product.movements.values_list("quantity", flat=True))
+
+
+def test_loadtest_summarize():
+    samples = [(i / 1000, i != 100) for i in range(1, 101)]
+    summary = summarize(samples, elapsed=10)
+    assert summary["requests"] == 100
+    assert summary["req_per_s"] == 10
+    assert summary["error_rate"] == 0.01
+    assert summary["p50_ms"] == 50
+    assert summary["p99_ms"] == 99
+    assert summary["max_ms"] == 100
@@ -1,11 +1,14 @@
+from django.contrib import messages
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.contrib.auth.views import PasswordChangeView
 from django.core.paginator import Paginator
+from django.db import IntegrityError
 from django.db.models import F
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.core.mail import send_mail
 from django.views import View
 from django.views.generic import (
@@ -18,7 +21,20 @@ from django.views.generic import (
 
 import locale
 import calendar
-
+import uuid
+
+from .checkout import (
+    OutOfStock,
+    forms_valid,
+    get_addresses,
+    is_placed,
+    place_order,
+    save_default_address,
+    save_draft_order,
+)
+from .catalog_index import ProductIds, catalog_index
+from .comments import add_comment, comment_page
+from .facets import ProductFilters, facets
 from .forms import (
     ArticleForm,
     ArticleCommentForm,
@@ -29,20 +45,24 @@ from .forms import (
     DeliveryForm,
     PaymentForm,
     GuestForm,
+    QuantityForm,
     UserForm,
 )
+from .inventory import release, reserve, with_available, with_items_available, with_variant_available
 from .models import (
     Article,
-    ArticlePhoto,
-    ArticleComment,
     Car,
     Category,
     Product,
+    ProductVariant,
     ShoppingCart,
     CartItem,
     Order,
     CarService,
 )
+from .photos import ingest_uploads
+from .recommendations import recommended_products
+from .similarity import related_articles, similar_products
 
 
 class HomeView(TemplateView):
@@ -92,7 +112,11 @@ class UserOrdersView(LoginRequiredMixin, ListView):
     template_name = "registration/user_orders.html"
 
     def get_queryset(self):
-        queryset = Order.objects.filter(buyer=self.request.user).order_by("-date")
+        queryset = (
+            Order.objects.filter(buyer=self.request.user)
+            .prefetch_related("cart__cartitem_set__product", "cart__cartitem_set__variant")
+            .order_by("-date")
+        )
         return queryset
 
 
@@ -120,7 +144,7 @@ class ContactView(View):
     def post(self, request):
         """
         If the form is correctly completed, send an e-mail message from the user to the club e-mail address.
-        Check my_django_project/settings.py file for email settings.
+        Check my_django_project/settings/base.py file for email settings.
         """
         form = MessageForm(request.POST)
         if form.is_valid():
@@ -162,7 +186,7 @@ class BookVisitView(View):
         If the form is correctly completed,
         then send via e-mail visit details to the club e-mail address.
 
-        Check my_django_project/settings.py file for email settings.
+        Check my_django_project/settings/base.py file for email settings.
         """
         form = VisitForm(request.POST)
         if form.is_valid():
@@ -214,7 +238,11 @@ class BlogView(View):
     """
 
     def get(self, request):
-        articles = Article.objects.exclude(slug="o-klubie").order_by("-added")
+        articles = (
+            Article.objects.exclude(slug="o-klubie")
+            .prefetch_related("articlephoto_set")
+            .order_by("-added")
+        )
         paginator = Paginator(articles, 10)
         page_number = request.GET.get("page")
         page_obj = paginator.get_page(page_number)
@@ -243,16 +271,18 @@ class AddArticleView(LoginRequiredMixin, View):
         (title and content fields are required, photos optional),
         create new Article object
         and related to it ArticlePhoto objects (if any photos added in the form).
+        Photos are processed by the photo ingestion workers, they show up once processed.
         """
-        form = ArticleForm(request.POST, request.FILES)
+        form = ArticleForm(
+            request.POST, request.FILES, skipped_uploads=getattr(request, "skipped_uploads", [])
+        )
         if form.is_valid():
             title = form.cleaned_data["title"]
             content = form.cleaned_data["content"]
             article = Article.objects.create(
                 title=title, content=content, added_by=request.user
             )
-            for photo in request.FILES.getlist("photos"):
-                ArticlePhoto.objects.create(photo=photo, article=article)
+            ingest_uploads(article, form.cleaned_data["photos"])
             return redirect("blog")
         return render(request, "niunius/article_form.html", {"form": form})
 
@@ -274,7 +304,9 @@ class UpdateArticleView(LoginRequiredMixin, View):
 
     def post(self, request, pk):
         """Save changes to the given article."""
-        form = ArticleForm(request.POST, request.FILES)
+        form = ArticleForm(
+            request.POST, request.FILES, skipped_uploads=getattr(request, "skipped_uploads", [])
+        )
         article = get_object_or_404(Article, pk=pk)
         if form.is_valid():
             title = form.cleaned_data["title"]
@@ -283,8 +315,7 @@ class UpdateArticleView(LoginRequiredMixin, View):
             article.content = content
             article.updated_by = request.user
             article.save()
-            for photo in request.FILES.getlist("photos"):
-                ArticlePhoto.objects.create(photo=photo, article=article)
+            ingest_uploads(article, form.cleaned_data["photos"])
             return redirect("article-detail", article.slug)
         return render(request, "niunius/article_update.html", {"form": form})
 
@@ -296,22 +327,26 @@ class ArticleDetailView(View):
     """
 
     def get(self, request, slug):
-        """Display details of the given article."""
-        article = get_object_or_404(Article, slug=slug)
-        comments = article.articlecomment_set.all().order_by("-added")
+        """Display details of the given article and articles related to it."""
+        article = get_object_or_404(
+            Article.objects.prefetch_related("articlephoto_set"), slug=slug
+        )
+        page, comments, comments_count = comment_page(
+            article.articlecomment_set.all(), request.GET.get("comments")
+        )
         ctx = {
             "article": article,
             "comments": comments,
-            "comments_count": comments.count(),
+            "comments_count": comments_count,
+            "comments_page": page,
             "form": ArticleCommentForm(),
+            "related": related_articles(slug),
         }
         return render(request, "niunius/article_detail.html", ctx)
 
     def post(self, request, slug):
         """If new values provided, update 'like' or 'dislike' numbers of the given article."""
         article = get_object_or_404(Article, slug=slug)
-        comments = article.articlecomment_set.all().order_by("-added")
-        comments_count = comments.count()
 
         if "like" in request.POST:
             article.like = F("like") + 1
@@ -323,10 +358,14 @@ class ArticleDetailView(View):
             article.save()
             return redirect("article-detail", article.slug)
 
+        page, comments, comments_count = comment_page(
+            article.articlecomment_set.all(), request.GET.get("comments")
+        )
         ctx = {
             "article": article,
             "comments": comments,
             "comments_count": comments_count,
+            "comments_page": page,
         }
         return render(request, "niunius/article_detail.html", ctx)
 
@@ -337,33 +376,50 @@ class AddCommentView(LoginRequiredMixin, View):
     login_url = reverse_lazy("login")
 
     def get(self, request, pk):
-        """Display the empty comment form."""
+        """Display the empty comment form, replying to the comment given in the 'parent' parameter."""
+        article = get_object_or_404(Article, pk=pk)
+        parent = request.GET.get("parent", "")
+        if parent.isdigit():
+            parent = article.articlecomment_set.select_related("user").filter(pk=parent).first()
+        else:
+            parent = None
         ctx = {
-            "article": get_object_or_404(Article, pk=pk),
-            "form": ArticleCommentForm(),
+            "article": article,
+            "form": ArticleCommentForm(article=article, initial={"parent": parent}),
+            "parent": parent,
+            "next": request.GET.get("next", ""),
         }
         return render(request, "niunius/article_comment_form.html", ctx)
 
     def post(self, request, pk):
-        """If the form is correctly completed, create new ArticleComment object."""
-        form = ArticleCommentForm(request.POST)
+        """
+        If the form is correctly completed, add the comment (or the reply) to the article
+        and go back to the page given in the 'next' parameter (if it is a page of this site)
+        or to the article.
+        """
         article = get_object_or_404(Article, pk=pk)
+        form = ArticleCommentForm(request.POST, article=article)
+        next_url = request.POST.get("next", "")
         if form.is_valid():
-            text = form.cleaned_data["text"]
-            ArticleComment.objects.create(article=article, text=text, user=request.user)
+            add_comment(article, request.user, form.cleaned_data["text"], form.cleaned_data["parent"])
+            if url_has_allowed_host_and_scheme(
+                next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+            ):
+                return redirect(next_url)
             return redirect("article-detail", article.slug)
-        return redirect("add-comment", {"form": form, "article": article})
+        ctx = {"article": article, "form": form, "parent": None, "next": next_url}
+        return render(request, "niunius/article_comment_form.html", ctx)
 
 
 class ShopView(View):
     """
     List categories and car models on the left sidebar.
     Also display images of products recently added to the store.
-    Skip products with stock equal to 0.
+    Skip products not available to sell (by the stock ledger and reservations).
     """
 
     def get(self, request):
-        latest_products = Product.objects.exclude(stock=0).order_by("-added")[:6]
+        latest_products = with_available(Product.objects).filter(available__gt=0).order_by("-added")[:6]
         return render(
             request, "niunius/shop.html", {"latest_products": latest_products}
         )
@@ -371,9 +427,9 @@ class ShopView(View):
 
 class SearchView(ListView):
     """
-    Search for given query among Category names, Product names and codes, and Car models.
+    Search for given query among Category names, Product names and codes (also of variants), and Car models.
     Display the results.
-    As for products in the results, show only available ones, skip those with stock equal to 0.
+    As for products in the results, show only those available to sell (by the stock ledger and reservations).
     """
 
     template_name = "niunius/search_results.html"
@@ -386,14 +442,42 @@ class SearchView(ListView):
     def get_context_data(self, **kwargs):
         query = self.request.GET.get("query")
         context = super(SearchView, self).get_context_data(**kwargs)
-        products = Product.objects.filter(
-            name__icontains=query
-        ) | Product.objects.filter(code__icontains=query)
-        context["search_product"] = products.exclude(stock=0)
+        products = (
+            Product.objects.filter(name__icontains=query)
+            | Product.objects.filter(code__icontains=query)
+            | Product.objects.filter(variants__code__icontains=query)
+        ).distinct()
+        context["search_product"] = (
+            with_available(products).filter(available__gt=0).prefetch_related("variants")
+        )
         context["search_car"] = Car.objects.filter(model__icontains=query)
         return context
 
 
+class ProductListView(View):
+    """
+    List products chosen with facets: car models, categories, price bands and availability,
+    not more than 24 products per one page, the newest first.
+    Next to each value of a facet show how many products would be listed after choosing it.
+    Products are chosen and counted with the in-memory catalog index, only the page is read from the database.
+    """
+
+    def get(self, request):
+        filters = ProductFilters(request.GET)
+        index = catalog_index()
+        page_obj = Paginator(ProductIds(index.filter(filters)), 24).get_page(request.GET.get("page"))
+        products = Product.objects.prefetch_related("variants").in_bulk(page_obj.object_list)
+        page_obj.object_list = [products[pk] for pk in page_obj.object_list if pk in products]
+        query = request.GET.copy()
+        query.pop("page", None)
+        ctx = {
+            "page_obj": page_obj,
+            "facets": facets(filters, index.counts(filters)),
+            "query": query.urlencode(),
+        }
+        return render(request, "niunius/products.html", ctx)
+
+
 class CarView(DetailView):
     """
     Display details of the given car.
@@ -415,12 +499,29 @@ class CategoryView(DetailView):
 
 
 class ProductView(View):
-    """Product details page with functionality of adding the product to the shopping cart."""
+    """Product details page with functionality of adding the product (or its variant) to the shopping cart."""
+
+    @staticmethod
+    def get_variants(product, cart=None):
+        """Variants of the product with quantities available to sell (for the cart)."""
+        return list(with_variant_available(product.variants.all(), exclude_cart=cart))
+
+    def get_context(self, slug, cart=None):
+        """
+        Context of the product page: the product and its variants with quantities available to sell
+        (for the cart), available products frequently bought together with it and similar ones.
+        """
+        product = get_object_or_404(with_available(Product.objects, exclude_cart=cart), slug=slug)
+        return {
+            "product": product,
+            "variants": self.get_variants(product, cart),
+            "recommended": recommended_products(slug),
+            "similar": similar_products(slug),
+        }
 
     def get(self, request, slug):
         """Display details of the given product."""
-        product = get_object_or_404(Product, slug=slug)
-        return render(request, "niunius/product.html", {"product": product})
+        return render(request, "niunius/product.html", self.get_context(slug))
 
     def post(self, request, slug):
         """
@@ -431,41 +532,48 @@ class ProductView(View):
         For logged-in users,
         once the shopping cart is created (creation is when the first item is added to the cart),
         the cart is saved and is editable at any time, if the user logged in, till the order is placed.
+
+        A product with variants is added as the chosen variant.
+        The quantity of the product (variant) in the cart is reserved for the cart.
+        If the quantity is not available to sell, display the product page with the error message.
         """
-        product = Product.objects.get(slug=slug)
-        qty = int(request.POST.get("qty"))
+        product = get_object_or_404(Product, slug=slug)
+        form = QuantityForm(request.POST)
+        if not form.is_valid():
+            ctx = dict(self.get_context(slug), error=form.error())
+            return render(request, "niunius/product.html", ctx)
+        qty = form.cleaned_data["qty"]
+        variant = None
+        if request.POST.get("variant"):
+            variant = get_object_or_404(ProductVariant, pk=request.POST["variant"], product=product)
+        elif product.variants.exists():
+            ctx = dict(self.get_context(slug), error="Wybierz wariant produktu.")
+            return render(request, "niunius/product.html", ctx)
 
         if request.user.is_authenticated:
-            try:
-                cart = ShoppingCart.objects.get(is_ordered=False)
-            except ShoppingCart.DoesNotExist:
-                new_cart = ShoppingCart.objects.create(is_ordered=False)
-                CartItem.objects.create(product=product, quantity=qty, cart=new_cart)
-                return redirect("shopping-cart")
-            try:
-                item = cart.cartitem_set.get(product_id=product.pk)
-            except CartItem.DoesNotExist:
-                CartItem.objects.create(product=product, quantity=qty, cart=cart)
-                return redirect("shopping-cart")
-
+            cart, _ = ShoppingCart.objects.get_or_create(is_ordered=False)
         else:
-            if "cart" not in request.session:
-                new_cart = ShoppingCart.objects.create()
-                request.session["cart"] = new_cart.id
-                CartItem.objects.create(product=product, quantity=qty, cart=new_cart)
-                return redirect("shopping-cart")
+            cart = ShoppingCart.objects.filter(pk=request.session.get("cart")).first()
+            if cart is None:
+                cart = ShoppingCart.objects.create()
+                request.session["cart"] = cart.id
+
+        item = cart.cartitem_set.filter(product=product, variant=variant).first()
+        quantity = qty + (item.quantity if item else 0)
+        if not reserve(product, cart, quantity, variant):
+            ctx = self.get_context(slug, cart)
+            if variant:
+                available = next(v.available for v in ctx["variants"] if v == variant)
             else:
-                cart = ShoppingCart.objects.get(pk=request.session["cart"])
-                try:
-                    item = cart.cartitem_set.get(product_id=product.pk)
-                except CartItem.DoesNotExist:
-                    CartItem.objects.create(product=product, quantity=qty, cart=cart)
-                    return redirect("shopping-cart")
-
-        item.quantity += qty
-        item.save()
-        cart.cartitem_set.get(product_id=product.pk).quantity += qty
-        cart.cartitem_set.get(product_id=product.pk).save()
+                available = ctx["product"].available
+            ctx["error"] = f"Brak wystarczającej ilości produktu. Dostępne: {available} szt."
+            return render(request, "niunius/product.html", ctx)
+
+        if item is None:
+            CartItem.objects.create(product=product, variant=variant, quantity=quantity, cart=cart)
+        else:
+            item.quantity = quantity
+            item.save()
         return redirect("shopping-cart")
 
 
@@ -481,6 +589,11 @@ class ShoppingCartView(View):
     the cart is saved and is editable at any time, if the user logged in, till the order is placed.
     """
 
+    def get_items(self, cart):
+        """Cart items with products, variants and quantities available to sell for this cart."""
+        items = cart.cartitem_set.select_related("product", "variant").order_by("pk")
+        return with_items_available(items, cart)
+
     def get(self, request):
         """Display the shopping cart with all added items."""
         try:
@@ -490,7 +603,7 @@ class ShoppingCartView(View):
                 cart = ShoppingCart.objects.get(pk=request.session.get("cart"))
         except ShoppingCart.DoesNotExist:
             return render(request, "niunius/shopping_cart.html")
-        items = cart.cartitem_set.all().order_by("pk")
+        items = self.get_items(cart)
         total = cart.total()
         ctx = {"items": items, "total": total}
         return render(request, "niunius/shopping_cart.html", ctx)
@@ -498,28 +611,37 @@ class ShoppingCartView(View):
     def post(self, request):
         """
         If the quantity is changed for a given cart item,
-        recalculate the item value and the total value of the cart accordingly.
+        change the reservation of the product
+        and recalculate the item value and the total value of the cart accordingly.
         """
         if request.user.is_authenticated:
             cart = ShoppingCart.objects.get(is_ordered=False)
         else:
             cart = ShoppingCart.objects.get(pk=request.session.get("cart"))
-        items = cart.cartitem_set.all().order_by("pk")
-        qty = int(request.POST.get("qty"))
+        items = self.get_items(cart)
+        form = QuantityForm(request.POST)
         product = request.POST.get("product")
-        item = cart.cartitem_set.get(product=product)
-        item.quantity = qty
-        item.save()
+        variant = request.POST.get("variant") or None
+        item = cart.cartitem_set.select_related("product", "variant").get(product=product, variant=variant)
+        ctx = {}
+        if not form.is_valid():
+            ctx["error"] = form.error()
+        elif reserve(item.product, cart, form.cleaned_data["qty"], item.variant):
+            item.quantity = form.cleaned_data["qty"]
+            item.save()
+        else:
+            ctx["error"] = f"Brak wystarczającej ilości produktu {item.product.name}."
         total = cart.total()
-        ctx = {"items": items, "total": total}
+        ctx.update({"items": items, "total": total})
         return render(request, "niunius/shopping_cart.html", ctx)
 
 
 class DeleteItemView(View):
-    """Delete the given cart item from the shopping cart."""
+    """Delete the given cart item from the shopping cart and release the reservation of the product."""
 
     def post(self, request, pk):
         item_to_delete = CartItem.objects.get(pk=pk)
+        release(item_to_delete.cart_id, item_to_delete.product_id, item_to_delete.variant_id)
         item_to_delete.delete()
         return redirect("shopping-cart")
 
@@ -536,26 +658,15 @@ class OrderView(View):
     def get(self, request):
         """
         Display the order forms for buyers who have accounts and are logged in..
-        Fill them with the personal and address data (if available) of the logged-in user.
+        Fill them with the personal data of the logged-in user
+        and with the default address (or the address chosen from the address book), if available.
         """
-        form = (
-            OrderForm(
-                initial={
-                    "address_country": request.user.order_set.latest(
-                        "pk"
-                    ).address_country,
-                    "address_street": request.user.order_set.latest(
-                        "pk"
-                    ).address_street,
-                    "address_zipcode": request.user.order_set.latest(
-                        "pk"
-                    ).address_zipcode,
-                    "address_city": request.user.order_set.latest("pk").address_city,
-                }
-            )
-            if request.user.order_set.all()
-            else OrderForm()
+        addresses = get_addresses(request.user)
+        address = next(
+            (a for a in addresses if str(a.pk) == request.GET.get("address")),
+            addresses[0] if addresses else None,
         )
+        form = OrderForm(initial=address.as_order_data()) if address else OrderForm()
         buyer_form = BuyerForm(
             initial={
                 "first_name": request.user.first_name,
@@ -570,54 +681,35 @@ class OrderView(View):
             "buyer_form": buyer_form,
             "delivery_form": delivery_form,
             "payment_form": payment_form,
+            "addresses": addresses,
+            "address": address,
         }
         return render(request, "niunius/order_form.html", ctx)
 
     def post(self, request):
-        """Save the order with provided details."""
+        """
+        Save the draft order with provided details, update personal data of the buyer
+        and save the address as the default one in the address book of the buyer.
+        All forms are validated in one pass, so all errors are displayed at once.
+        """
         form = OrderForm(request.POST)
         buyer_form = BuyerForm(request.POST)
         delivery_form = DeliveryForm(request.POST)
         payment_form = PaymentForm(request.POST)
-        if (
-            form.is_valid()
-            and buyer_form.is_valid()
-            and delivery_form.is_valid()
-            and payment_form.is_valid()
-        ):
-            address_city = form.cleaned_data["address_city"]
-            address_zipcode = form.cleaned_data["address_zipcode"]
-            address_street = form.cleaned_data["address_street"]
-            address_country = form.cleaned_data["address_country"]
-            delivery_method = delivery_form.cleaned_data["delivery_method"]
-            payment_method = payment_form.cleaned_data["payment_method"]
+        if forms_valid(form, buyer_form, delivery_form, payment_form):
             cart = ShoppingCart.objects.get(is_ordered=False)
             try:
-                order = Order.objects.get(cart_id=cart.id)
-            except Order.DoesNotExist:
-                order = Order.objects.create(
-                    cart=cart,
-                    buyer=request.user,
-                    address_city=address_city,
-                    address_zipcode=address_zipcode,
-                    address_street=address_street,
-                    address_country=address_country,
-                    delivery=delivery_method,
-                    payment=payment_method,
+                order = save_draft_order(
+                    cart, form, delivery_form, payment_form, buyer=request.user
                 )
-            order.address_city = address_city
-            order.address_zipcode = address_zipcode
-            order.address_street = address_street
-            order.address_country = address_country
-            order.delivery = delivery_method
-            order.payment = payment_method
-            order.save()
+            except IntegrityError:  # the order of this cart has been already placed
+                return redirect("shopping-cart")
+            save_default_address(request.user, form)
 
             buyer = request.user
-            buyer.first_name = buyer_form.cleaned_data["first_name"]
-            buyer.last_name = buyer_form.cleaned_data["last_name"]
-            buyer.email = buyer_form.cleaned_data["email"]
-            buyer.save()
+            buyer_data = buyer_form.cleaned_data
+            if any(getattr(buyer, field) != value for field, value in buyer_data.items()):
+                User.objects.filter(pk=buyer.pk).update(**buyer_data)
 
             return redirect("confirm-order", order.pk)
 
@@ -651,49 +743,28 @@ class GuestOrderView(View):
         return render(request, "niunius/guest_order_form.html", ctx)
 
     def post(self, request):
-        """Save the order with provided details."""
+        """
+        Save the draft order with provided details, including personal data of the guest buyer.
+        All forms are validated in one pass, so all errors are displayed at once.
+        """
         form = OrderForm(request.POST)
         guest_form = GuestForm(request.POST)
         delivery_form = DeliveryForm(request.POST)
         payment_form = PaymentForm(request.POST)
-        if (
-            form.is_valid()
-            and guest_form.is_valid()
-            and delivery_form.is_valid()
-            and payment_form.is_valid()
-        ):
-            address_city = form.cleaned_data["address_city"]
-            address_zipcode = form.cleaned_data["address_zipcode"]
-            address_street = form.cleaned_data["address_street"]
-            address_country = form.cleaned_data["address_country"]
-            delivery_method = delivery_form.cleaned_data["delivery_method"]
-            payment_method = payment_form.cleaned_data["payment_method"]
+        if forms_valid(form, guest_form, delivery_form, payment_form):
             cart = ShoppingCart.objects.get(pk=request.session.get("cart"))
             try:
-                order = Order.objects.get(cart_id=cart.id)
-            except Order.DoesNotExist:
-                order = Order.objects.create(
-                    cart=cart,
-                    address_city=address_city,
-                    address_zipcode=address_zipcode,
-                    address_street=address_street,
-                    address_country=address_country,
-                    delivery=delivery_method,
-                    payment=payment_method,
+                order = save_draft_order(
+                    cart,
+                    form,
+                    delivery_form,
+                    payment_form,
+                    guest_buyer_first_name=guest_form.cleaned_data["guest_first_name"],
+                    guest_buyer_last_name=guest_form.cleaned_data["guest_last_name"],
+                    guest_buyer_email=guest_form.cleaned_data["guest_email"],
                 )
-            order.address_city = address_city
-            order.address_zipcode = address_zipcode
-            order.address_street = address_street
-            order.address_country = address_country
-            order.delivery = delivery_method
-            order.payment = payment_method
-            order.save()
-
-            order.guest_buyer_first_name = guest_form.cleaned_data["guest_first_name"]
-            order.guest_buyer_last_name = guest_form.cleaned_data["guest_last_name"]
-            order.guest_buyer_email = guest_form.cleaned_data["guest_email"]
-            order.save()
-
+            except IntegrityError:  # the order of this cart has been already placed
+                return redirect("shopping-cart")
             return redirect("confirm-order", order.pk)
 
         ctx = {
@@ -712,28 +783,44 @@ class OrderConfirmationView(View):
     """
 
     def get(self, request, pk):
-        order = get_object_or_404(Order, pk=pk)
-        items = order.cart.cartitem_set.all().order_by("pk")
+        order = get_object_or_404(Order.objects.select_related("cart", "buyer"), pk=pk)
+        items = order.cart.cartitem_set.select_related("product", "variant").order_by("pk")
         ctx = {"order": order, "items": items}
         return render(request, "niunius/order_confirmation.html", ctx)
 
 
 class PurchaseView(View):
     """
-    Display the message confirming the purchase..
+    Place the order confirmed on the order confirmation page and display the message confirming the purchase.
     Decrease the stock with the ordered quantities.
-    Set the shopping cart related to this order to is_ordered = True for logged-in users
-    or delete it from the session for anonymous users.
+    Set the shopping cart related to this order to is_ordered = True
+    and delete it from the session for anonymous users.
+
+    The confirmation form carries the idempotency key of the draft order,
+    so a retried or double-submitted confirmation never places the order twice.
     """
 
     def get(self, request, pk):
+        """Display the message confirming the purchase if the order has been placed."""
+        order = get_object_or_404(Order, pk=pk)
+        if order.status != Order.PLACED:
+            return redirect("confirm-order", order.pk)
+        return render(request, "niunius/purchase.html")
+
+    def post(self, request, pk):
         order = get_object_or_404(Order, pk=pk)
-        for item in order.cart.cartitem_set.all():
-            item.product.stock -= item.quantity
-            item.product.save()
-        order.cart.is_ordered = True
-        if "cart" in request.session:
+        try:
+            key = uuid.UUID(request.POST.get("idempotency_key", ""))
+        except ValueError:
+            return redirect("confirm-order", order.pk)
+        try:
+            placed = place_order(order, key)
+        except OutOfStock as e:
+            messages.error(request, f"Brak wystarczającej ilości produktów: {', '.join(e.args)}.")
+            return redirect("shopping-cart")
+        if not placed and not is_placed(order, key):
+            # the order has been changed since the confirmation page was displayed
+            return redirect("confirm-order", order.pk)
+        if request.session.get("cart") == order.cart_id:
             del request.session["cart"]
-        order.cart.save()
-        order.save()
         return render(request, "niunius/purchase.html")